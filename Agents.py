@@ -10,7 +10,7 @@ from datetime import datetime
 from typing import Literal
 
 import Prompts
-from Rag import buscar_com_cache_semantico
+from Rag import abuscar_com_cache_semantico
 from LLM import (
     sonnet_bedrock_model,
 )
@@ -24,12 +24,14 @@ class LegalDeps:
     query_engine: BaseQueryEngine
     historico_conversa: List[dict]
     documento_texto: str = ""
+    # classification_profile do router: a busca fica nas leis da área (areas_leis)
+    perfil: str = ""
 
 # =======================================================
 # 2. TOOLS
 # =======================================================
-def tool_buscar_rag(ctx: RunContext[LegalDeps], termo_busca: str) -> str:
-    return buscar_com_cache_semantico(ctx.deps.query_engine, termo_busca)
+async def tool_buscar_rag(ctx: RunContext[LegalDeps], termo_busca: str) -> str:
+    return await abuscar_com_cache_semantico(ctx.deps.query_engine, termo_busca, perfil=ctx.deps.perfil)
 
 def tool_pesquisa_web(ctx: RunContext[LegalDeps], consulta: str) -> str:
     print(f"🌍 PESQUISA WEB (DDG): {consulta}")
@@ -2,8 +2,12 @@ import os
 
 from llama_index.llms.bedrock import Bedrock
 from llama_index.embeddings.bedrock import BedrockEmbedding
+from botocore.config import Config
 from pydantic_ai.models.bedrock import BedrockConverseModel
 
+from embedding_cache import CachedEmbedding
+from embedding_concorrente import EMBED_CONCORRENCIA_MAX, EmbeddingConcorrente
+
 # ==============================================================================
 # 1. MODELO "CÉREBRO" (Para Agentes / PydanticAI)
 # ==============================================================================
@@ -21,8 +25,51 @@ llm_haiku = Bedrock(
 )
 
 # ==============================================================================
-# 3. EMBEDDINGS
+# 3. EMBEDDINGS (Com memoização em disco compartilhada entre RAG e ingestão)
 # ==============================================================================
-embed_model = BedrockEmbedding(
+EMBED_DIM = int(os.getenv("EMBED_DIM", "1024"))
+
+bedrock_embed_model = BedrockEmbedding(
     model='amazon.titan-embed-text-v2:0',
-)
\ No newline at end of file
+    additional_kwargs={"dimensions": EMBED_DIM},
+)
+
+embed_model = CachedEmbedding(bedrock_embed_model, dimensao=EMBED_DIM)
+
+# Ingestão: os misses do cache saem em paralelo com concorrência adaptativa ao throttling.
+# O cliente não repete sozinho (max_attempts=1) para o throttling chegar ao limitador.
+# EMBED_CONCORRENCIA_MAX=0 volta ao embedding em série (mesmo modelo do RAG).
+if EMBED_CONCORRENCIA_MAX > 0:
+    embed_executor = EmbeddingConcorrente(
+        BedrockEmbedding(
+            model='amazon.titan-embed-text-v2:0',
+            additional_kwargs={"dimensions": EMBED_DIM},
+            botocore_config=Config(
+                retries={"max_attempts": 1, "mode": "standard"},
+                max_pool_connections=EMBED_CONCORRENCIA_MAX,
+                connect_timeout=60,
+                read_timeout=60,
+            ),
+        )
+    )
+    embed_model_ingestao = CachedEmbedding(embed_executor, dimensao=EMBED_DIM, store=embed_model.store)
+else:
+    embed_executor = None
+    embed_model_ingestao = embed_model
+
+# O cache semântico pode usar um embedding Titan v2 menor (256/512) para ocupar
+# menos memória no Redis. Com a mesma dimensão do Qdrant, reaproveita o mesmo modelo
+# (e o vetor da pergunta é calculado uma única vez).
+CACHE_EMBED_DIM = int(os.getenv("RAG_CACHE_DIM", str(EMBED_DIM)))
+
+if CACHE_EMBED_DIM == EMBED_DIM:
+    cache_embed_model = embed_model
+else:
+    cache_embed_model = CachedEmbedding(
+        BedrockEmbedding(
+            model='amazon.titan-embed-text-v2:0',
+            additional_kwargs={"dimensions": CACHE_EMBED_DIM},
+        ),
+        dimensao=CACHE_EMBED_DIM,
+        store=embed_model.store,
+    )
@@ -1,127 +1,695 @@
 import os
-import redis
-import numpy as np
-import hashlib
-
-# Imports do Redis Stack
-from redis.commands.search.field import VectorField, TextField
-from redis.commands.search.index_definition import IndexDefinition, IndexType
-from redis.commands.search.query import Query
+import re
+import time
+import json
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
 
 from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core.schema import QueryBundle
 
 from LLM import (
-    embed_model 
+    CACHE_EMBED_DIM,
+    EMBED_DIM,
+    cache_embed_model,
+    embed_model,
 )
+from cache_backends import BackendNumpy, BackendRedis, gerar_hash_estavel
+import citacoes
+import areas_leis
+
+# =======================================================
+# 0. CACHE L1 EM MEMÓRIA (MATCH EXATO) ⚡
+# =======================================================
+
+L1_MAX_ITENS = int(os.getenv("RAG_L1_MAX_ITENS", "512"))
+L1_TTL_SEGUNDOS = float(os.getenv("RAG_L1_TTL", "300"))
+
+def normalizar_pergunta(texto: str) -> str:
+    """Chave do L1: minúsculas, sem acentos e com espaços colapsados."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip().lower()
+
+class CacheL1:
+    """
+    LRU limitado com TTL, local ao processo.
+    Evita o embedding no Bedrock e o KNN no Redis para perguntas repetidas.
+    """
+    def __init__(self, max_itens: int = L1_MAX_ITENS, ttl_segundos: float = L1_TTL_SEGUNDOS):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self.hits = 0
+        self.misses = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pergunta: str):
+        chave = normalizar_pergunta(pergunta)
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                expira_em, resposta = item
+                if expira_em > time.monotonic():
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    return resposta
+                del self._itens[chave]
+            self.misses += 1
+            return None
+
+    def set(self, pergunta: str, resposta: str):
+        if self.max_itens <= 0 or self.ttl_segundos <= 0:
+            return
+        chave = normalizar_pergunta(pergunta)
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl_segundos, resposta)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "itens": len(self._itens),
+                "max_itens": self.max_itens,
+                "ttl_segundos": self.ttl_segundos,
+            }
+
+cache_l1 = CacheL1()
+
+def estatisticas_cache_l1() -> dict:
+    return cache_l1.estatisticas()
 
 # =======================================================
-# 1. SISTEMA DE CACHE SEMÂNTICO (REDIS STACK) 🧠
+# 1. SISTEMA DE CACHE SEMÂNTICO (BACKEND PLUGÁVEL) 🧠
 # =======================================================
 
+# "sintese": a engine do LlamaIndex gera uma resposta com o Haiku (comportamento original).
+# "retriever": devolve os top-k trechos crus ao agente (sem a segunda geração de LLM).
+MODO_SINTESE = "sintese"
+MODO_RETRIEVER = "retriever"
+RAG_MODO = os.getenv("RAG_MODO", MODO_SINTESE).strip().lower()
+
+# "redis" (padrão, cai para "numpy" se o Redis Stack não responder), "numpy" ou "nenhum"
+RAG_CACHE_BACKEND = os.getenv("RAG_CACHE_BACKEND", "redis").strip().lower()
+
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = 6379
-INDEX_NAME = "idx:rag_cache_v1"
-REAL_VECTOR_DIM = 1024 
-USE_REDIS = False
-_redis_client = None
-
-def gerar_hash_estavel(texto: str) -> str:
-    return hashlib.md5(texto.encode('utf-8')).hexdigest()
-
-try:
-    redis_url = os.getenv("REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/0")
-    _redis_client = redis.Redis.from_url(redis_url, decode_responses=False) 
-    _redis_client.ping()
-    print(f"✅ REDIS STACK: Conectado (Modo Binário).")
-    USE_REDIS = True
-
-    print("📏 Medindo dimensão do embedding...")
-    test_vec = embed_model.get_query_embedding("teste de dimensao")
-    REAL_VECTOR_DIM = len(test_vec)
-    print(f"📏 Dimensão detectada: {REAL_VECTOR_DIM} (Ajustado automaticamente)")
+redis_url = os.getenv("REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/0")
 
-    try:
-        info = _redis_client.ft(INDEX_NAME).info()
-    except:
-        print(f"⚙️ Criando índice vetorial no Redis (DIM: {REAL_VECTOR_DIM})...")
-        schema = (
-            TextField("texto_pergunta"), 
-            TextField("resposta"),       
-            VectorField("vector",        
-                "HNSW", {
-                    "TYPE": "FLOAT32", 
-                    "DIM": REAL_VECTOR_DIM, 
-                    "DISTANCE_METRIC": "COSINE"
-                }
-            ),
-        )
-        definition = IndexDefinition(prefix=["cache:"], index_type=IndexType.HASH)
-        _redis_client.ft(INDEX_NAME).create_index(schema, definition=definition)
+# Layout compacto do Redis: vetor FLOAT16 e/ou dimensão menor (RAG_CACHE_DIM, no LLM.py),
+# e resposta comprimida ("zlib" ou "zstd"). Veja scripts/migrar_cache_redis.py.
+CACHE_TIPO_VETOR = os.getenv("RAG_CACHE_TIPO_VETOR", "FLOAT32").strip().upper()
+CACHE_COMPRESSAO = os.getenv("RAG_CACHE_COMPRESSAO", "nenhuma").strip().lower()
 
-except Exception as e:
-    print(f"⚠️ REDIS STACK SETUP ERROR: {e}")
-    if "Index already exists" not in str(e):
-        print("💡 DICA: Se mudou o modelo de Embed, rode 'docker exec -it juridico_redis redis-cli FLUSHALL'")
-    USE_REDIS = False
+def nome_indice_cache(modo: str, tipo_vetor: str, dimensao: int):
+    """(índice, prefixo) do cache. O layout original (FLOAT32 na dimensão do Qdrant) mantém os nomes v1."""
+    base = "rag_cache_nodes" if modo == MODO_RETRIEVER else "rag_cache"
+    prefixo = "cache_nodes" if modo == MODO_RETRIEVER else "cache"
+    if tipo_vetor == "FLOAT32" and dimensao == EMBED_DIM:
+        return f"idx:{base}_v1", f"{prefixo}:"
+    sufixo = f"v2_{tipo_vetor.lower()}_{dimensao}"
+    return f"idx:{base}_{sufixo}", f"{prefixo}_{sufixo}:"
 
+# Cada modo tem seu próprio índice: respostas sintetizadas e trechos crus não se misturam
+INDEX_NAME, CACHE_PREFIX = nome_indice_cache(RAG_MODO, CACHE_TIPO_VETOR, CACHE_EMBED_DIM)
 
-def buscar_com_cache_semantico(engine: BaseQueryEngine, pergunta_usuario: str) -> str:
-    if not USE_REDIS:
-        return str(engine.query(pergunta_usuario))
+NUMPY_CAPACIDADE = int(os.getenv("RAG_NUMPY_CAPACIDADE", "10000"))
+NUMPY_POLITICA = os.getenv("RAG_NUMPY_POLITICA", "lru").strip().lower()
+NUMPY_SNAPSHOT = os.getenv("RAG_NUMPY_SNAPSHOT", "")
+NUMPY_SNAPSHOT_INTERVALO = float(os.getenv("RAG_NUMPY_SNAPSHOT_INTERVALO", "300"))
 
-    try:
+LIMIAR_ACEITAVEL = 0.35
+CACHE_TTL_SEGUNDOS = 86400
+SF_LOCK_TTL_MS = int(os.getenv("RAG_SF_LOCK_TTL_MS", "60000"))
+SF_ESPERA_MAX_S = float(os.getenv("RAG_SF_ESPERA_MAX", "45"))
+SF_POLL_S = 0.2
+
+RAG_WARMUP = os.getenv("RAG_WARMUP", "0") == "1"
+
+def _criar_backend_numpy() -> BackendNumpy:
+    print(f"🧮 CACHE: Usando backend NumPy em processo (capacidade {NUMPY_CAPACIDADE}, {NUMPY_POLITICA.upper()}).")
+    return BackendNumpy(
+        capacidade=NUMPY_CAPACIDADE,
+        ttl_segundos=CACHE_TTL_SEGUNDOS,
+        politica=NUMPY_POLITICA,
+        caminho_snapshot=NUMPY_SNAPSHOT or None,
+        intervalo_snapshot_s=NUMPY_SNAPSHOT_INTERVALO,
+        limiar_distancia=LIMIAR_ACEITAVEL,
+    )
+
+def _criar_backend():
+    if RAG_CACHE_BACKEND == "nenhum":
+        return None
+    if RAG_CACHE_BACKEND == "redis":
         try:
-            info = _redis_client.ft(INDEX_NAME).info()
-            num_docs = info.get(b'num_docs') or info.get('num_docs') or 0
-            num_docs = int(num_docs)
-        except:
-            num_docs = 0
-        
-        vector = embed_model.get_query_embedding(pergunta_usuario)
-        if len(vector) != REAL_VECTOR_DIM:
-            print(f"⚠️ ALERTA: Vetor gerado ({len(vector)}) diferente do índice ({REAL_VECTOR_DIM})")
-        
-        vector_bytes = np.array(vector, dtype=np.float32).tobytes()
-
-        query = (
-            Query("*=>[KNN 1 @vector $query_vector AS vector_score]")
-            .sort_by("vector_score")
-            .return_fields("vector_score", "resposta", "texto_pergunta")
-            .dialect(2)
-        )
-        
-        params = {"query_vector": vector_bytes}
-        results = _redis_client.ft(INDEX_NAME).search(query, query_params=params)
+            return BackendRedis(
+                redis_url=redis_url,
+                index_name=INDEX_NAME,
+                prefixo=CACHE_PREFIX,
+                dimensao=CACHE_EMBED_DIM,
+                ttl_segundos=CACHE_TTL_SEGUNDOS,
+                lock_ttl_ms=SF_LOCK_TTL_MS,
+                tipo_vetor=CACHE_TIPO_VETOR,
+                compressao=CACHE_COMPRESSAO,
+            )
+        except Exception as e:
+            print(f"⚠️ REDIS STACK SETUP ERROR: {e}")
+    return _criar_backend_numpy()
+
+# Inicialização preguiçosa: importar o Rag não conecta no Redis nem chama o Bedrock.
+# O backend nasce no primeiro uso (ou no aquecimento em background, se RAG_WARMUP=1).
+_backend = None
+_backend_iniciado = False
+_backend_lock = threading.Lock()
+
+def _obter_backend():
+    global _backend, _backend_iniciado
+    if not _backend_iniciado:
+        with _backend_lock:
+            if not _backend_iniciado:
+                _backend = _criar_backend()
+                _backend_iniciado = True
+                if _backend is not None:
+                    metricas_cache.iniciar_atualizacao(_backend)
+    return _backend
+
+def aquecer_em_background() -> threading.Thread:
+    """Inicializa o backend numa thread, para o primeiro usuário não pagar a conexão."""
+    t = threading.Thread(target=_obter_backend, name="rag-warmup", daemon=True)
+    t.start()
+    return t
+
+# =======================================================
+# 1.1 MÉTRICAS DO CACHE (CONTADORES EM PROCESSO) 📊
+# =======================================================
+# O caminho quente só faz o KNN: nada de FT.INFO por consulta.
+# O tamanho do índice é lido por uma thread a cada STATS_REFRESH_S.
+STATS_REFRESH_S = float(os.getenv("RAG_STATS_REFRESH_S", "30"))
+FAIXAS_DISTANCIA = (0.05, 0.1, 0.2, LIMIAR_ACEITAVEL, 0.5, 0.75, 1.0)
 
-        if results.docs:
-            doc = results.docs[0]
-            distancia = float(doc.vector_score)
-            LIMIAR_ACEITAVEL = 0.35 
+class MetricasCache:
+    def __init__(self, janela_latencias: int = 1000):
+        self.hits = 0
+        self.misses = 0
+        self.sem_vizinho = 0
+        self.histograma = [0] * (len(FAIXAS_DISTANCIA) + 1)
+        self.tamanho_indice = None
+        self.tamanho_lido_em = None
+        self._latencias_ms = deque(maxlen=janela_latencias)
+        self._lock = threading.Lock()
+        self._thread = None
 
+    def registrar_busca(self, entrada, latencia_s: float):
+        with self._lock:
+            self._latencias_ms.append(latencia_s * 1000)
+            if entrada is None:
+                self.sem_vizinho += 1
+                self.misses += 1
+                return
+            distancia = entrada["distancia"]
+            faixa = next((i for i, limite in enumerate(FAIXAS_DISTANCIA) if distancia < limite), len(FAIXAS_DISTANCIA))
+            self.histograma[faixa] += 1
             if distancia < LIMIAR_ACEITAVEL:
-                resposta_cache = doc.resposta
-                if isinstance(resposta_cache, bytes):
-                    resposta_cache = resposta_cache.decode('utf-8')
-                print(f"⚡ CACHE HIT! (Dist: {distancia:.4f}) | Docs Indexados: {num_docs}")
-                return resposta_cache
+                self.hits += 1
             else:
-                print(f"💨 Cache Miss (Dist: {distancia:.4f}). Docs: {num_docs}")
+                self.misses += 1
+
+    def iniciar_atualizacao(self, backend):
+        if self._thread is not None:
+            return
+        def _loop():
+            while True:
+                try:
+                    tamanho = backend.tamanho()
+                    with self._lock:
+                        self.tamanho_indice = tamanho
+                        self.tamanho_lido_em = time.time()
+                except Exception as e:
+                    print(f"⚠️ STATS: Falha ao ler tamanho do índice: {e}")
+                time.sleep(STATS_REFRESH_S)
+        self._thread = threading.Thread(target=_loop, name="rag-stats", daemon=True)
+        self._thread.start()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            latencias = sorted(self._latencias_ms)
+            total = self.hits + self.misses
+            rotulos = [f"<{l}" for l in FAIXAS_DISTANCIA] + [f">={FAIXAS_DISTANCIA[-1]}"]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "sem_vizinho": self.sem_vizinho,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "histograma_distancia": dict(zip(rotulos, self.histograma)),
+                "busca_p50_ms": latencias[int(0.5 * (len(latencias) - 1))] if latencias else None,
+                "busca_p95_ms": latencias[int(0.95 * (len(latencias) - 1))] if latencias else None,
+                "tamanho_indice": self.tamanho_indice,
+                "tamanho_lido_em": self.tamanho_lido_em,
+            }
+
+metricas_cache = MetricasCache()
+
+def estatisticas_cache() -> dict:
+    """Visão única de todas as camadas de cache (para a UI / monitoramento)."""
+    backend = _backend if _backend_iniciado else None
+    return {
+        "backend": backend.nome if backend is not None else None,
+        "modo": RAG_MODO,
+        "versao_corpus": _versao_corpus_local,
+        "l1": cache_l1.estatisticas(),
+        "semantico": metricas_cache.estatisticas(),
+        "single_flight": single_flight.estatisticas(),
+        "embeddings": embed_model.estatisticas(),
+        "citacao_direta": citacoes.estatisticas(),
+    }
+
+# =======================================================
+# 2. HELPERS COMPARTILHADOS (SYNC / ASYNC)
+# =======================================================
+def _pergunta_no_escopo(pergunta_usuario: str, escopo: str) -> str:
+    # A mesma pergunta filtrada por área traz outros trechos: L1 e single-flight separam por perfil
+    return f"[{escopo}] {pergunta_usuario}" if escopo else pergunta_usuario
+
+def _chave_cache(pergunta_usuario: str, escopo: str = "") -> str:
+    # Hash da pergunta normalizada: variações de caixa/acentos/espaços caem na mesma chave
+    return f"{CACHE_PREFIX}{gerar_hash_estavel(normalizar_pergunta(_pergunta_no_escopo(pergunta_usuario, escopo)))}"
+
+def _resposta_da_entrada(entrada: dict) -> str:
+    nodes = entrada.get("nodes")
+    if nodes:
+        return formatar_nodes(json.loads(nodes))
+    return entrada.get("resposta")
+
+def _avaliar_vizinho(entrada, nome_backend: str):
+    """Retorna a resposta em cache se o vizinho mais próximo estiver abaixo do limiar."""
+    if entrada is not None:
+        distancia = entrada["distancia"]
+
+        if int(entrada.get("versao_corpus") or 0) < _versao_minima_local:
+            # Gravada antes da troca do corpus inteiro (limpar_cache_semantico em algum processo)
+            print(f"💨 Cache Miss (entrada do corpus v{entrada.get('versao_corpus')}, anterior à troca). Backend: {nome_backend}")
+            return None
+        if distancia < LIMIAR_ACEITAVEL:
+            print(f"⚡ CACHE HIT! (Dist: {distancia:.4f}) | Backend: {nome_backend}")
+            return _resposta_da_entrada(entrada)
+        print(f"💨 Cache Miss (Dist: {distancia:.4f}). Backend: {nome_backend}")
+    else:
+        print(f"💨 Cache Miss (Zero vizinhos). Backend: {nome_backend}")
+    return None
+
+# =======================================================
+# 2.1 EXECUÇÃO DA BUSCA (SÍNTESE x RETRIEVER)
+# =======================================================
+def _nodes_para_payload(nodes_com_score) -> list:
+    payload = []
+    for n in nodes_com_score or []:
+        meta = n.node.metadata or {}
+        payload.append({
+            "id": n.node.node_id,
+            "score": float(n.score) if n.score is not None else None,
+            "texto": n.node.get_content(),
+            "source": meta.get("source"),
+            "numero_artigo": meta.get("numero_artigo"),
+            "parte": meta.get("parte"),
+            "url_geral": meta.get("url_geral"),
+            # Outras leis com o mesmo trecho (deduplicado na ingestão)
+            "tambem_em": meta.get("tambem_em"),
+        })
+    return payload
+
+def formatar_nodes(nodes: list) -> str:
+    """Texto entregue ao agente no modo retriever: artigo + fonte, sem síntese."""
+    if not nodes:
+        return "Nenhum trecho de lei encontrado na base para essa busca."
+    blocos = []
+    for i, n in enumerate(nodes):
+        ref = f"Art. {n.get('numero_artigo')}" if n.get('numero_artigo') not in (None, "0") else "Preâmbulo"
+        if n.get("parte") and n.get("parte") != 1:
+            ref += f" (parte {n.get('parte')})"
+        tambem = f"TAMBÉM EM: {n.get('tambem_em')}\n" if n.get("tambem_em") else ""
+        blocos.append(
+            f"--- TRECHO #{i+1} ---\n"
+            f"FONTE: {n.get('source')} | {ref}\n"
+            f"{tambem}"
+            f"{n.get('texto')}\n"
+        )
+    return "\n".join(blocos)
+
+def busca_direta_por_citacao(pergunta_usuario: str) -> str:
+    """
+    "Art. 477 da CLT": texto exato do artigo lido no Qdrant por filtro de payload (sem
+    embedding, KNN nem síntese). None se a pergunta não cita artigos resolvíveis.
+    """
+    nodes = citacoes.buscar_citacao(pergunta_usuario)
+    if not nodes:
+        return None
+    print(f"📌 CITAÇÃO DIRETA: {len(nodes)} trechos lidos sem busca vetorial.")
+    return formatar_nodes(nodes)
+
+def executar_busca(engine: BaseQueryEngine, pergunta_usuario: str, modo: str = None, perfil: str = None):
+    """
+    Roda a busca sem cache. Retorna (texto para o agente, nodes usados).
+    Com perfil, o Qdrant só devolve trechos das leis da área dele (areas_leis).
+    """
+    modo = modo or RAG_MODO
+    with areas_leis.escopo(perfil):
+        if modo == MODO_RETRIEVER:
+            nodes = _nodes_para_payload(engine.retrieve(QueryBundle(pergunta_usuario)))
+            return formatar_nodes(nodes), nodes
+        response = engine.query(pergunta_usuario)
+    return str(response), _nodes_para_payload(getattr(response, "source_nodes", None))
+
+# =======================================================
+# 2.2 VERSÃO DO CORPUS E INVALIDAÇÃO SELETIVA 🏷️
+# =======================================================
+# Cada entrada guarda a versão do corpus e as url_geral dos trechos usados;
+# ingestão/exclusão apagam só as entradas dependentes (ver cache_backends).
+VERSAO_REFRESH_S = float(os.getenv("RAG_VERSAO_REFRESH_S", "5"))
+
+_versao_corpus_local = None
+_versao_lida_em = 0.0
+# Entradas com versao_corpus menor são de antes de um limpar_cache_semantico: viram miss
+_versao_minima_local = 0
+
+def _ler_versao_minima() -> int:
+    backend = _obter_backend()
+    if backend is None:
+        return 0
+    try:
+        return backend.versao_minima()
+    except Exception:
+        return _versao_minima_local
+
+def versao_corpus_atual() -> int:
+    backend = _obter_backend()
+    if backend is None:
+        return 0
+    try:
+        return backend.versao_corpus()
+    except Exception:
+        return 0
+
+def _sincronizar_versao_corpus():
+    """
+    O L1 é local ao processo e não enxerga a invalidação feita por outro worker.
+    No máximo a cada VERSAO_REFRESH_S lemos a versão no Redis e, se mudou, limpamos o L1.
+    """
+    global _versao_corpus_local, _versao_lida_em, _versao_minima_local
+    backend = _obter_backend()
+    if backend is None or not backend.distribuido or time.monotonic() - _versao_lida_em < VERSAO_REFRESH_S:
+        return
+    _versao_lida_em = time.monotonic()
+    versao = versao_corpus_atual()
+    if versao != _versao_corpus_local:
+        # A mínima só muda junto com a versão: um GET a mais só quando ela muda
+        _versao_minima_local = _ler_versao_minima()
+    if _versao_corpus_local is not None and versao != _versao_corpus_local:
+        print(f"🏷️ CORPUS: Versão {_versao_corpus_local} -> {versao}. Limpando cache L1.")
+        cache_l1.limpar()
+        citacoes.invalidar_mapa_leis()
+    _versao_corpus_local = versao
+
+def invalidar_cache_por_urls(urls: list) -> int:
+    """
+    Chamado pela ingestão e pela exclusão de leis.
+    Apaga só as entradas que usaram essas URLs (e as que não tinham fonte).
+    Retorna quantas entradas foram removidas.
+    """
+    global _versao_corpus_local
+    cache_l1.limpar()
+    citacoes.invalidar_mapa_leis()
+    backend = _obter_backend()
+    if backend is None:
+        return 0
+    try:
+        removidas = backend.invalidar_urls(urls)
+        _versao_corpus_local = versao_corpus_atual()
+        print(f"🧹 CACHE: {removidas} entradas invalidadas ({len(urls)} URLs). Corpus v{_versao_corpus_local}.")
+        return removidas
+    except Exception as e:
+        print(f"⚠️ Erro ao invalidar cache: {e}")
+        return 0
+
+def limpar_cache_semantico() -> int:
+    """
+    Chamado quando o corpus inteiro é trocado (snapshot_corpus importar).
+    Apaga todas as entradas (de todos os modos e layouts no Redis), não só as das URLs
+    conhecidas, e a versão atual vira a mínima aceita. Retorna quantas foram removidas.
+    """
+    global _versao_corpus_local, _versao_minima_local
+    cache_l1.limpar()
+    citacoes.invalidar_mapa_leis()
+    backend = _obter_backend()
+    if backend is None:
+        return 0
+    try:
+        removidas = backend.invalidar_tudo()
+        _versao_corpus_local = versao_corpus_atual()
+        _versao_minima_local = _ler_versao_minima()
+        print(f"🧹 CACHE: {removidas} entradas apagadas (corpus substituído). Corpus v{_versao_corpus_local}.")
+        return removidas
+    except Exception as e:
+        print(f"⚠️ Erro ao limpar cache: {e}")
+        return 0
+
+# =======================================================
+# 2.3 SINGLE-FLIGHT (PROTEÇÃO CONTRA STAMPEDE) 🛡️
+# =======================================================
+class SingleFlight:
+    """
+    Misses concorrentes da mesma pergunta (normalizada) esperam uma única execução.
+    Dentro do processo: um Future por chave, servindo threads e tasks async.
+    Entre processos: lock do backend (SET NX PX no Redis), ver _computar_e_gravar.
+    """
+    def __init__(self, espera_max_s: float = SF_ESPERA_MAX_S):
+        self.espera_max_s = espera_max_s
+        self.consultas_backend = 0
+        self.coalescidas_local = 0
+        self.coalescidas_remoto = 0
+        self.timeouts = 0
+        self._em_voo = {}
+        self._lock = threading.Lock()
+
+    def _entrar(self, chave: str):
+        with self._lock:
+            fut = self._em_voo.get(chave)
+            if fut is not None:
+                self.coalescidas_local += 1
+                return fut, False
+            fut = Future()
+            self._em_voo[chave] = fut
+            return fut, True
+
+    def _sair(self, chave: str, fut: Future, resultado=None, erro=None):
+        with self._lock:
+            self._em_voo.pop(chave, None)
+        if erro is not None:
+            fut.set_exception(erro)
         else:
-            print(f"💨 Cache Miss (Zero vizinhos). Docs: {num_docs}")
-        
+            fut.set_result(resultado)
+
+    def _contar(self, campo: str):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def executar(self, chave: str, fn):
+        fut, lider = self._entrar(chave)
+        if not lider:
+            try:
+                return fut.result(timeout=self.espera_max_s)
+            except FuturesTimeout:
+                self._contar("timeouts")
+                return fn()
+        try:
+            resultado = fn()
+        except BaseException as e:
+            self._sair(chave, fut, erro=e)
+            raise
+        self._sair(chave, fut, resultado)
+        return resultado
+
+    async def aexecutar(self, chave: str, fn):
+        """Igual ao executar, mas fn (síncrona) roda numa thread e a espera não bloqueia o loop."""
+        fut, lider = self._entrar(chave)
+        if not lider:
+            try:
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(fut)), self.espera_max_s)
+            except asyncio.TimeoutError:
+                self._contar("timeouts")
+                return await asyncio.to_thread(fn)
+        try:
+            resultado = await asyncio.to_thread(fn)
+        except BaseException as e:
+            self._sair(chave, fut, erro=e)
+            raise
+        self._sair(chave, fut, resultado)
+        return resultado
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "consultas_backend": self.consultas_backend,
+                "coalescidas_local": self.coalescidas_local,
+                "coalescidas_remoto": self.coalescidas_remoto,
+                "timeouts": self.timeouts,
+                "em_voo": len(self._em_voo),
+            }
+
+single_flight = SingleFlight()
+
+def estatisticas_single_flight() -> dict:
+    return single_flight.estatisticas()
+
+def _computar_e_gravar(engine: BaseQueryEngine, pergunta_usuario: str, vector, perfil: str = None) -> str:
+    backend = _obter_backend()
+    escopo = areas_leis.escopo_do_cache(perfil)
+    key = _chave_cache(pergunta_usuario, escopo)
+
+    token = backend.adquirir_lock(key)
+    if token is None:
+        entrada = backend.aguardar_resultado(key, SF_ESPERA_MAX_S, SF_POLL_S)
+        if entrada is not None:
+            single_flight._contar("coalescidas_remoto")
+            print("🤝 SINGLE-FLIGHT: Resultado reaproveitado de outro processo.")
+            return _resposta_da_entrada(entrada)
+
+    try:
         print(f"🔍 QDRANT: Processando pergunta inédita...")
-        response = engine.query(pergunta_usuario)
-        resposta_final = str(response)
+        single_flight._contar("consultas_backend")
+        # Versão lida por _sincronizar_versao_corpus antes do lookup (há no máximo VERSAO_REFRESH_S):
+        # um único GET, depois da busca. Se ela já estava velha, só deixamos de gravar.
+        versao_inicio = _versao_corpus_local if _versao_corpus_local is not None else versao_corpus_atual()
+        resposta_final, nodes = executar_busca(engine, pergunta_usuario, perfil=perfil)
 
-        key = f"cache:{gerar_hash_estavel(pergunta_usuario)}"
-        _redis_client.hset(key, mapping={
-            b"vector": vector_bytes,
-            b"texto_pergunta": pergunta_usuario.encode('utf-8'), 
-            b"resposta": resposta_final.encode('utf-8')          
-        })
-        _redis_client.expire(key, 86400) 
+        if versao_corpus_atual() != versao_inicio:
+            # O corpus mudou durante a busca: a resposta pode já nascer velha, não guardamos
+            return resposta_final
+
+        resposta_para_cache = None if RAG_MODO == MODO_RETRIEVER else resposta_final
+        backend.gravar(key, pergunta_usuario, vector, resposta_para_cache, nodes, versao_inicio, perfil=escopo)
+        return resposta_final
+    finally:
+        if token is not None:
+            backend.liberar_lock(key, token)
+
+def _executar_sem_cache(engine: BaseQueryEngine, pergunta_usuario: str, perfil: str = None) -> str:
+    single_flight._contar("consultas_backend")
+    return executar_busca(engine, pergunta_usuario, perfil=perfil)[0]
+
+# =======================================================
+# 3. BUSCA COM CACHE (SÍNCRONA)
+# =======================================================
+def buscar_com_cache_semantico(engine: BaseQueryEngine, pergunta_usuario: str, perfil: str = None) -> str:
+    _sincronizar_versao_corpus()
+    # perfil = classification_profile do agente; escopo "" = busca na coleção inteira
+    escopo = areas_leis.escopo_do_cache(perfil)
+    pergunta_l1 = _pergunta_no_escopo(pergunta_usuario, escopo)
+    resposta_l1 = cache_l1.get(pergunta_l1)
+    if resposta_l1 is not None:
+        print("⚡ CACHE L1 HIT! (Sem embedding / sem Redis)")
+        return resposta_l1
+
+    resposta_direta = busca_direta_por_citacao(pergunta_usuario)
+    if resposta_direta is not None:
+        return resposta_direta
+
+    chave_sf = normalizar_pergunta(pergunta_l1)
+    backend = _obter_backend()
+    if backend is None:
+        resposta_final = single_flight.executar(chave_sf, lambda: _executar_sem_cache(engine, pergunta_usuario, perfil))
+        cache_l1.set(pergunta_l1, resposta_final)
+        return resposta_final
+
+    try:
+        vector = cache_embed_model.get_query_embedding(pergunta_usuario)
+
+        inicio = time.perf_counter()
+        entrada = backend.buscar(vector, escopo)
+        metricas_cache.registrar_busca(entrada, time.perf_counter() - inicio)
+        resposta_cache = _avaliar_vizinho(entrada, backend.nome)
+        if resposta_cache is not None:
+            cache_l1.set(pergunta_l1, resposta_cache)
+            return resposta_cache
+
+        resposta_final = single_flight.executar(
+            chave_sf, lambda: _computar_e_gravar(engine, pergunta_usuario, vector, perfil)
+        )
+        cache_l1.set(pergunta_l1, resposta_final)
         return resposta_final
 
     except Exception as e:
         print(f"⚠️ Erro no fluxo semântico: {e}")
-        return str(engine.query(pergunta_usuario))
\ No newline at end of file
+        return executar_busca(engine, pergunta_usuario, perfil=perfil)[0]
+
+# =======================================================
+# 4. BUSCA COM CACHE (ASSÍNCRONA, NÃO BLOQUEIA O EVENT LOOP)
+# =======================================================
+async def aexecutar_busca(engine: BaseQueryEngine, pergunta_usuario: str, modo: str = None, perfil: str = None):
+    # O Bedrock do LlamaIndex não implementa acomplete (o achat é síncrono por dentro)
+    # e o QdrantVectorStore do app não tem cliente async, então a busca roda numa
+    # thread para não travar o event loop.
+    return await asyncio.to_thread(executar_busca, engine, pergunta_usuario, modo, perfil)
+
+async def abuscar_com_cache_semantico(engine: BaseQueryEngine, pergunta_usuario: str, perfil: str = None) -> str:
+    if not _backend_iniciado:
+        # Primeira chamada do processo: conecta fora do event loop
+        await asyncio.to_thread(_obter_backend)
+    if time.monotonic() - _versao_lida_em >= VERSAO_REFRESH_S:
+        # GET síncrono no Redis: fora do event loop
+        await asyncio.to_thread(_sincronizar_versao_corpus)
+    # perfil = classification_profile do agente; escopo "" = busca na coleção inteira
+    escopo = areas_leis.escopo_do_cache(perfil)
+    pergunta_l1 = _pergunta_no_escopo(pergunta_usuario, escopo)
+    resposta_l1 = cache_l1.get(pergunta_l1)
+    if resposta_l1 is not None:
+        print("⚡ CACHE L1 HIT! (Sem embedding / sem Redis)")
+        return resposta_l1
+
+    resposta_direta = await asyncio.to_thread(busca_direta_por_citacao, pergunta_usuario)
+    if resposta_direta is not None:
+        return resposta_direta
+
+    chave_sf = normalizar_pergunta(pergunta_l1)
+    backend = _obter_backend()
+    if backend is None:
+        resposta_final = await single_flight.aexecutar(chave_sf, lambda: _executar_sem_cache(engine, pergunta_usuario, perfil))
+        cache_l1.set(pergunta_l1, resposta_final)
+        return resposta_final
+
+    try:
+        vector = await cache_embed_model.aget_query_embedding(pergunta_usuario)
+
+        inicio = time.perf_counter()
+        entrada = await backend.abuscar(vector, escopo)
+        metricas_cache.registrar_busca(entrada, time.perf_counter() - inicio)
+        resposta_cache = _avaliar_vizinho(entrada, backend.nome)
+        if resposta_cache is not None:
+            cache_l1.set(pergunta_l1, resposta_cache)
+            return resposta_cache
+
+        # O cálculo (lock entre processos + busca + gravação) roda numa thread
+        resposta_final = await single_flight.aexecutar(
+            chave_sf, lambda: _computar_e_gravar(engine, pergunta_usuario, vector, perfil)
+        )
+        cache_l1.set(pergunta_l1, resposta_final)
+        return resposta_final
+
+    except Exception as e:
+        print(f"⚠️ Erro no fluxo semântico (async): {e}")
+        return (await aexecutar_busca(engine, pergunta_usuario, perfil=perfil))[0]
+
+if RAG_WARMUP:
+    aquecer_em_background()
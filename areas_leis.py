@@ -0,0 +1,196 @@
+# areas_leis.py
+"""
+Área de cada lei (seções de leis.txt: TRABALHISTA, SIMPLES, CORPORATIVO, SOCIETARIO)
+gravada no payload dos pontos (campo "area", lista indexada) e o filtro que limita a
+busca de cada agente especialista às leis da sua área.
+
+Uso:
+    python areas_leis.py             # áreas de leis.txt e pontos por área na coleção
+    python areas_leis.py --aplicar   # grava a área nos pontos já indexados
+"""
+import os
+import re
+import argparse
+import threading
+import unicodedata
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from qdrant_client import QdrantClient, models
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ==============================================================================
+# 1. ÁREAS DE leis.txt
+# ==============================================================================
+LEIS_TXT_PATH = os.getenv("LEIS_TXT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "leis.txt"))
+# 0 = todos os agentes buscam na coleção inteira (como antes)
+RAG_FILTRO_AREA = os.getenv("RAG_FILTRO_AREA", "1") == "1"
+
+CAMPO_AREA = "area"
+# Leis fora de leis.txt (ingeridas pela tela com URL avulsa): visíveis para todos os perfis
+AREA_GERAL = "geral"
+# classification_profile do router -> áreas que o agente enxerga
+AREAS_POR_PERFIL = {
+    "trabalhista": ["trabalhista"],
+    "simples": ["simples"],
+    "corporativo": ["corporativo"],
+    "societario": ["societario"],
+}
+
+_RE_SECAO = re.compile(r"^#\s*\d+\.\s*(.+?)\s*$")
+_RE_URL = re.compile(r"^(https?://\S+)")
+_lock = threading.Lock()
+_cache = {"mtime": None, "areas": {}}
+
+def _chave_url(url: str) -> str:
+    # http/https e barra final não mudam a lei
+    return (url or "").split("://", 1)[-1].rstrip("/").lower()
+
+def _nome_area(secao: str) -> str:
+    secao = unicodedata.normalize("NFKD", secao)
+    return "".join(c for c in secao if not unicodedata.combining(c)).strip().lower()
+
+def carregar_areas(caminho: str = LEIS_TXT_PATH) -> Dict[str, str]:
+    """{url normalizada: área}. A primeira seção numerada em que a URL aparece vale."""
+    areas = {}
+    area = None
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            secao = _RE_SECAO.match(linha)
+            if secao:
+                area = _nome_area(secao.group(1))
+                continue
+            if linha.startswith("#") and "=" not in linha:
+                # Seção sem número (lista de links sem descrição): não é área
+                area = None
+                continue
+            url = _RE_URL.match(linha)
+            if url and area:
+                areas.setdefault(_chave_url(url.group(1)), area)
+    return areas
+
+def areas_por_url() -> Dict[str, str]:
+    """Áreas de leis.txt, relidas quando o arquivo muda."""
+    try:
+        mtime = os.path.getmtime(LEIS_TXT_PATH)
+    except OSError:
+        return {}
+    with _lock:
+        if _cache["mtime"] != mtime:
+            try:
+                _cache["areas"] = carregar_areas(LEIS_TXT_PATH)
+            except Exception as e:
+                print(f"⚠️ ÁREAS: Falha ao ler {LEIS_TXT_PATH}: {e}")
+                _cache["areas"] = {}
+            _cache["mtime"] = mtime
+        return _cache["areas"]
+
+def area_da_url(url: str) -> str:
+    return areas_por_url().get(_chave_url(url), AREA_GERAL)
+
+def areas_do_ponto(urls: List[str]) -> List[str]:
+    """Valor do campo area: áreas da lei dona e das leis da proveniência (trecho deduplicado)."""
+    return sorted({area_da_url(u) for u in urls if u})
+
+# ==============================================================================
+# 2. FILTRO DA BUSCA POR PERFIL
+# ==============================================================================
+# Perfil do agente que está buscando. O Rag define em volta da busca e o
+# VectorStoreLeis (qdrant_colecao) junta o filtro ao da consulta.
+_perfil_da_busca: ContextVar[Optional[str]] = ContextVar("perfil_da_busca", default=None)
+
+@contextmanager
+def escopo(perfil: Optional[str]):
+    token = _perfil_da_busca.set(perfil)
+    try:
+        yield
+    finally:
+        _perfil_da_busca.reset(token)
+
+def filtro_do_perfil(perfil: Optional[str]) -> Optional[models.Filter]:
+    """Pontos das áreas do perfil, das leis sem área em leis.txt e os ainda não marcados."""
+    if not RAG_FILTRO_AREA or perfil not in AREAS_POR_PERFIL:
+        return None
+    return models.Filter(should=[
+        models.FieldCondition(key=CAMPO_AREA, match=models.MatchAny(any=AREAS_POR_PERFIL[perfil] + [AREA_GERAL])),
+        models.IsEmptyCondition(is_empty=models.PayloadField(key=CAMPO_AREA)),
+    ])
+
+def filtro_da_busca() -> Optional[models.Filter]:
+    return filtro_do_perfil(_perfil_da_busca.get())
+
+def escopo_do_cache(perfil: Optional[str]) -> str:
+    """Perfil gravado nas entradas do cache do Rag ("" quando a busca não é filtrada)."""
+    return perfil if filtro_do_perfil(perfil) is not None else ""
+
+# ==============================================================================
+# 3. MARCAÇÃO DOS PONTOS
+# ==============================================================================
+def marcar_area(cliente: QdrantClient, colecao: str, url_lei: str) -> int:
+    """
+    Grava a área nos pontos da lei: os só dela por filtro (uma requisição), os
+    compartilhados com outras leis pela união das áreas. Retorna quantos compartilhados.
+    """
+    import deduplicacao
+
+    da_lei = models.FieldCondition(key="url_geral", match=models.MatchValue(value=url_lei))
+    sem_proveniencia = models.IsEmptyCondition(is_empty=models.PayloadField(key=deduplicacao.CAMPO_URLS_PROVENIENCIA))
+    cliente.set_payload(
+        colecao, payload={CAMPO_AREA: areas_do_ponto([url_lei])},
+        points=models.Filter(must=[da_lei, sem_proveniencia]), wait=True,
+    )
+    compartilhados = models.Filter(must=[deduplicacao.filtro_da_lei(url_lei)], must_not=[sem_proveniencia])
+    atualizacoes = []
+    offset = None
+    while True:
+        registros, offset = cliente.scroll(
+            colecao, scroll_filter=compartilhados, limit=256, offset=offset,
+            with_payload=["url_geral", deduplicacao.CAMPO_URLS_PROVENIENCIA, CAMPO_AREA], with_vectors=False,
+        )
+        for r in registros:
+            areas = areas_do_ponto([r.payload.get("url_geral")] + (r.payload.get(deduplicacao.CAMPO_URLS_PROVENIENCIA) or []))
+            if r.payload.get(CAMPO_AREA) != areas:
+                atualizacoes.append(models.SetPayloadOperation(
+                    set_payload=models.SetPayload(payload={CAMPO_AREA: areas}, points=[r.id])
+                ))
+        if offset is None:
+            break
+    if atualizacoes:
+        cliente.batch_update_points(colecao, atualizacoes, wait=True)
+    return len(atualizacoes)
+
+# ==============================================================================
+# 4. CLI
+# ==============================================================================
+def main():
+    import ingestion
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aplicar", action="store_true", help="Grava a área nos pontos de todas as leis do registro")
+    args = parser.parse_args()
+
+    cliente, colecao = ingestion.client, ingestion.COLLECTION_NAME
+    areas = areas_por_url()
+    print(f"📚 {len(areas)} URLs com área em {LEIS_TXT_PATH}")
+    if args.aplicar:
+        for lei in ingestion.listar_leis_no_banco():
+            marcar_area(cliente, colecao, lei["url"])
+            print(f"🏷️ {area_da_url(lei['url']):>12} | {lei['titulo']}")
+    if not cliente.collection_exists(colecao):
+        return
+    for area in sorted(set(areas.values()) | {AREA_GERAL}):
+        total = cliente.count(colecao, exact=True, count_filter=models.Filter(
+            must=[models.FieldCondition(key=CAMPO_AREA, match=models.MatchValue(value=area))]
+        )).count
+        print(f"📊 {area:>12}: {total} pontos")
+    sem_area = cliente.count(colecao, exact=True, count_filter=models.Filter(
+        must=[models.IsEmptyCondition(is_empty=models.PayloadField(key=CAMPO_AREA))]
+    )).count
+    print(f"📊 {'sem área':>12}: {sem_area} pontos" + (" (rode com --aplicar)" if sem_area else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,644 @@
+import os
+import re
+import json
+import time
+import uuid
+import zlib
+import atexit
+import asyncio
+import hashlib
+import threading
+from typing import List, Optional
+
+import numpy as np
+import redis
+
+# Imports do Redis Stack
+from redis.commands.search.field import TagField, VectorField
+from redis.commands.search.index_definition import IndexDefinition, IndexType
+from redis.commands.search.query import Query
+
+# zstd é opcional: sem o pacote, a compressão cai para zlib (biblioteca padrão)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# =======================================================
+# 0. CONTRATO DOS BACKENDS DE CACHE SEMÂNTICO
+# =======================================================
+# Uma entrada é um dict com:
+#   "distancia" (só na busca), "texto_pergunta", "resposta" (modo síntese)
+#   ou "nodes" (modo retriever), "urls" e "versao_corpus".
+# Entradas com versao_corpus abaixo da versão mínima (avançada por invalidar_tudo)
+# são de um corpus substituído: o Rag.py as trata como miss.
+# A distância segue a métrica COSINE do Redis: 1 - similaridade (0 = idêntico).
+
+def gerar_hash_estavel(texto: str) -> str:
+    return hashlib.md5(texto.encode('utf-8')).hexdigest()
+
+def urls_dos_nodes(nodes: list) -> list:
+    return sorted({n.get("url_geral") for n in nodes or [] if n.get("url_geral")})
+
+class BackendCacheSemantico:
+    """Interface comum: o Rag.py só conversa com estes métodos."""
+    nome = "base"
+    # True quando lock e versão do corpus valem entre processos
+    distribuido = False
+
+    def buscar(self, vector: List[float], perfil: str = "") -> Optional[dict]:
+        """Vizinho mais próximo entre as entradas do perfil (ou None se não houver nenhuma)."""
+        raise NotImplementedError
+
+    async def abuscar(self, vector: List[float], perfil: str = "") -> Optional[dict]:
+        return await asyncio.to_thread(self.buscar, vector, perfil)
+
+    def gravar(self, chave: str, pergunta: str, vector: List[float], resposta: Optional[str], nodes: Optional[list], versao_corpus: int, ttl_segundos: Optional[int] = None, perfil: str = ""):
+        """perfil: área da busca que gerou a entrada ("" = coleção inteira), ver areas_leis."""
+        raise NotImplementedError
+
+    def ler(self, chave: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def invalidar_urls(self, urls: list) -> int:
+        """Remove entradas que usaram essas URLs (e as sem fonte) e avança a versão do corpus."""
+        raise NotImplementedError
+
+    def invalidar_tudo(self) -> int:
+        """Remove todas as entradas e avança a versão do corpus (corpus trocado de uma vez)."""
+        raise NotImplementedError
+
+    def versao_corpus(self) -> int:
+        return 0
+
+    def versao_minima(self) -> int:
+        """Menor versao_corpus aceita numa entrada (a versão em que o corpus foi trocado por inteiro)."""
+        return 0
+
+    def tamanho(self) -> int:
+        return 0
+
+    # --- Lock de single-flight (só faz sentido entre processos no Redis) ---
+    def adquirir_lock(self, chave: str) -> Optional[str]:
+        return "local"
+
+    def aguardar_resultado(self, chave: str, espera_max_s: float, poll_s: float) -> Optional[dict]:
+        return None
+
+    def liberar_lock(self, chave: str, token: str):
+        pass
+
+# =======================================================
+# 1. BACKEND REDIS STACK (HNSW, COMPARTILHADO) 🧠
+# =======================================================
+CHAVE_VERSAO_CORPUS = "rag:versao_corpus"
+CHAVE_VERSAO_MINIMA = "rag:versao_corpus_minima"
+# Campos lidos de cada HASH (o vetor fica de fora: só serve ao índice)
+CAMPOS_PAYLOAD = ("resposta", "nodes", "resposta_z", "nodes_z", "codec", "texto_pergunta", "urls", "versao_corpus", "perfil")
+CAMPOS_BINARIOS = ("resposta_z", "nodes_z")
+PREFIXO_SET_URLS = "cache_urls:"
+# Respostas sem nenhum trecho ("não encontrei nada") dependem do corpus inteiro
+SET_SEM_FONTE = f"{PREFIXO_SET_URLS}__sem_fonte__"
+# Todos os caches semânticos: os dois RAG_MODO, o layout v1 e os v2 (cache:, cache_nodes:,
+# cache_v2_*, cache_nodes_v2_*) e os SETs reversos. Ver Rag.nome_indice_cache.
+PADRAO_TODOS_OS_CACHES = "cache*"
+# O perfil é um campo TAG do índice: a busca é híbrida (@perfil:{x}=>[KNN 1 ...]) e o KNN
+# só enxerga entradas do perfil pedido. TAG vazia não é indexada, então a busca na
+# coleção inteira (perfil "") grava e procura PERFIL_TODOS.
+PERFIL_TODOS = "_todos"
+_RE_TAG_ESPECIAL = re.compile(r"([^A-Za-z0-9_])")
+
+def _perfil_da_tag(valor: Optional[str]) -> str:
+    return "" if not valor or valor == PERFIL_TODOS else valor
+
+def _tag_perfil(perfil: str) -> str:
+    return _RE_TAG_ESPECIAL.sub(r"\\\1", perfil or PERFIL_TODOS)
+
+# Libera o lock apenas se ele ainda for nosso (pode ter expirado e sido pego por outro processo)
+_LUA_LIBERAR_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Lê os SETs reversos e apaga as entradas, os SETs e avança a versão numa operação só:
+# uma gravação (MULTI/EXEC) não cai entre o SUNION e o DEL e escapa da invalidação.
+# KEYS[1] = versão do corpus, KEYS[2..] = SETs reversos. As entradas não vão em KEYS
+# (são lidas do SET): vale para Redis sem cluster, como o do docker-compose.
+_LUA_INVALIDAR_URLS = """
+local chaves = redis.call('sunion', unpack(KEYS, 2))
+for i = 1, #chaves, 1000 do
+    redis.call('del', unpack(chaves, i, math.min(i + 999, #chaves)))
+end
+redis.call('del', unpack(KEYS, 2))
+redis.call('incr', KEYS[1])
+return #chaves
+"""
+
+# Nova versão do corpus, que passa a ser também a mínima aceita nas entradas
+_LUA_AVANCAR_VERSAO_MINIMA = """
+local versao = redis.call('incr', KEYS[1])
+redis.call('set', KEYS[2], versao)
+return versao
+"""
+
+def _decodificar(valor):
+    if isinstance(valor, bytes):
+        return valor.decode('utf-8')
+    return valor
+
+# --- Layout compacto (vetor FLOAT16 e payload comprimido) ---
+TIPOS_VETOR = {"FLOAT32": np.float32, "FLOAT16": np.float16}
+COMPRESSOES = ("nenhuma", "zlib", "zstd")
+
+def _comprimir(texto: str, compressao: str) -> bytes:
+    dados = texto.encode('utf-8')
+    if compressao == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(dados)
+    return zlib.compress(dados, 6)
+
+def _descomprimir(dados: Optional[bytes], codec: Optional[str]) -> Optional[str]:
+    if dados is None:
+        return None
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(dados).decode('utf-8')
+    return zlib.decompress(dados).decode('utf-8')
+
+class BackendRedis(BackendCacheSemantico):
+    """
+    Cada entrada é um HASH <prefixo><md5> indexado por HNSW.
+    Um SET reverso por URL (cache_urls:<md5>) aponta para as chaves que dependem dela,
+    para a ingestão invalidar só o necessário em vez de um FLUSHALL.
+
+    Só o vetor e o perfil são indexados (a busca é sempre KNN dentro do perfil). Com tipo_vetor="FLOAT16" o
+    vetor ocupa metade da memória; com compressão, resposta/nodes vão para os
+    campos resposta_z/nodes_z e o campo "codec" diz como abrir.
+    """
+    nome = "redis"
+    distribuido = True
+
+    def __init__(self, redis_url: str, index_name: str, prefixo: str, dimensao: int, ttl_segundos: int, lock_ttl_ms: int,
+                 tipo_vetor: str = "FLOAT32", compressao: str = "nenhuma"):
+        self.redis_url = redis_url
+        self.index_name = index_name
+        self.prefixo = prefixo
+        self.ttl_segundos = ttl_segundos
+        self.lock_ttl_ms = lock_ttl_ms
+
+        self.tipo_vetor = tipo_vetor.upper()
+        if self.tipo_vetor not in TIPOS_VETOR:
+            raise ValueError(f"Tipo de vetor inválido: {tipo_vetor} (use {', '.join(TIPOS_VETOR)})")
+        self._dtype = TIPOS_VETOR[self.tipo_vetor]
+        self.compressao = compressao.lower()
+        if self.compressao not in COMPRESSOES:
+            raise ValueError(f"Compressão inválida: {compressao} (use {', '.join(COMPRESSOES)})")
+        if self.compressao == "zstd" and zstandard is None:
+            print("⚠️ CACHE: Pacote 'zstandard' não instalado. Usando zlib.")
+            self.compressao = "zlib"
+
+        self.cliente = redis.Redis.from_url(redis_url, decode_responses=False)
+        self.cliente.ping()
+        print(f"✅ REDIS STACK: Conectado (Modo Binário).")
+
+        # A dimensão vem da configuração (EMBED_DIM) e fica gravada junto do índice,
+        # em vez de ser medida com uma chamada ao Bedrock a cada import.
+        self.dimensao = dimensao
+        chave_dimensao = f"rag:dimensao:{self.index_name}"
+        # Uma Query por perfil (são poucos), montada na primeira busca
+        self._queries_knn = {}
+
+        try:
+            info = self.cliente.ft(self.index_name).info()
+            dimensao_salva = self.cliente.get(chave_dimensao)
+            if dimensao_salva is not None and int(dimensao_salva) != self.dimensao:
+                print(f"⚠️ ALERTA: Índice {self.index_name} tem DIM {int(dimensao_salva)}, configuração pede {self.dimensao}.")
+                print("💡 DICA: Se mudou o modelo de Embed, rode 'docker exec -it juridico_redis redis-cli FLUSHALL'")
+        except Exception:
+            info = None
+            print(f"⚙️ Criando índice vetorial no Redis (DIM: {self.dimensao}, {self.tipo_vetor})...")
+            schema = (
+                TagField("perfil"),
+                VectorField("vector",
+                    "HNSW", {
+                        "TYPE": self.tipo_vetor,
+                        "DIM": self.dimensao,
+                        "DISTANCE_METRIC": "COSINE"
+                    }
+                ),
+            )
+            definition = IndexDefinition(prefix=[self.prefixo], index_type=IndexType.HASH)
+            try:
+                self.cliente.ft(self.index_name).create_index(schema, definition=definition)
+                self.cliente.set(chave_dimensao, self.dimensao)
+            except Exception as e:
+                if "Index already exists" not in str(e):
+                    print("💡 DICA: Se mudou o modelo de Embed, rode 'docker exec -it juridico_redis redis-cli FLUSHALL'")
+                    raise
+        if info is not None and not self._indice_tem_perfil(info):
+            # Índice de antes do campo TAG: o Redis reindexa os HASH existentes. Entradas
+            # antigas da coleção inteira (perfil "") ficam de fora e expiram pelo TTL.
+            print(f"⚙️ Adicionando o campo TAG perfil ao índice {self.index_name}...")
+            try:
+                self.cliente.ft(self.index_name).alter_schema_add([TagField("perfil")])
+            except Exception as e:
+                if "Duplicate field" not in str(e):
+                    raise
+
+    @staticmethod
+    def _indice_tem_perfil(info) -> bool:
+        atributos = info.get(b'attributes') or info.get('attributes') or []
+        return any(_decodificar(valor) == "perfil" for atributo in atributos for valor in atributo)
+
+    def _query_knn(self, perfil: str = "") -> Query:
+        tag = _tag_perfil(perfil)
+        query = self._queries_knn.get(tag)
+        if query is None:
+            query = (
+                Query(f"(@perfil:{{{tag}}})=>[KNN 1 @vector $query_vector AS vector_score]")
+                .sort_by("vector_score")
+                .return_fields(*(c for c in ("vector_score",) + CAMPOS_PAYLOAD if c not in CAMPOS_BINARIOS))
+                .dialect(2)
+            )
+            # Payload comprimido é binário: não pode passar pelo decode utf-8 do redis-py
+            for campo in CAMPOS_BINARIOS:
+                query.return_field(campo, decode_field=False)
+            self._queries_knn[tag] = query
+        return query
+
+    def _vetor_para_bytes(self, vector) -> bytes:
+        if len(vector) != self.dimensao:
+            print(f"⚠️ ALERTA: Vetor gerado ({len(vector)}) diferente do índice ({self.dimensao})")
+        return np.array(vector, dtype=self._dtype).tobytes()
+
+    @staticmethod
+    def _entrada_dos_campos(campos: dict) -> dict:
+        """Monta a entrada a partir dos campos crus do HASH, abrindo o payload comprimido se houver."""
+        codec = _decodificar(campos.get("codec"))
+        resposta, nodes = campos.get("resposta"), campos.get("nodes")
+        if codec:
+            resposta = _descomprimir(campos.get("resposta_z"), codec)
+            nodes = _descomprimir(campos.get("nodes_z"), codec)
+        return {
+            "texto_pergunta": _decodificar(campos.get("texto_pergunta")),
+            "resposta": _decodificar(resposta),
+            "nodes": _decodificar(nodes),
+            "urls": _decodificar(campos.get("urls")),
+            "versao_corpus": _decodificar(campos.get("versao_corpus")),
+            "perfil": _perfil_da_tag(_decodificar(campos.get("perfil"))),
+        }
+
+    @classmethod
+    def _entrada_do_documento(cls, doc) -> dict:
+        entrada = cls._entrada_dos_campos({c: getattr(doc, c, None) for c in CAMPOS_PAYLOAD})
+        entrada["distancia"] = float(doc.vector_score)
+        return entrada
+
+    # --- Busca ---
+    def buscar(self, vector, perfil=""):
+        params = {"query_vector": self._vetor_para_bytes(vector)}
+        results = self.cliente.ft(self.index_name).search(self._query_knn(perfil), query_params=params)
+        return self._entrada_do_documento(results.docs[0]) if results.docs else None
+
+    # abuscar: o da base (cliente síncrono numa thread). Um cliente redis.asyncio fica preso
+    # ao loop em que conectou e o app.py abre um loop novo por mensagem (asyncio.run):
+    # o pool síncrono é reaproveitado entre loops e não fica nenhuma conexão sem fechar.
+
+    def ler(self, chave):
+        campos = dict(zip(CAMPOS_PAYLOAD, self.cliente.hmget(chave, *CAMPOS_PAYLOAD)))
+        if not any(campos.get(c) for c in ("resposta", "nodes", "resposta_z", "nodes_z")):
+            return None
+        return self._entrada_dos_campos(campos)
+
+    def tamanho(self):
+        info = self.cliente.ft(self.index_name).info()
+        return int(info.get(b'num_docs') or info.get('num_docs') or 0)
+
+    # --- Escrita ---
+    def gravar(self, chave, pergunta, vector, resposta, nodes, versao_corpus, ttl_segundos=None, perfil=""):
+        ttl = int(ttl_segundos or self.ttl_segundos)
+        urls = urls_dos_nodes(nodes)
+        mapping = {
+            b"vector": self._vetor_para_bytes(vector),
+            b"texto_pergunta": pergunta.encode('utf-8'),
+            b"versao_corpus": str(versao_corpus).encode('utf-8'),
+            b"urls": "|".join(urls).encode('utf-8'),
+            b"perfil": (perfil or PERFIL_TODOS).encode('utf-8'),
+        }
+        if resposta is None:
+            # Modo retriever: guarda os trechos (ids + texto + metadados), não prosa
+            campo, payload = "nodes", json.dumps(nodes or [], ensure_ascii=False)
+        else:
+            campo, payload = "resposta", resposta
+        if self.compressao == "nenhuma":
+            mapping[campo.encode('utf-8')] = payload.encode('utf-8')
+        else:
+            mapping[f"{campo}_z".encode('utf-8')] = _comprimir(payload, self.compressao)
+            mapping[b"codec"] = self.compressao.encode('utf-8')
+
+        # MULTI/EXEC: a entrada e os SETs reversos aparecem juntos para a invalidação (Lua)
+        pipe = self.cliente.pipeline(transaction=True)
+        pipe.hset(chave, mapping=mapping)
+        pipe.expire(chave, ttl)
+        for nome_set in [f"{PREFIXO_SET_URLS}{gerar_hash_estavel(u)}" for u in urls] or [SET_SEM_FONTE]:
+            pipe.sadd(nome_set, chave)
+            pipe.expire(nome_set, max(ttl, self.ttl_segundos))
+        pipe.execute()
+
+    # --- Versão do corpus / invalidação ---
+    def versao_corpus(self):
+        return int(self.cliente.get(CHAVE_VERSAO_CORPUS) or 0)
+
+    def versao_minima(self):
+        return int(self.cliente.get(CHAVE_VERSAO_MINIMA) or 0)
+
+    def invalidar_urls(self, urls):
+        sets = [f"{PREFIXO_SET_URLS}{gerar_hash_estavel(u)}" for u in urls] + [SET_SEM_FONTE]
+        return int(self.cliente.eval(_LUA_INVALIDAR_URLS, 1 + len(sets), CHAVE_VERSAO_CORPUS, *sets))
+
+    def invalidar_tudo(self):
+        """
+        Apaga as entradas de todos os índices (não só o deste modo/layout) e os SETs
+        reversos. O SCAN não é atômico: o que for gravado durante a varredura ainda tem
+        versao_corpus antiga e cai pela versão mínima, avançada no fim.
+        """
+        removidas = 0
+        lote = []
+        for chave in self.cliente.scan_iter(match=PADRAO_TODOS_OS_CACHES, count=1000):
+            lote.append(chave)
+            if len(lote) >= 1000:
+                removidas += self._apagar_lote(lote)
+                lote = []
+        if lote:
+            removidas += self._apagar_lote(lote)
+        self.cliente.eval(_LUA_AVANCAR_VERSAO_MINIMA, 2, CHAVE_VERSAO_CORPUS, CHAVE_VERSAO_MINIMA)
+        return removidas
+
+    def _apagar_lote(self, chaves) -> int:
+        """Apaga o lote e devolve quantas eram entradas (os SETs reversos não contam)."""
+        self.cliente.delete(*chaves)
+        return sum(1 for c in chaves if not _decodificar(c).startswith(PREFIXO_SET_URLS))
+
+    # --- Lock entre processos ---
+    def adquirir_lock(self, chave):
+        token = uuid.uuid4().hex
+        if self.cliente.set(f"lock:{chave}", token, nx=True, px=self.lock_ttl_ms):
+            return token
+        return None
+
+    def aguardar_resultado(self, chave, espera_max_s, poll_s):
+        """Outro processo está calculando: espera a entrada aparecer no Redis."""
+        lock_key = f"lock:{chave}"
+        limite = time.monotonic() + espera_max_s
+        while time.monotonic() < limite:
+            entrada = self.ler(chave)
+            if entrada is not None:
+                return entrada
+            if not self.cliente.exists(lock_key):
+                # Dono do lock terminou (ou morreu): última olhada antes de desistir
+                return self.ler(chave)
+            time.sleep(poll_s)
+        return None
+
+    def liberar_lock(self, chave, token):
+        self.cliente.eval(_LUA_LIBERAR_LOCK, 1, f"lock:{chave}", token)
+
+# =======================================================
+# 2. BACKEND NUMPY EM PROCESSO (FALLBACK SEM REDIS) 🧮
+# =======================================================
+class BackendNumpy(BackendCacheSemantico):
+    """
+    Matriz float32 contígua (capacidade x dim) com linhas normalizadas:
+    a busca é um único produto matriz-vetor (cosine KNN vetorizado).
+    Capacidade limitada com despejo LRU ou LFU, TTL por entrada e snapshot opcional em disco.
+    limiar_distancia: só o vizinho abaixo dela (um hit do Rag) conta como uso no LRU/LFU;
+    None = toda busca conta.
+    """
+    nome = "numpy"
+    distribuido = False
+
+    def __init__(self, capacidade: int = 10000, ttl_segundos: float = 86400, politica: str = "lru",
+                 caminho_snapshot: Optional[str] = None, intervalo_snapshot_s: float = 300,
+                 limiar_distancia: Optional[float] = None):
+        self.capacidade = capacidade
+        self.ttl_segundos = ttl_segundos
+        self.politica = politica
+        self.caminho_snapshot = caminho_snapshot
+        self.intervalo_snapshot_s = intervalo_snapshot_s
+        self.limiar_distancia = limiar_distancia
+
+        self._lock = threading.RLock()
+        self._vetores = None  # alocado no primeiro insert (dimensão vem do vetor)
+        self._ativo = np.zeros(capacidade, dtype=bool)
+        self._expira = np.zeros(capacidade, dtype=np.float64)
+        self._ultimo_uso = np.zeros(capacidade, dtype=np.int64)
+        self._usos = np.zeros(capacidade, dtype=np.int64)
+        self._entradas = [None] * capacidade
+        self._perfis = np.full(capacidade, "", dtype=object)
+        self._slot_por_chave = {}
+        self._relogio = 0
+        self._versao = 0
+        self._versao_minima = 0
+        self._sujo = False
+
+        if caminho_snapshot:
+            self.carregar_snapshot()
+            threading.Thread(target=self._loop_snapshot, daemon=True).start()
+            # O loop é daemon: sem isso o que mudou desde o último snapshot se perde ao sair
+            atexit.register(self.fechar)
+
+    @staticmethod
+    def _normalizar(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norma = np.linalg.norm(v)
+        return v / norma if norma > 0 else v
+
+    def _tick(self) -> int:
+        self._relogio += 1
+        return self._relogio
+
+    def _remover_slot(self, slot: int):
+        entrada = self._entradas[slot]
+        if entrada is not None:
+            self._slot_por_chave.pop(entrada["chave"], None)
+        self._entradas[slot] = None
+        self._ativo[slot] = False
+        self._sujo = True
+
+    def _slot_livre(self) -> int:
+        agora = time.time()
+        vencidos = np.flatnonzero(self._ativo & (self._expira <= agora))
+        for slot in vencidos:
+            self._remover_slot(int(slot))
+
+        livres = np.flatnonzero(~self._ativo)
+        if len(livres):
+            return int(livres[0])
+
+        # Cheio: despeja pela política configurada
+        if self.politica == "lfu":
+            # Menos usado; empate decidido pelo uso mais antigo
+            slot = int(np.lexsort((self._ultimo_uso, self._usos))[0])
+        else:
+            slot = int(np.argmin(self._ultimo_uso))
+        self._remover_slot(slot)
+        return slot
+
+    # --- Busca ---
+    def buscar(self, vector, perfil=""):
+        with self._lock:
+            if self._vetores is None or not self._ativo.any():
+                return None
+            q = self._normalizar(vector)
+            if q.shape[0] != self._vetores.shape[1]:
+                print(f"⚠️ ALERTA: Vetor gerado ({q.shape[0]}) diferente do cache ({self._vetores.shape[1]})")
+                return None
+
+            validos = self._ativo & (self._expira > time.time()) & (self._perfis == (perfil or ""))
+            if not validos.any():
+                return None
+            similaridades = self._vetores @ q
+            similaridades[~validos] = -np.inf
+            slot = int(np.argmax(similaridades))
+
+            distancia = float(1.0 - similaridades[slot])
+            if self.limiar_distancia is None or distancia < self.limiar_distancia:
+                # Vizinho longe demais é miss no Rag: não pode segurar a entrada no cache
+                self._ultimo_uso[slot] = self._tick()
+                self._usos[slot] += 1
+            entrada = dict(self._entradas[slot])
+            entrada["distancia"] = distancia
+            return entrada
+
+    async def abuscar(self, vector, perfil=""):
+        # Produto matriz-vetor em memória: rápido o bastante para rodar no próprio loop
+        return self.buscar(vector, perfil)
+
+    def ler(self, chave):
+        with self._lock:
+            slot = self._slot_por_chave.get(chave)
+            if slot is None or self._expira[slot] <= time.time():
+                return None
+            return dict(self._entradas[slot])
+
+    def tamanho(self):
+        with self._lock:
+            return int((self._ativo & (self._expira > time.time())).sum())
+
+    # --- Escrita ---
+    def gravar(self, chave, pergunta, vector, resposta, nodes, versao_corpus, ttl_segundos=None, perfil=""):
+        v = self._normalizar(vector)
+        with self._lock:
+            if self._vetores is None:
+                self._vetores = np.zeros((self.capacidade, v.shape[0]), dtype=np.float32)
+
+            slot = self._slot_por_chave.get(chave)
+            if slot is None:
+                slot = self._slot_livre()
+            self._vetores[slot] = v
+            self._ativo[slot] = True
+            self._expira[slot] = time.time() + (ttl_segundos or self.ttl_segundos)
+            self._ultimo_uso[slot] = self._tick()
+            self._usos[slot] = 1
+            self._perfis[slot] = perfil or ""
+            self._entradas[slot] = {
+                "chave": chave,
+                "texto_pergunta": pergunta,
+                "resposta": resposta,
+                "nodes": json.dumps(nodes or [], ensure_ascii=False) if resposta is None else None,
+                "urls": "|".join(urls_dos_nodes(nodes)),
+                "versao_corpus": versao_corpus,
+                "perfil": perfil or "",
+            }
+            self._slot_por_chave[chave] = slot
+            self._sujo = True
+
+    # --- Versão do corpus / invalidação ---
+    def versao_corpus(self):
+        return self._versao
+
+    def versao_minima(self):
+        return self._versao_minima
+
+    def invalidar_urls(self, urls):
+        alvo = set(urls)
+        removidas = 0
+        with self._lock:
+            for slot, entrada in enumerate(self._entradas):
+                if entrada is None:
+                    continue
+                urls_entrada = set(filter(None, (entrada.get("urls") or "").split("|")))
+                if not urls_entrada or urls_entrada & alvo:
+                    self._remover_slot(slot)
+                    removidas += 1
+            self._versao += 1
+        return removidas
+
+    def invalidar_tudo(self):
+        with self._lock:
+            slots = np.flatnonzero(self._ativo)
+            for slot in slots:
+                self._remover_slot(int(slot))
+            self._versao += 1
+            self._versao_minima = self._versao
+        return len(slots)
+
+    # --- Snapshot em disco ---
+    def salvar_snapshot(self):
+        if not self.caminho_snapshot:
+            return
+        with self._lock:
+            if self._vetores is None:
+                return
+            slots = np.flatnonzero(self._ativo)
+            vetores = self._vetores[slots].copy()
+            meta = [dict(self._entradas[s], expira=float(self._expira[s])) for s in slots]
+            self._sujo = False
+
+        pasta = os.path.dirname(self.caminho_snapshot)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        tmp = f"{self.caminho_snapshot}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, vetores=vetores, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8))
+        os.replace(tmp, self.caminho_snapshot)
+
+    def carregar_snapshot(self):
+        if not self.caminho_snapshot or not os.path.exists(self.caminho_snapshot):
+            return
+        try:
+            with np.load(self.caminho_snapshot) as dados:
+                vetores = dados["vetores"]
+                meta = json.loads(dados["meta"].tobytes().decode("utf-8"))
+            agora = time.time()
+            with self._lock:
+                for v, entrada in zip(vetores, meta):
+                    expira = entrada.pop("expira", 0)
+                    if expira <= agora:
+                        continue
+                    self.gravar(entrada["chave"], entrada["texto_pergunta"], v, entrada.get("resposta"),
+                                None, entrada.get("versao_corpus", 0), perfil=entrada.get("perfil") or "")
+                    slot = self._slot_por_chave[entrada["chave"]]
+                    self._entradas[slot].update(nodes=entrada.get("nodes"), urls=entrada.get("urls") or "")
+                    self._expira[slot] = expira
+                self._sujo = False
+            print(f"💾 CACHE NUMPY: {self.tamanho()} entradas carregadas de {self.caminho_snapshot}")
+        except Exception as e:
+            print(f"⚠️ CACHE NUMPY: Snapshot ignorado ({e})")
+
+    def fechar(self):
+        """Grava o snapshot pendente (registrado no atexit quando há caminho_snapshot)."""
+        if self._sujo:
+            try:
+                self.salvar_snapshot()
+            except Exception as e:
+                print(f"⚠️ CACHE NUMPY: Falha ao salvar snapshot no encerramento: {e}")
+
+    def _loop_snapshot(self):
+        while True:
+            time.sleep(self.intervalo_snapshot_s)
+            if self._sujo:
+                try:
+                    self.salvar_snapshot()
+                except Exception as e:
+                    print(f"⚠️ CACHE NUMPY: Falha ao salvar snapshot: {e}")
@@ -0,0 +1,290 @@
+# citacoes.py
+"""
+Atalho para consultas que citam artigos ("o que diz o Art. 477 da CLT"): reconhece
+as referências a artigo/lei no termo de busca e lê os trechos exatos do artigo (todas
+as partes) no Qdrant com um scroll filtrado por payload, sem embedding, busca
+vetorial ou síntese. Se alguma citação não for resolvida, a busca normal segue.
+"""
+import os
+import re
+import json
+import time
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from qdrant_client import models
+
+# ==============================================================================
+# 1. CONFIGURAÇÃO
+# ==============================================================================
+RAG_CITACAO_DIRETA = os.getenv("RAG_CITACAO_DIRETA", "1") == "1"
+# Mais artigos que isso numa pergunta: melhor a busca normal (resposta sintetizada)
+CITACAO_MAX_ARTIGOS = int(os.getenv("RAG_CITACAO_MAX_ARTIGOS", "5"))
+# Distância máxima (caracteres) entre "art. N" e a lei citada
+CITACAO_DISTANCIA_MAX = 60
+# Idade máxima do mapa título -> URL em memória. A ingestão/exclusão no mesmo processo
+# (ou a troca da versão do corpus) invalida antes; isto cobre o worker sem Redis.
+CITACAO_MAPA_TTL_S = float(os.getenv("RAG_CITACAO_MAPA_TTL_S", "300"))
+
+LEI = "lei"
+LEI_COMPLEMENTAR = "lei complementar"
+DECRETO_LEI = "decreto-lei"
+DECRETO = "decreto"
+
+# Nomes populares das leis de leis.txt -> (tipo, número)
+APELIDOS_LEIS = {
+    "clt": (DECRETO_LEI, "5452"),
+    "consolidacao das leis do trabalho": (DECRETO_LEI, "5452"),
+    "reforma trabalhista": (LEI, "13467"),
+    "lei do estagio": (LEI, "11788"),
+    "lei do trabalho temporario": (LEI, "6019"),
+    "lei do fgts": (LEI, "8036"),
+    "lei do simples nacional": (LEI_COMPLEMENTAR, "123"),
+    "lei do simples": (LEI_COMPLEMENTAR, "123"),
+    "estatuto da microempresa": (LEI_COMPLEMENTAR, "123"),
+    "lei do pronampe": (LEI, "13999"),
+    "lei das s.a": (LEI, "6404"),
+    "lei das s/a": (LEI, "6404"),
+    "lei das sa": (LEI, "6404"),
+    "lei das sociedades anonimas": (LEI, "6404"),
+    "lsa": (LEI, "6404"),
+    "rir": (DECRETO, "9580"),
+    "regulamento do imposto de renda": (DECRETO, "9580"),
+    "lei do lucro real": (LEI, "12973"),
+    "codigo civil": (LEI, "10406"),
+    "lei da liberdade economica": (LEI, "13874"),
+    "lei do ambiente de negocios": (LEI, "14195"),
+    "marco legal das startups": (LEI_COMPLEMENTAR, "182"),
+}
+
+_NUM = r"\d+(?:\.\d{3})*"
+_RE_ARTIGO = re.compile(rf"\bart(?:igo)?s?\b\.?\s*({_NUM})\s*(?:o\b|°)?(?!\s*-\s*[a-z]\b)")
+# Continuação de lista: "arts. 477, 478 e 479" / intervalo "arts. 477 a 479"
+_RE_ARTIGO_SEGUINTE = re.compile(rf"\s*(,|\be\b|\ba\b)\s*({_NUM})\s*(?:o\b|°)?(?!\s*-\s*[a-z]\b)")
+_RE_LEI = re.compile(
+    rf"\b(lei complementar|lcp?|decreto[- ]lei|decreto|lei)\s*(?:n\s*[o°.]?\s*|numero\s*)?({_NUM})\b"
+)
+_RE_APELIDO = re.compile(r"\b(" + "|".join(sorted(map(re.escape, APELIDOS_LEIS), key=len, reverse=True)) + r")\b")
+# Título do planalto ("DECRETO-LEI Nº 5.452, DE 1º DE MAIO DE 1943") e, na falta dele, a URL
+_RE_TITULO = re.compile(rf"^\s*(lei complementar|decreto[- ]lei|decreto|lei)\s*n\s*[o°.]?\s*({_NUM})")
+_RE_URL = re.compile(r"/(lcp|del|d|l)(\d+(?:\.\d+)?)[a-z]*\.htm", re.IGNORECASE)
+_TIPOS_URL = {"lcp": LEI_COMPLEMENTAR, "del": DECRETO_LEI, "d": DECRETO, "l": LEI}
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip().lower()
+
+def _tipo(bruto: str) -> str:
+    if bruto in ("lei complementar", "lc", "lcp"):
+        return LEI_COMPLEMENTAR
+    if bruto.startswith("decreto") and bruto.endswith("lei"):
+        return DECRETO_LEI
+    return bruto
+
+# ==============================================================================
+# 2. PARSER DE CITAÇÕES
+# ==============================================================================
+def extrair_citacoes(texto: str) -> List[Tuple[Tuple[str, str], List[str]]]:
+    """
+    [((tipo, número da lei), [números dos artigos])] citados no texto. Cada "art. N"
+    fica com a lei citada logo depois ("da CLT") ou, se não houver, logo antes
+    ("CLT, art. 477"); com uma lei só no texto, todos os artigos são dela.
+    """
+    texto = _normalizar(texto)
+    leis = [(m.start(), m.end(), (_tipo(m.group(1)), m.group(2).replace(".", ""))) for m in _RE_LEI.finditer(texto)]
+    leis += [(m.start(), m.end(), APELIDOS_LEIS[m.group(1)]) for m in _RE_APELIDO.finditer(texto)]
+    artigos = []
+    for m in _RE_ARTIGO.finditer(texto):
+        numeros = [m.group(1).replace(".", "")]
+        fim = m.end()
+        for s in _RE_ARTIGO_SEGUINTE.finditer(texto, fim):
+            if s.start() != fim:
+                break
+            numero = s.group(2).replace(".", "")
+            if s.group(1) == "a" and numero.isdigit() and 0 < int(numero) - int(numeros[-1]) < CITACAO_MAX_ARTIGOS:
+                numeros.extend(str(n) for n in range(int(numeros[-1]) + 1, int(numero) + 1))
+            elif s.group(1) != "a":
+                numeros.append(numero)
+            else:
+                break
+            fim = s.end()
+        artigos.append((m.start(), fim, numeros))
+    if not artigos or not leis:
+        return []
+
+    citacoes: Dict[Tuple[str, str], List[str]] = {}
+    for inicio, fim, numeros in artigos:
+        depois = [l for l in leis if l[0] >= fim and l[0] - fim <= CITACAO_DISTANCIA_MAX]
+        antes = [l for l in leis if l[1] <= inicio and inicio - l[1] <= CITACAO_DISTANCIA_MAX]
+        if depois:
+            lei = min(depois, key=lambda l: l[0])[2]
+        elif antes:
+            lei = max(antes, key=lambda l: l[1])[2]
+        elif len({l[2] for l in leis}) == 1:
+            lei = leis[0][2]
+        else:
+            continue
+        for numero in numeros:
+            if numero not in citacoes.setdefault(lei, []):
+                citacoes[lei].append(numero)
+    return list(citacoes.items())
+
+def chave_da_lei(titulo: str, url: str) -> Optional[Tuple[str, str]]:
+    """(tipo, número) de uma lei do registro, pelo título do planalto ou pela URL."""
+    m = _RE_TITULO.search(_normalizar(titulo))
+    if m:
+        return _tipo(m.group(1)), m.group(2).replace(".", "")
+    m = _RE_URL.search(url or "")
+    if m:
+        return _TIPOS_URL[m.group(1).lower()], m.group(2).replace(".", "")
+    return None
+
+def mapear_leis(leis: List[dict]) -> Dict[Tuple[str, str], str]:
+    """{(tipo, número): url} das leis do registro."""
+    por_chave = {}
+    for lei in leis:
+        k = chave_da_lei(lei.get("titulo"), lei.get("url"))
+        if k:
+            por_chave.setdefault(k, lei["url"])
+    return por_chave
+
+def resolver_lei(chave: Tuple[str, str], por_chave: Dict[Tuple[str, str], str]) -> Optional[str]:
+    """URL da lei citada no registro (mesmo tipo e número; ou só o número, se for único)."""
+    if chave in por_chave:
+        return por_chave[chave]
+    mesmo_numero = {url for (tipo, numero), url in por_chave.items() if numero == chave[1]}
+    return mesmo_numero.pop() if len(mesmo_numero) == 1 else None
+
+# ==============================================================================
+# 3. LEITURA DIRETA NO QDRANT
+# ==============================================================================
+def _node(dono: dict, ponto_id, texto: str, tambem_em: Optional[str]) -> dict:
+    return {
+        "id": str(ponto_id),
+        "score": None,
+        "texto": texto,
+        "source": dono.get("source"),
+        "numero_artigo": dono.get("numero_artigo"),
+        "parte": dono.get("parte"),
+        "url_geral": dono.get("url_geral"),
+        "tambem_em": tambem_em,
+    }
+
+def buscar_artigo(cliente, colecao: str, url_lei: str, numero: str) -> List[dict]:
+    """
+    Todas as partes do artigo, em ordem. O filtro pega também o "Art. 5-A" (gravado
+    como 5); o id determinístico (ocorrência 0) separa o artigo pedido. Trechos
+    deduplicados vêm do ponto de outra lei, pela entrada desta lei na proveniência, com o
+    texto desta lei (quase-duplicatas mudam às vezes só um prazo ou valor).
+    """
+    import ingestion
+    import deduplicacao
+
+    do_artigo = [
+        models.FieldCondition(key="url_geral", match=models.MatchValue(value=url_lei)),
+        models.FieldCondition(key="numero_artigo", match=models.MatchValue(value=numero)),
+    ]
+    filtro = models.Filter(should=[
+        models.Filter(must=do_artigo),
+        models.NestedCondition(nested=models.Nested(
+            key=deduplicacao.CAMPO_PROVENIENCIA, filter=models.Filter(must=do_artigo)
+        )),
+    ])
+    partes = {}
+    offset = None
+    while True:
+        registros, offset = cliente.scroll(
+            colecao, scroll_filter=filtro, limit=64, with_payload=True, with_vectors=False, offset=offset
+        )
+        for r in registros:
+            for dono in [r.payload] + (r.payload.get(deduplicacao.CAMPO_PROVENIENCIA) or []):
+                if dono.get("url_geral") != url_lei or str(dono.get("numero_artigo")) != numero:
+                    continue
+                parte = dono.get("parte") or 1
+                id_esperado = ingestion.gerar_id_chunk(url_lei, numero, parte)
+                if str(dono.get("id", r.id)) != id_esperado:
+                    continue
+                if dono is r.payload:
+                    node = json.loads(r.payload.get("_node_content") or "{}")
+                    texto, tambem_em = node.get("text", ""), node.get("metadata", {}).get(deduplicacao.CAMPO_TAMBEM_EM)
+                else:
+                    texto = deduplicacao.texto_da_entrada(r.payload, dono)
+                    if texto is None:
+                        # Quase-duplicata sem o texto desta lei: a busca normal responde
+                        return []
+                    tambem_em = f"{r.payload.get('source')}, Art. {r.payload.get('numero_artigo')}"
+                partes[parte] = _node(dono, r.id, texto, tambem_em)
+        if offset is None:
+            break
+    # Partes faltando (ingestão incompleta): a busca normal responde melhor
+    if not partes or sorted(partes) != list(range(1, len(partes) + 1)):
+        return []
+    return [partes[p] for p in sorted(partes)]
+
+# ==============================================================================
+# 4. ATALHO COMPLETO (USADO PELO Rag)
+# ==============================================================================
+_lock = threading.Lock()
+_stats = {"consultas": 0, "diretas": 0, "sem_citacao": 0, "nao_resolvidas": 0}
+
+def _contar(campo: str):
+    with _lock:
+        _stats[campo] += 1
+
+def estatisticas() -> dict:
+    with _lock:
+        return dict(_stats)
+
+# Mapa (tipo, número) -> URL montado do registro de leis uma vez, não a cada citação
+_mapa_leis = {"por_chave": None, "montado_em": 0.0}
+
+def invalidar_mapa_leis():
+    """Chamado quando o conjunto de leis muda (ingestão, exclusão, nova versão do corpus)."""
+    with _lock:
+        _mapa_leis["por_chave"] = None
+
+def _mapa_atual() -> Dict[Tuple[str, str], str]:
+    with _lock:
+        por_chave = _mapa_leis["por_chave"]
+        if por_chave is not None and time.monotonic() - _mapa_leis["montado_em"] < CITACAO_MAPA_TTL_S:
+            return por_chave
+    import ingestion
+
+    por_chave = mapear_leis(ingestion.listar_leis_no_banco())
+    with _lock:
+        _mapa_leis["por_chave"] = por_chave
+        _mapa_leis["montado_em"] = time.monotonic()
+    return por_chave
+
+def buscar_citacao(texto: str) -> Optional[List[dict]]:
+    """Nodes (formato do Rag) dos artigos citados, ou None para seguir com a busca normal."""
+    if not RAG_CITACAO_DIRETA:
+        return None
+    _contar("consultas")
+    citacoes = extrair_citacoes(texto)
+    if not citacoes or sum(len(artigos) for _, artigos in citacoes) > CITACAO_MAX_ARTIGOS:
+        _contar("sem_citacao")
+        return None
+    try:
+        import ingestion
+
+        por_chave = _mapa_atual()
+        nodes = []
+        for chave, artigos in citacoes:
+            url_lei = resolver_lei(chave, por_chave)
+            if url_lei is None:
+                _contar("nao_resolvidas")
+                return None
+            for numero in artigos:
+                trechos = buscar_artigo(ingestion.client, ingestion.COLLECTION_NAME, url_lei, numero)
+                if not trechos:
+                    _contar("nao_resolvidas")
+                    return None
+                nodes.extend(trechos)
+    except Exception as e:
+        print(f"⚠️ CITAÇÃO: Falha na leitura direta: {e}")
+        return None
+    _contar("diretas")
+    return nodes
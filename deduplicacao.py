@@ -0,0 +1,362 @@
+# deduplicacao.py
+"""
+Deduplicação de trechos entre leis (consolidações, reformas, leis que repetem artigos).
+
+Um trecho idêntico (texto normalizado) ou quase idêntico (MinHash + Jaccard) a um
+ponto de OUTRA lei já gravado não é embedado nem gravado de novo: o ponto existente
+ganha uma entrada de proveniência com a lei, o artigo e o hash do trecho.
+
+Uso:
+    python deduplicacao.py --indexar      # calcula hash_texto/lsh_bandas dos pontos antigos
+"""
+import os
+import re
+import json
+import zlib
+import hashlib
+import argparse
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import areas_leis
+
+# ==============================================================================
+# 1. ASSINATURAS (TEXTO NORMALIZADO, SHINGLES E MINHASH)
+# ==============================================================================
+DEDUP_ATIVO = os.getenv("DEDUP_ATIVO", "1") == "1"
+# Jaccard mínimo entre os shingles para contar como o mesmo trecho
+DEDUP_LIMIAR = float(os.getenv("DEDUP_LIMIAR", "0.8"))
+# Trechos curtos ("Art. 10. (Revogado)") ficam de fora: baratos e ambíguos
+DEDUP_MIN_PALAVRAS = int(os.getenv("DEDUP_MIN_PALAVRAS", "30"))
+SHINGLE_PALAVRAS = 5
+# 16 bandas x 4 linhas: Jaccard 0.8 vira candidato com >99% de chance, 0.3 com ~12%
+# (o candidato sempre passa pela conferência do Jaccard exato)
+MINHASH_BANDAS = 16
+MINHASH_LINHAS = 4
+
+CAMPO_HASH_TEXTO = "hash_texto"
+CAMPO_BANDAS = "lsh_bandas"
+CAMPO_PROVENIENCIA = "proveniencia"
+CAMPO_URLS_PROVENIENCIA = "urls_proveniencia"
+# String legível no metadata do node (o LLM vê em que outras leis o trecho aparece)
+CAMPO_TAMBEM_EM = "tambem_em"
+# Campos da lei copiados para a proveniência (e de volta, se o ponto mudar de dono)
+CAMPOS_LEI = ("source", "url_geral", "tipo", "numero_artigo", "parte", "hash_conteudo")
+# Texto da própria lei na proveniência quando difere do ponto (quase-duplicatas costumam
+# mudar só um prazo, alíquota ou valor): é ele que a leitura direta do artigo devolve
+CAMPO_TEXTO_PROPRIO = "texto"
+
+_RE_CONTINUACAO = re.compile(r"^\[Continuação do Art\. [^\]]*\] \.\.\. ")
+# Rótulo do artigo: o mesmo texto aparece com outra numeração em outra lei
+# O "o" ordinal só colado no número ("Art. 1o"): em "Art. 477. O empregador" o "O" é do texto
+_RE_ROTULO_ARTIGO = re.compile(r"^\s*Art\.?\s*[\d.]+(?:\s*[º°]|o\b)?(?:-[A-Z])?\s*[.\-–]?\s*", re.IGNORECASE)
+_RE_NAO_ALFANUM = re.compile(r"[^0-9a-z]+")
+_PRIMO = 4294967311  # primo > 2^32
+# Semente fixa: as assinaturas precisam ser iguais em todos os processos e execuções
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, 1 << 31, MINHASH_BANDAS * MINHASH_LINHAS, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, MINHASH_BANDAS * MINHASH_LINHAS, dtype=np.uint64)
+
+def normalizar_texto(texto: str) -> str:
+    """Sem o prefixo de continuação (que leva o título da lei), o rótulo do artigo, acentos, caixa e pontuação."""
+    texto = _RE_ROTULO_ARTIGO.sub("", _RE_CONTINUACAO.sub("", texto or ""), count=1)
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _RE_NAO_ALFANUM.sub(" ", texto).strip()
+
+def hash_texto(normalizado: str) -> str:
+    return hashlib.sha256(normalizado.encode("utf-8")).hexdigest()
+
+def shingles(normalizado: str) -> set:
+    palavras = normalizado.split()
+    if len(palavras) <= SHINGLE_PALAVRAS:
+        return {zlib.crc32(normalizado.encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(palavras[i:i + SHINGLE_PALAVRAS]).encode("utf-8"))
+        for i in range(len(palavras) - SHINGLE_PALAVRAS + 1)
+    }
+
+def bandas_lsh(conjunto: set) -> List[str]:
+    valores = np.fromiter(conjunto, dtype=np.uint64)
+    assinatura = ((np.outer(_A, valores) + _B[:, None]) % _PRIMO).min(axis=1)
+    return [
+        f"{b}:{hashlib.blake2b(assinatura[b * MINHASH_LINHAS:(b + 1) * MINHASH_LINHAS].tobytes(), digest_size=8).hexdigest()}"
+        for b in range(MINHASH_BANDAS)
+    ]
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def campos_payload(texto: str) -> dict:
+    """Campos gravados em cada ponto para ele poder ser achado como duplicata depois."""
+    normalizado = normalizar_texto(texto)
+    return {CAMPO_HASH_TEXTO: hash_texto(normalizado), CAMPO_BANDAS: bandas_lsh(shingles(normalizado))}
+
+def _texto_do_payload(payload: dict) -> str:
+    try:
+        return json.loads(payload.get("_node_content") or "{}").get("text", "")
+    except ValueError:
+        return ""
+
+# ==============================================================================
+# 2. BUSCA DE DUPLICATAS NO QDRANT
+# ==============================================================================
+def _varrer(cliente: QdrantClient, colecao: str, filtro: models.Filter, campos=True, vetores=False):
+    offset = None
+    while True:
+        registros, offset = cliente.scroll(
+            colecao, scroll_filter=filtro, limit=512, with_payload=campos, with_vectors=vetores, offset=offset
+        )
+        yield from registros
+        if offset is None:
+            break
+
+def buscar_duplicatas(cliente: QdrantClient, colecao: str, url_lei: str, documentos) -> Dict[int, Tuple[object, float]]:
+    """
+    {índice do documento: (ponto existente de outra lei, similaridade)} para os documentos
+    que já estão no banco. Primeiro por hash do texto normalizado, depois por MinHash/LSH
+    com o Jaccard conferido nos shingles do texto do candidato.
+    """
+    if not cliente.collection_exists(colecao):
+        return {}
+    de_outra_lei = models.FieldCondition(key="url_geral", match=models.MatchValue(value=url_lei))
+    assinaturas = {}
+    for i, doc in enumerate(documentos):
+        normalizado = normalizar_texto(doc.text)
+        if len(normalizado.split()) < DEDUP_MIN_PALAVRAS:
+            continue
+        assinaturas[i] = (hash_texto(normalizado), shingles(normalizado))
+
+    achados = {}
+    por_hash = {}
+    for i, (h, _) in assinaturas.items():
+        por_hash.setdefault(h, []).append(i)
+    hashes = list(por_hash)
+    for inicio in range(0, len(hashes), 256):
+        filtro = models.Filter(
+            must=[models.FieldCondition(key=CAMPO_HASH_TEXTO, match=models.MatchAny(any=hashes[inicio:inicio + 256]))],
+            must_not=[de_outra_lei],
+        )
+        for ponto in _varrer(cliente, colecao, filtro):
+            for i in por_hash.get(ponto.payload.get(CAMPO_HASH_TEXTO), []):
+                achados.setdefault(i, (ponto, 1.0))
+
+    restantes = [i for i in assinaturas if i not in achados]
+    for inicio in range(0, len(restantes), 64):
+        grupo = restantes[inicio:inicio + 64]
+        por_banda = {}
+        for i in grupo:
+            for banda in bandas_lsh(assinaturas[i][1]):
+                por_banda.setdefault(banda, []).append(i)
+        filtro = models.Filter(
+            must=[models.FieldCondition(key=CAMPO_BANDAS, match=models.MatchAny(any=list(por_banda)))],
+            must_not=[de_outra_lei],
+        )
+        for ponto in _varrer(cliente, colecao, filtro):
+            candidatos = {i for banda in ponto.payload.get(CAMPO_BANDAS) or [] for i in por_banda.get(banda, [])}
+            if not candidatos:
+                continue
+            conjunto = shingles(normalizar_texto(_texto_do_payload(ponto.payload)))
+            for i in candidatos:
+                similaridade = jaccard(assinaturas[i][1], conjunto)
+                if similaridade >= DEDUP_LIMIAR and similaridade > achados.get(i, (None, 0.0))[1]:
+                    achados[i] = (ponto, similaridade)
+    return achados
+
+# ==============================================================================
+# 3. PROVENIÊNCIA (VINCULAR / DESVINCULAR LEIS DE UM PONTO)
+# ==============================================================================
+def entrada_proveniencia(documento, similaridade: float, ponto=None) -> dict:
+    """
+    Lei e artigo do trecho descartado, com o id que o ponto dele teria (usado se o ponto
+    mudar de dono) e o texto dele, se não for igual ao do ponto.
+    """
+    entrada = {k: documento.metadata.get(k) for k in CAMPOS_LEI}
+    entrada["id"] = documento.id_
+    entrada["similaridade"] = round(similaridade, 4)
+    if ponto is None or documento.text != _texto_do_payload(ponto.payload):
+        entrada[CAMPO_TEXTO_PROPRIO] = documento.text
+    return entrada
+
+def texto_da_entrada(payload: dict, entrada: dict) -> Optional[str]:
+    """
+    Texto do trecho como está na lei da entrada (o do ponto, se a entrada não guardou o
+    próprio). None para quase-duplicatas gravadas antes do texto próprio: não se sabe o texto.
+    """
+    if entrada.get(CAMPO_TEXTO_PROPRIO):
+        return entrada[CAMPO_TEXTO_PROPRIO]
+    if float(entrada.get("similaridade", 1.0)) < 1.0:
+        return None
+    return _texto_do_payload(payload)
+
+def _tambem_em(proveniencia: List[dict]) -> str:
+    return "; ".join(f"{e.get('source')}, Art. {e.get('numero_artigo')}" for e in proveniencia)
+
+def _payload_proveniencia(payload: dict, proveniencia: List[dict], dono: dict = None) -> dict:
+    """Campos a gravar: listas de proveniência e o metadata do node (_node_content) em sincronia."""
+    novo = {
+        CAMPO_PROVENIENCIA: proveniencia,
+        CAMPO_URLS_PROVENIENCIA: sorted({e["url_geral"] for e in proveniencia}),
+    }
+    # Trecho compartilhado aparece nas buscas de todas as áreas das leis que o contêm
+    url_dona = (dono or payload).get("url_geral")
+    novo[areas_leis.CAMPO_AREA] = areas_leis.areas_do_ponto([url_dona] + novo[CAMPO_URLS_PROVENIENCIA])
+    try:
+        node = json.loads(payload.get("_node_content") or "{}")
+    except ValueError:
+        node = {}
+    meta = node.setdefault("metadata", {})
+    if dono is not None:
+        # O ponto passa a ser da próxima lei da lista, com o texto dela (o vetor continua o mesmo:
+        # os textos têm Jaccard >= DEDUP_LIMIAR)
+        for campo in CAMPOS_LEI:
+            novo[campo] = meta[campo] = dono.get(campo)
+        if dono.get(CAMPO_TEXTO_PROPRIO):
+            texto_antigo, node["text"] = node.get("text", ""), dono[CAMPO_TEXTO_PROPRIO]
+            novo.update(campos_payload(node["text"]))
+            # Entradas sem texto próprio eram iguais ao texto antigo do ponto
+            ajustadas = []
+            for entrada in proveniencia:
+                texto = entrada.get(CAMPO_TEXTO_PROPRIO) or texto_antigo
+                entrada = {k: v for k, v in entrada.items() if k != CAMPO_TEXTO_PROPRIO}
+                if texto != node["text"]:
+                    entrada[CAMPO_TEXTO_PROPRIO] = texto
+                else:
+                    entrada["similaridade"] = 1.0
+                ajustadas.append(entrada)
+            proveniencia = novo[CAMPO_PROVENIENCIA] = ajustadas
+        if dono.get("id"):
+            node["id_"] = dono["id"]
+            for campo in ("doc_id", "document_id", "ref_doc_id"):
+                novo[campo] = dono["id"]
+            origem = (node.get("relationships") or {}).get("1")
+            if isinstance(origem, dict):
+                origem["node_id"] = dono["id"]
+    if proveniencia:
+        meta[CAMPO_TAMBEM_EM] = _tambem_em(proveniencia)
+    else:
+        meta.pop(CAMPO_TAMBEM_EM, None)
+    excluidas = node.setdefault("excluded_embed_metadata_keys", [])
+    if CAMPO_TAMBEM_EM not in excluidas:
+        excluidas.append(CAMPO_TAMBEM_EM)
+    if "_node_content" in payload:
+        novo["_node_content"] = json.dumps(node, ensure_ascii=False)
+    return novo
+
+def _gravar(cliente: QdrantClient, colecao: str, atualizacoes: List[Tuple[object, dict]]):
+    if not atualizacoes:
+        return
+    cliente.batch_update_points(
+        colecao,
+        [models.SetPayloadOperation(set_payload=models.SetPayload(payload=p, points=[pid])) for pid, p in atualizacoes],
+        wait=True,
+    )
+
+def vincular(cliente: QdrantClient, colecao: str, ligacoes: List[Tuple[object, dict]]):
+    """ligacoes: (ponto existente, entrada de proveniência). Idempotente por (url, hash do trecho)."""
+    por_ponto = {}
+    for ponto, entrada in ligacoes:
+        por_ponto.setdefault(ponto.id, (ponto, []))[1].append(entrada)
+    if not por_ponto:
+        return
+    atualizacoes = []
+    # Relê os pontos: outro vínculo pode ter sido gravado depois da busca
+    atuais = {p.id: p for p in cliente.retrieve(colecao, ids=list(por_ponto), with_payload=True)}
+    for pid, (ponto, entradas) in por_ponto.items():
+        payload = atuais[pid].payload if pid in atuais else ponto.payload
+        chaves = {(e["url_geral"], e["hash_conteudo"]) for e in entradas}
+        proveniencia = [
+            e for e in payload.get(CAMPO_PROVENIENCIA) or [] if (e.get("url_geral"), e.get("hash_conteudo")) not in chaves
+        ] + entradas
+        atualizacoes.append((pid, _payload_proveniencia(payload, proveniencia)))
+    _gravar(cliente, colecao, atualizacoes)
+
+def desvincular(cliente: QdrantClient, colecao: str, url_lei: str, manter_hashes) -> int:
+    """
+    Tira a lei dos pontos compartilhados cujo trecho não está em manter_hashes:
+    - ponto da própria lei que também é de outras: passa para a próxima lei da proveniência,
+      com o id que o ponto dela teria (o id antigo fica livre para a lei reescrever o artigo);
+    - ponto de outra lei: remove a entrada desta lei da proveniência.
+    Os pontos só desta lei são apagados por filtro em ingestion.remover_chunks_obsoletos.
+    """
+    if not cliente.collection_exists(colecao):
+        return 0
+    manter = set(manter_hashes)
+    da_lei = models.FieldCondition(key="url_geral", match=models.MatchValue(value=url_lei))
+    fora = [models.FieldCondition(key="hash_conteudo", match=models.MatchAny(any=list(manter)))] if manter else []
+
+    compartilhados = models.Filter(
+        must=[da_lei], must_not=[models.IsEmptyCondition(is_empty=models.PayloadField(key=CAMPO_PROVENIENCIA))] + fora
+    )
+    promovidos, antigos = [], []
+    for ponto in _varrer(cliente, colecao, compartilhados, vetores=True):
+        proveniencia = ponto.payload.get(CAMPO_PROVENIENCIA) or []
+        dono = proveniencia[0]
+        payload = dict(ponto.payload, **_payload_proveniencia(ponto.payload, proveniencia[1:], dono=dono))
+        novo_id = dono.get("id") or ponto.id
+        promovidos.append(models.PointStruct(id=novo_id, vector=ponto.vector, payload=payload))
+        if novo_id != ponto.id:
+            antigos.append(ponto.id)
+    if promovidos:
+        cliente.upsert(colecao, points=promovidos, wait=True)
+    if antigos:
+        cliente.delete(colecao, points_selector=models.PointIdsList(points=antigos), wait=True)
+
+    de_outras = models.Filter(
+        must=[models.FieldCondition(key=CAMPO_URLS_PROVENIENCIA, match=models.MatchValue(value=url_lei))],
+        must_not=[da_lei],
+    )
+    atualizacoes = []
+    for ponto in _varrer(cliente, colecao, de_outras):
+        proveniencia = ponto.payload.get(CAMPO_PROVENIENCIA) or []
+        restante = [e for e in proveniencia if e.get("url_geral") != url_lei or e.get("hash_conteudo") in manter]
+        if len(restante) != len(proveniencia):
+            atualizacoes.append((ponto.id, _payload_proveniencia(ponto.payload, restante)))
+    _gravar(cliente, colecao, atualizacoes)
+    return len(promovidos) + len(atualizacoes)
+
+def filtro_da_lei(url_lei: str) -> models.Filter:
+    """Pontos da lei: os dela e os de outras leis em que ela aparece na proveniência."""
+    return models.Filter(should=[
+        models.FieldCondition(key="url_geral", match=models.MatchValue(value=url_lei)),
+        models.FieldCondition(key=CAMPO_URLS_PROVENIENCIA, match=models.MatchValue(value=url_lei)),
+    ])
+
+# ==============================================================================
+# 4. CLI (PONTOS GRAVADOS ANTES DA DEDUPLICAÇÃO)
+# ==============================================================================
+def indexar_pontos_antigos(cliente: QdrantClient, colecao: str) -> int:
+    sem_assinatura = models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key=CAMPO_HASH_TEXTO))])
+    total = 0
+    lote = []
+    for ponto in _varrer(cliente, colecao, sem_assinatura, campos=["_node_content"]):
+        lote.append((ponto.id, campos_payload(_texto_do_payload(ponto.payload))))
+        if len(lote) >= 256:
+            _gravar(cliente, colecao, lote)
+            total += len(lote)
+            lote = []
+    _gravar(cliente, colecao, lote)
+    return total + len(lote)
+
+def main():
+    import ingestion
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--indexar", action="store_true", help="Grava hash_texto/lsh_bandas nos pontos que não têm")
+    args = parser.parse_args()
+    if not args.indexar:
+        parser.print_help()
+        return
+    total = indexar_pontos_antigos(ingestion.client, ingestion.COLLECTION_NAME)
+    print(f"✅ {total} pontos antigos indexados para deduplicação")
+
+if __name__ == "__main__":
+    main()
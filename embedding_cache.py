@@ -0,0 +1,224 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pydantic import PrivateAttr
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+# ==============================================================================
+# 1. STORE ENDEREÇADO POR CONTEÚDO (MEMÓRIA + SQLITE)
+# ==============================================================================
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBED_CACHE_MEMORIA = int(os.getenv("EMBED_CACHE_MEMORIA", "4096"))
+# Validade do COUNT(*) de estatisticas(); as gravações deste processo entram na hora
+EMBED_CACHE_CONTAGEM_TTL_S = float(os.getenv("EMBED_CACHE_CONTAGEM_TTL_S", "60"))
+
+def gerar_chave_embedding(modelo: str, dimensao: int, texto: str) -> str:
+    """Chave estável: (id do modelo, dimensão, sha256 do texto)."""
+    hash_texto = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+    return f"{modelo}|{dimensao}|{hash_texto}"
+
+class EmbeddingStore:
+    """
+    Memoização de vetores em duas camadas:
+    - LRU em memória (frente rápida, por processo);
+    - SQLite em disco (persistente, compartilhado entre processos e reinícios).
+    """
+    def __init__(self, caminho: str = EMBED_CACHE_PATH, max_memoria: int = EMBED_CACHE_MEMORIA):
+        self.caminho = caminho
+        self.max_memoria = max_memoria
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._itens_disco = None
+        self._contado_em = 0.0
+
+        try:
+            pasta = os.path.dirname(caminho)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (chave TEXT PRIMARY KEY, vetor BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        except Exception as e:
+            print(f"⚠️ EMBED CACHE: Disco indisponível ({e}). Usando apenas memória.")
+            self._conn = None
+
+    def _lembrar(self, chave: str, vetor: List[float]):
+        self._memoria[chave] = vetor
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_memoria:
+            self._memoria.popitem(last=False)
+
+    def get_many(self, chaves: List[str]) -> Dict[str, List[float]]:
+        encontrados = {}
+        faltantes = []
+        with self._lock:
+            for chave in chaves:
+                vetor = self._memoria.get(chave)
+                if vetor is not None:
+                    self._memoria.move_to_end(chave)
+                    encontrados[chave] = vetor
+                    self.hits_memoria += 1
+                else:
+                    faltantes.append(chave)
+
+            if faltantes and self._conn is not None:
+                # SQLite limita o número de parâmetros por consulta
+                for inicio in range(0, len(faltantes), 500):
+                    lote = faltantes[inicio:inicio + 500]
+                    marcadores = ",".join("?" * len(lote))
+                    linhas = self._conn.execute(
+                        f"SELECT chave, vetor FROM embeddings WHERE chave IN ({marcadores})", lote
+                    ).fetchall()
+                    for chave, blob in linhas:
+                        vetor = np.frombuffer(blob, dtype=np.float32).tolist()
+                        encontrados[chave] = vetor
+                        self._lembrar(chave, vetor)
+                        self.hits_disco += 1
+
+            self.misses += len(chaves) - len(encontrados)
+        return encontrados
+
+    def get(self, chave: str) -> Optional[List[float]]:
+        return self.get_many([chave]).get(chave)
+
+    def put_many(self, itens: Dict[str, List[float]]):
+        if not itens:
+            return
+        with self._lock:
+            for chave, vetor in itens.items():
+                self._lembrar(chave, list(vetor))
+            if self._conn is not None:
+                try:
+                    # Chave endereçada por conteúdo: se já existe, o vetor é o mesmo.
+                    # Com IGNORE, o rowcount é o número de chaves novas (mantém a contagem).
+                    cursor = self._conn.executemany(
+                        "INSERT OR IGNORE INTO embeddings (chave, vetor) VALUES (?, ?)",
+                        [(c, np.asarray(v, dtype=np.float32).tobytes()) for c, v in itens.items()],
+                    )
+                    self._conn.commit()
+                    if self._itens_disco is not None:
+                        self._itens_disco += max(cursor.rowcount, 0)
+                except Exception as e:
+                    print(f"⚠️ EMBED CACHE: Falha ao gravar em disco: {e}")
+
+    def put(self, chave: str, vetor: List[float]):
+        self.put_many({chave: vetor})
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            hits = self.hits_memoria + self.hits_disco
+            total = hits + self.misses
+            agora = time.monotonic()
+            if self._conn is not None and (
+                self._itens_disco is None or agora - self._contado_em >= EMBED_CACHE_CONTAGEM_TTL_S
+            ):
+                # Recontagem periódica: pega o que outros processos gravaram no mesmo arquivo
+                self._itens_disco = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self._contado_em = agora
+            itens_disco = self._itens_disco
+            return {
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "misses": self.misses,
+                "hit_rate": (hits / total) if total else 0.0,
+                "itens_memoria": len(self._memoria),
+                "itens_disco": itens_disco,
+            }
+
+# ==============================================================================
+# 2. WRAPPER LLAMAINDEX (TRANSPARENTE PARA RAG E INGESTÃO)
+# ==============================================================================
+class CachedEmbedding(BaseEmbedding):
+    """
+    Envolve um BaseEmbedding qualquer e consulta o EmbeddingStore antes de
+    chamar o modelo. Serve tanto para Settings.embed_model (ingestão) quanto
+    para o cache semântico do Rag.py.
+    """
+    dimensao: int = 1024
+    _base: BaseEmbedding = PrivateAttr()
+    _store: EmbeddingStore = PrivateAttr()
+
+    def __init__(self, base: BaseEmbedding, dimensao: int = 1024, store: Optional[EmbeddingStore] = None, **kwargs: Any):
+        kwargs.setdefault("model_name", base.model_name)
+        kwargs.setdefault("embed_batch_size", base.embed_batch_size)
+        super().__init__(dimensao=dimensao, **kwargs)
+        self._base = base
+        self._store = store or EmbeddingStore()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def base(self) -> BaseEmbedding:
+        return self._base
+
+    @property
+    def store(self) -> EmbeddingStore:
+        return self._store
+
+    def _chave(self, texto: str) -> str:
+        return gerar_chave_embedding(self.model_name, self.dimensao, texto)
+
+    # --- Consultas (uma por vez) ---
+    def _get_query_embedding(self, query: str) -> Embedding:
+        chave = self._chave(query)
+        vetor = self._store.get(chave)
+        if vetor is None:
+            vetor = self._base._get_query_embedding(query)
+            self._store.put(chave, vetor)
+        return vetor
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        chave = self._chave(query)
+        vetor = self._store.get(chave)
+        if vetor is None:
+            vetor = await self._base._aget_query_embedding(query)
+            self._store.put(chave, vetor)
+        return vetor
+
+    # --- Textos (ingestão) ---
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        chaves = [self._chave(t) for t in texts]
+        encontrados = self._store.get_many(chaves)
+        faltantes = list({c: t for c, t in zip(chaves, texts) if c not in encontrados}.items())
+        if faltantes:
+            vetores = self._base._get_text_embeddings([t for _, t in faltantes])
+            novos = {c: v for (c, _), v in zip(faltantes, vetores)}
+            self._store.put_many(novos)
+            encontrados.update(novos)
+        return [encontrados[c] for c in chaves]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        chaves = [self._chave(t) for t in texts]
+        encontrados = self._store.get_many(chaves)
+        faltantes = list({c: t for c, t in zip(chaves, texts) if c not in encontrados}.items())
+        if faltantes:
+            vetores = await self._base._aget_text_embeddings([t for _, t in faltantes])
+            novos = {c: v for (c, _), v in zip(faltantes, vetores)}
+            self._store.put_many(novos)
+            encontrados.update(novos)
+        return [encontrados[c] for c in chaves]
+
+    def estatisticas(self) -> dict:
+        return self._store.estatisticas()
@@ -0,0 +1,203 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from pydantic import PrivateAttr
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+# ==============================================================================
+# 1. CONCORRÊNCIA ADAPTATIVA (AIMD)
+# ==============================================================================
+# O Titan v2 embeda um texto por chamada: em série, a ingestão fica presa à
+# latência de cada requisição. Aqui as chamadas de um lote saem em paralelo,
+# com um limite que sobe +1 a cada rodada de sucessos e cai pela metade (com uma
+# pausa global) quando o Bedrock responde ThrottlingException.
+EMBED_CONCORRENCIA_MAX = int(os.getenv("EMBED_CONCORRENCIA_MAX", "16"))
+EMBED_CONCORRENCIA_INICIAL = int(os.getenv("EMBED_CONCORRENCIA_INICIAL", "4"))
+EMBED_CONCORRENCIA_MIN = int(os.getenv("EMBED_CONCORRENCIA_MIN", "1"))
+# Throttlings seguidos de uma mesma chamada antes de desistir (o erro sobe para a ingestão)
+EMBED_TENTATIVAS = int(os.getenv("EMBED_TENTATIVAS", "8"))
+EMBED_PAUSA_BASE_S = float(os.getenv("EMBED_PAUSA_BASE_S", "0.5"))
+EMBED_PAUSA_MAX_S = float(os.getenv("EMBED_PAUSA_MAX_S", "20"))
+
+# Códigos do Bedrock que significam "mais devagar" (e não erro da requisição)
+CODIGOS_SOBRECARGA = {
+    "ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException",
+    "ModelNotReadyException", "ServiceQuotaExceededException",
+}
+
+def eh_sobrecarga(erro: Exception) -> bool:
+    resposta = getattr(erro, "response", None)
+    if isinstance(resposta, dict):
+        return resposta.get("Error", {}).get("Code") in CODIGOS_SOBRECARGA
+    return type(erro).__name__ in CODIGOS_SOBRECARGA
+
+class LimitadorAdaptativo:
+    """
+    Semáforo com limite variável. Cada throttling corta o limite pela metade uma
+    única vez por "geração": as chamadas que já estavam em voo quando o corte
+    aconteceu não cortam de novo ao voltar com o mesmo erro.
+    """
+    def __init__(self, inicial: int = EMBED_CONCORRENCIA_INICIAL, minimo: int = EMBED_CONCORRENCIA_MIN,
+                 maximo: int = EMBED_CONCORRENCIA_MAX, pausa_base: float = EMBED_PAUSA_BASE_S,
+                 pausa_max: float = EMBED_PAUSA_MAX_S):
+        self.minimo = max(minimo, 1)
+        self.maximo = max(maximo, self.minimo)
+        self.limite = min(max(inicial, self.minimo), self.maximo)
+        self.pausa_base = pausa_base
+        self.pausa_max = pausa_max
+        self._cond = threading.Condition()
+        self._em_voo = 0
+        self._sucessos = 0
+        self._geracao = 0
+        self._cortes_seguidos = 0
+        self._pausa_ate = 0.0
+        # Estatísticas
+        self.chamadas = 0
+        self.throttles = 0
+        self.cortes = 0
+        self.limite_maximo_usado = self.limite
+        self._tempo_ativo = 0.0
+        self._ativo_desde = None
+
+    def adquirir(self) -> int:
+        with self._cond:
+            while True:
+                espera = self._pausa_ate - time.monotonic()
+                if espera <= 0 and self._em_voo < self.limite:
+                    break
+                self._cond.wait(timeout=espera if espera > 0 else None)
+            if self._em_voo == 0:
+                self._ativo_desde = time.monotonic()
+            self._em_voo += 1
+            return self._geracao
+
+    def _soltar(self):
+        self._em_voo -= 1
+        if self._em_voo == 0 and self._ativo_desde is not None:
+            self._tempo_ativo += time.monotonic() - self._ativo_desde
+            self._ativo_desde = None
+        self._cond.notify_all()
+
+    def sucesso(self):
+        with self._cond:
+            self.chamadas += 1
+            self._sucessos += 1
+            # Aumento aditivo: +1 depois de uma rodada inteira (limite) de sucessos
+            if self._sucessos >= self.limite:
+                self._sucessos = 0
+                self._cortes_seguidos = 0
+                if self.limite < self.maximo:
+                    self.limite += 1
+                    self.limite_maximo_usado = max(self.limite_maximo_usado, self.limite)
+            self._soltar()
+
+    def sobrecarga(self, geracao: int):
+        with self._cond:
+            self.throttles += 1
+            if geracao == self._geracao:
+                # Corte multiplicativo + pausa global (exponencial se os cortes se repetem)
+                self._geracao += 1
+                self.cortes += 1
+                self.limite = max(self.minimo, self.limite // 2)
+                self._sucessos = 0
+                pausa = min(self.pausa_max, self.pausa_base * (2 ** self._cortes_seguidos))
+                self._cortes_seguidos += 1
+                self._pausa_ate = max(self._pausa_ate, time.monotonic() + pausa * random.uniform(0.8, 1.2))
+            self._soltar()
+
+    def falha(self):
+        with self._cond:
+            self._soltar()
+
+    def estatisticas(self) -> dict:
+        with self._cond:
+            ativo = self._tempo_ativo
+            if self._ativo_desde is not None:
+                ativo += time.monotonic() - self._ativo_desde
+            return {
+                "chamadas": self.chamadas,
+                "throttles": self.throttles,
+                "cortes": self.cortes,
+                "limite_atual": self.limite,
+                "limite_maximo_usado": self.limite_maximo_usado,
+                "tempo_ativo_s": ativo,
+                "embeddings_por_s": (self.chamadas / ativo) if ativo else 0.0,
+            }
+
+# ==============================================================================
+# 2. WRAPPER LLAMAINDEX (PARA A INGESTÃO)
+# ==============================================================================
+class EmbeddingConcorrente(BaseEmbedding):
+    """
+    Envolve um BaseEmbedding de um texto por chamada (BedrockEmbedding) e embeda
+    os textos de cada lote em paralelo, sob o LimitadorAdaptativo. Vai por baixo
+    do CachedEmbedding: só os misses do cache chegam aqui.
+    """
+    _base: BaseEmbedding = PrivateAttr()
+    _limitador: LimitadorAdaptativo = PrivateAttr()
+    _pool: ThreadPoolExecutor = PrivateAttr()
+    _tentativas: int = PrivateAttr()
+
+    def __init__(self, base: BaseEmbedding, limitador: LimitadorAdaptativo = None,
+                 tentativas: int = EMBED_TENTATIVAS, **kwargs: Any):
+        kwargs.setdefault("model_name", base.model_name)
+        # Lote grande: um lote da ingestão (BATCH_SIZE_DOCS) sai inteiro em paralelo
+        kwargs.setdefault("embed_batch_size", 100)
+        super().__init__(**kwargs)
+        self._base = base
+        self._limitador = limitador or LimitadorAdaptativo()
+        self._pool = ThreadPoolExecutor(max_workers=self._limitador.maximo, thread_name_prefix="embed")
+        self._tentativas = tentativas
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "EmbeddingConcorrente"
+
+    @property
+    def limitador(self) -> LimitadorAdaptativo:
+        return self._limitador
+
+    def _chamar(self, fn, texto: str) -> Embedding:
+        for tentativa in range(self._tentativas):
+            geracao = self._limitador.adquirir()
+            try:
+                vetor = fn(texto)
+            except Exception as e:
+                if not eh_sobrecarga(e):
+                    self._limitador.falha()
+                    raise
+                self._limitador.sobrecarga(geracao)
+                if tentativa == self._tentativas - 1:
+                    print(f"❌ EMBED: Throttling persistente após {self._tentativas} tentativas")
+                    raise
+                continue
+            self._limitador.sucesso()
+            return vetor
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._chamar(self._base._get_query_embedding, query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._chamar(self._base._get_text_embedding, text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        if len(texts) == 1:
+            return [self._get_text_embedding(texts[0])]
+        return list(self._pool.map(self._get_text_embedding, texts))
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await asyncio.to_thread(self._get_query_embedding, query)
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return await asyncio.to_thread(self._get_text_embedding, text)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await asyncio.to_thread(self._get_text_embeddings, texts)
+
+    def estatisticas(self) -> dict:
+        return self._limitador.estatisticas()
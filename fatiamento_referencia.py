@@ -0,0 +1,85 @@
+"""
+Fatiador de artigos de referência (a implementação antiga: SentenceSplitter em todo
+artigo) e a conferência de utils.fatiar_por_artigos contra ele. Usado por
+scripts/verificar_fatiamento.py, scripts/benchmark_fatiamento.py e pelos testes.
+
+- modo exato (estrutural=False): a lista de chunks tem que ser idêntica à antiga;
+- modo estrutural: os metadados (source, url_geral, tipo, numero_artigo, parte)
+  têm que ser idênticos, exceto o número de partes dos artigos longos. Nesses, a
+  fronteira muda (§/incisos/alíneas), então só se exige parte = 1..n. Os artigos
+  de um chunk só têm que ter o mesmo texto, e todo chunk tem que caber em
+  CHUNK_TOKENS.
+"""
+import re
+from collections import Counter
+
+from llama_index.core.node_parser import SentenceSplitter
+
+import utils
+
+def fatiar_referencia(texto_completo, titulo, url, splitter=None):
+    """
+    Fatiador antigo, como era antes do atalho para artigos curtos. splitter: o
+    SentenceSplitter a usar (padrão: um novo por chamada, como era).
+    """
+    splitter = splitter or SentenceSplitter(chunk_size=1024, chunk_overlap=200)
+    pedacos = re.split(r'(?=\nArt[\.\s]\s*\d+)', texto_completo, flags=re.IGNORECASE)
+    chunks = []
+    if pedacos and pedacos[0].strip():
+        chunks.append({"conteudo": pedacos[0].strip(), "metadata": {
+            "source": titulo, "url_geral": url, "tipo": "Preambulo", "numero_artigo": "0"}})
+    for chunk in pedacos[1:]:
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        # Numeração como a atual ("Art. 1.052" -> 1052): o que se compara aqui são as fronteiras
+        num_art = utils.numero_do_artigo(chunk)
+        for i, sub_texto in enumerate(splitter.split_text(chunk)):
+            if i > 0:
+                sub_texto = f"[Continuação do Art. {num_art} da {titulo}] ... {sub_texto}"
+            chunks.append({"conteudo": sub_texto, "metadata": {
+                "source": titulo, "url_geral": url, "tipo": "Artigo", "numero_artigo": num_art, "parte": i + 1}})
+    return chunks
+
+def _chave(chunk):
+    m = chunk["metadata"]
+    return (m["tipo"], m["numero_artigo"])
+
+def verificar(titulo, texto, url, splitter=None):
+    """Lista de divergências entre utils.fatiar_por_artigos e o fatiador antigo (vazia = confere)."""
+    referencia = fatiar_referencia(texto, titulo, url, splitter)
+    erros = []
+
+    if utils.fatiar_por_artigos(texto, titulo, url, estrutural=False) != referencia:
+        erros.append("modo exato: chunks diferentes da implementação antiga")
+
+    estrutural = utils.fatiar_por_artigos(texto, titulo, url, estrutural=True)
+    partes_ref = Counter(_chave(c) for c in referencia)
+    partes_novo = Counter(_chave(c) for c in estrutural)
+    if list(dict.fromkeys(_chave(c) for c in referencia)) != list(dict.fromkeys(_chave(c) for c in estrutural)):
+        erros.append("modo estrutural: sequência de artigos diferente")
+
+    campos_ref = {c["metadata"]["tipo"]: sorted(c["metadata"]) for c in referencia}
+    curtos_ref = {_chave(c): c for c in referencia if partes_ref[_chave(c)] == 1}
+    mudaram = 0
+    for chunk in estrutural:
+        chave, meta = _chave(chunk), chunk["metadata"]
+        if chave in curtos_ref and chunk != curtos_ref[chave]:
+            erros.append(f"modo estrutural: artigo {chave[1]} (curto) mudou")
+        if sorted(meta) != campos_ref.get(meta["tipo"]):
+            erros.append(f"modo estrutural: campos de metadados diferentes no artigo {chave[1]}")
+        conteudo = chunk["conteudo"].split("] ... ", 1)[-1] if meta.get("parte", 1) > 1 else chunk["conteudo"]
+        if utils._tokens(conteudo) > utils.CHUNK_TOKENS:
+            erros.append(f"modo estrutural: artigo {chave[1]} parte {meta.get('parte')} passa de {utils.CHUNK_TOKENS} tokens")
+
+    for chave, qtd in partes_novo.items():
+        partes = [c["metadata"].get("parte") for c in estrutural if _chave(c) == chave]
+        if chave[0] == "Artigo" and partes != list(range(1, qtd + 1)):
+            erros.append(f"modo estrutural: partes fora de ordem no artigo {chave[1]}: {partes}")
+        if qtd != partes_ref[chave]:
+            mudaram += 1
+            print(f"ℹ️ Art. {chave[1]}: {partes_ref[chave]} -> {qtd} partes")
+
+    print(f"📄 {titulo}: {len(referencia)} chunks antigos, {len(estrutural)} estruturais, "
+          f"{sum(1 for q in partes_ref.values() if q > 1)} artigos longos ({mudaram} mudaram de número de partes)")
+    return erros
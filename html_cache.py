@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Optional
+
+import requests
+
+# ==============================================================================
+# 1. CACHE EM DISCO DAS PÁGINAS DE LEI (GET CONDICIONAL)
+# ==============================================================================
+# Guarda o HTML bruto + ETag/Last-Modified + sha256 do corpo. Na próxima busca manda
+# If-None-Match / If-Modified-Since: se o servidor responder 304, nada é baixado.
+# HTML_CACHE_OFFLINE=1 nunca vai à rede (re-ingestão de testes e benchmarks).
+HTML_CACHE_DIR = os.getenv("HTML_CACHE_DIR", ".cache/html")
+HTML_CACHE_OFFLINE = os.getenv("HTML_CACHE_OFFLINE", "0") == "1"
+HTML_TIMEOUT = 15
+
+HEADERS_HTTP = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+class PaginaHtml:
+    """Resultado de uma busca: html (ou None), sha256 do corpo e de onde veio."""
+    def __init__(self, url: str, html: Optional[str], hash_corpo: Optional[str], origem: str, mudou: bool):
+        self.url = url
+        self.html = html
+        self.hash_corpo = hash_corpo
+        # "rede" (200), "304", "offline" ou "cache_erro" (rede falhou, usou a cópia)
+        self.origem = origem
+        # True se o corpo é diferente da última cópia em disco (ou não havia cópia)
+        self.mudou = mudou
+
+_stats = {"rede": 0, "304": 0, "offline": 0, "cache_erro": 0, "falhas": 0, "bytes_baixados": 0}
+_stats_lock = threading.Lock()
+
+def _contar(campo: str, valor: int = 1):
+    with _stats_lock:
+        _stats[campo] += valor
+
+def estatisticas() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+def _caminhos(url: str):
+    nome = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(HTML_CACHE_DIR, f"{nome}.html"), os.path.join(HTML_CACHE_DIR, f"{nome}.json")
+
+def _gravar_atomico(caminho: str, dados: bytes):
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(dados)
+    os.replace(tmp, caminho)
+
+def ler_meta(url: str) -> dict:
+    _, caminho_meta = _caminhos(url)
+    try:
+        with open(caminho_meta, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _gravar_meta(url: str, meta: dict):
+    os.makedirs(HTML_CACHE_DIR, exist_ok=True)
+    _, caminho_meta = _caminhos(url)
+    _gravar_atomico(caminho_meta, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+def _ler_corpo(url: str) -> Optional[bytes]:
+    caminho_html, _ = _caminhos(url)
+    try:
+        with open(caminho_html, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _decodificar(corpo: bytes) -> str:
+    # O planalto.gov.br serve latin-1 (mesma escolha do extract_html original)
+    return corpo.decode("latin-1")
+
+def baixar(url: str, offline: Optional[bool] = None) -> PaginaHtml:
+    offline = HTML_CACHE_OFFLINE if offline is None else offline
+    meta = ler_meta(url)
+    corpo_cache = _ler_corpo(url) if meta else None
+
+    if offline:
+        if corpo_cache is None:
+            print(f"⚠️ HTML CACHE: Modo offline e sem cópia de {url}")
+            _contar("falhas")
+            return PaginaHtml(url, None, None, "offline", False)
+        _contar("offline")
+        return PaginaHtml(url, _decodificar(corpo_cache), meta.get("sha256"), "offline", False)
+
+    headers = dict(HEADERS_HTTP)
+    if corpo_cache is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = requests.get(url, headers=headers, timeout=HTML_TIMEOUT)
+        if response.status_code == 304 and corpo_cache is not None:
+            _contar("304")
+            return PaginaHtml(url, _decodificar(corpo_cache), meta.get("sha256"), "304", False)
+
+        if response.status_code >= 400:
+            # Página de erro nunca vira cópia nem corpo ingerido: cai na cópia em disco (se houver) ou falha
+            raise requests.HTTPError(f"HTTP {response.status_code}")
+
+        corpo = response.content
+        _contar("rede")
+        _contar("bytes_baixados", len(corpo))
+    except Exception as e:
+        print(f"Erro ao ler {url}: {e}")
+        if corpo_cache is not None:
+            print(f"♻️ HTML CACHE: Usando cópia em disco de {url}")
+            _contar("cache_erro")
+            return PaginaHtml(url, _decodificar(corpo_cache), meta.get("sha256"), "cache_erro", False)
+        _contar("falhas")
+        return PaginaHtml(url, None, None, "rede", False)
+
+    hash_corpo = hashlib.sha256(corpo).hexdigest()
+    mudou = hash_corpo != meta.get("sha256")
+    try:
+        os.makedirs(HTML_CACHE_DIR, exist_ok=True)
+        if mudou:
+            _gravar_atomico(_caminhos(url)[0], corpo)
+        _gravar_meta(url, dict(
+            meta,
+            url=url,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            sha256=hash_corpo,
+            tamanho=len(corpo),
+        ))
+    except Exception as e:
+        print(f"⚠️ HTML CACHE: Falha ao gravar cópia de {url}: {e}")
+    return PaginaHtml(url, _decodificar(corpo), hash_corpo, "rede", mudou)
+
+# ==============================================================================
+# 2. MARCA DE INGESTÃO (PULA PARSE/FATIAMENTO SE A PÁGINA NÃO MUDOU)
+# ==============================================================================
+def hash_ingerido(url: str, versao: Optional[str] = None) -> Optional[str]:
+    """sha256 do HTML que foi ingerido com sucesso da última vez.
+
+    Com `versao` (utils.versao_processamento), só vale se a ingestão usou o mesmo
+    extrator/fatiamento: marca de outra versão (ou sem versão) devolve None.
+    """
+    meta = ler_meta(url)
+    if versao is not None and meta.get("versao_ingerida") != versao:
+        return None
+    return meta.get("sha256_ingerido")
+
+def marcar_ingerido(url: str, hash_corpo: Optional[str], versao: Optional[str] = None):
+    if not hash_corpo:
+        return
+    meta = ler_meta(url)
+    if not meta:
+        return
+    meta["sha256_ingerido"] = hash_corpo
+    meta["versao_ingerida"] = versao
+    try:
+        _gravar_meta(url, meta)
+    except Exception as e:
+        print(f"⚠️ HTML CACHE: Falha ao marcar ingestão de {url}: {e}")
@@ -1,11 +1,26 @@
 # ingestion.py
 from qdrant_client import QdrantClient, models
-from llama_index.core import VectorStoreIndex, StorageContext, Document, Settings
+from llama_index.core import Document, Settings
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
 from llama_index.vector_stores.qdrant import QdrantVectorStore
 import utils
+import html_cache
+import ingestion_jobs
+import qdrant_colecao
+import deduplicacao
+import areas_leis
 import LLM
+import Rag
 import os
-import math # Importante para cálculos de lote
+import json
+import time
+import uuid
+import hashlib
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from llama_index.core.ingestion import run_transformations
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,162 +29,829 @@ COLLECTION_NAME = "leis_v3"
 url = os.getenv("QDRANT_URL")
 # Timeout aumentado para evitar quedas em lotes grandes
 client = QdrantClient(url=url, timeout=300) 
+# Jobs e checkpoints da ingestão (retomada de execuções interrompidas)
+jobs = ingestion_jobs.RegistroJobs()
 
 # 1. VERIFICAÇÃO
 def verificar_se_url_existe(url_para_checar):
     try:
         if not client.collection_exists(COLLECTION_NAME): return False
-        res = client.count(
-            collection_name=COLLECTION_NAME,
-            count_filter=models.Filter(must=[models.FieldCondition(key="url_geral", match=models.MatchValue(value=url_para_checar))])
-        )
+        res = client.count(collection_name=COLLECTION_NAME, count_filter=deduplicacao.filtro_da_lei(url_para_checar))
         return res.count > 0
     except Exception: return False
 
-# 2. LISTAGEM
+# 2. LISTAGEM (REGISTRO DE LEIS)
+# A listagem lê a tabela leis do registro de jobs (O(nº de leis)). O registro é local
+# e o Qdrant é compartilhado: antes de confiar nele, a listagem compara o nº de pontos
+# da coleção (um count) com o de quando ele foi conferido. A varredura do Qdrant só
+# acontece para montar o registro de uma base anterior a ele, quando a contagem diverge
+# (outro worker gravou, ou uma ingestão caiu antes de atualizar o registro) ou sempre,
+# se o disco do registro estiver indisponível.
+def gerar_hash_lei(hashes_chunks) -> str:
+    """Hash do conteúdo da lei: independe da ordem dos pontos e de mudanças só no HTML."""
+    return hashlib.sha256("\n".join(sorted(h for h in hashes_chunks if h)).encode("utf-8")).hexdigest()
+
+def varrer_leis_no_qdrant() -> list:
+    if not client.collection_exists(COLLECTION_NAME): return []
+    leis = {}
+    next_offset = None
+    while True:
+        records, next_offset = client.scroll(
+            collection_name=COLLECTION_NAME, limit=500,
+            with_payload=["url_geral", "source", CAMPO_HASH, deduplicacao.CAMPO_PROVENIENCIA], with_vectors=False, offset=next_offset
+        )
+        for r in records:
+            # Trecho compartilhado conta para a lei dona do ponto e para as da proveniência
+            for dono in [r.payload] + (r.payload.get(deduplicacao.CAMPO_PROVENIENCIA) or []):
+                url_lei = dono.get("url_geral")
+                if not url_lei: continue
+                lei = leis.setdefault(url_lei, {"url": url_lei, "titulo": dono.get("source"), "total_chunks": 0, "hashes": set()})
+                lei["total_chunks"] += 1
+                lei["hashes"].add(dono.get(CAMPO_HASH))
+        if next_offset is None: break
+    # Checkpoint pendente = ingestão que não terminou
+    return [
+        {"url": l["url"], "titulo": l["titulo"], "total_chunks": l["total_chunks"],
+         "hash_conteudo": gerar_hash_lei(l["hashes"]), "completa": jobs.checkpoint(l["url"]) is None}
+        for l in leis.values()
+    ]
+
+def contar_pontos_da_colecao() -> int:
+    if not client.collection_exists(COLLECTION_NAME): return 0
+    return client.count(collection_name=COLLECTION_NAME, exact=True).count
+
+def reconstruir_registro_leis(pontos=None) -> list:
+    print("🗂️ REGISTRO: Montando o registro de leis a partir do Qdrant...")
+    # Contada antes da varredura: o que for gravado durante ela muda a contagem e remonta de novo
+    pontos = contar_pontos_da_colecao() if pontos is None else pontos
+    leis = varrer_leis_no_qdrant()
+    jobs.substituir_leis(leis, pontos)
+    return leis
+
+def listar_leis_no_banco() -> list:
+    """[{url, titulo, total_chunks, hash_conteudo, completa, ingerida_em}] das leis indexadas."""
+    try:
+        pontos = contar_pontos_da_colecao()
+        if jobs.registro_leis_montado() and jobs.pontos_do_registro() == pontos:
+            return jobs.leis()
+        return sorted(reconstruir_registro_leis(pontos), key=lambda l: (l["titulo"] or "", l["url"]))
+    except Exception as e:
+        print(f"❌ Erro ao listar leis: {e}")
+        return []
+
 def listar_urls_no_banco():
+    return [l["url"] for l in listar_leis_no_banco()]
+
+def atualizar_registro_lei(url_lei, titulo=None, hashes=None, completa=True):
+    """Grava a lei no registro com a contagem real de pontos (sem pontos, sai do registro)."""
     try:
-        if not client.collection_exists(COLLECTION_NAME): return []
-        unique_urls = set()
-        next_offset = None
-        while True:
-            records, next_offset = client.scroll(
-                collection_name=COLLECTION_NAME, limit=100, 
-                with_payload=["url_geral"], with_vectors=False, offset=next_offset
-            )
-            for r in records:
-                if r.payload.get("url_geral"): unique_urls.add(r.payload.get("url_geral"))
-            if next_offset is None: break
-        return list(unique_urls)
-    except: return []
-
-# 3. SALVAMENTO (Agora aceita lotes menores)
-def run_ingestion_batch(documentos_batch):
+        total = client.count(
+            collection_name=COLLECTION_NAME, exact=True, count_filter=deduplicacao.filtro_da_lei(url_lei)
+        ).count
+        if total:
+            jobs.registrar_lei(url_lei, titulo, total, gerar_hash_lei(hashes) if hashes else None, completa)
+        else:
+            jobs.remover_lei(url_lei)
+        conferir_registro()
+    except Exception as e:
+        print(f"⚠️ REGISTRO: Falha ao registrar {url_lei}: {e}")
+
+def conferir_registro():
     """
-    Processa apenas um lote de documentos para permitir atualização da UI.
+    Depois de uma gravação desta máquina no registro: a contagem atual passa a ser a de
+    referência. Um worker que grave noutra máquina no mesmo intervalo só é notado na
+    próxima mudança da contagem.
     """
-    vector_store = QdrantVectorStore(
-        collection_name=COLLECTION_NAME, 
-        url=url,
-        api_key="", # Se tiver api key, coloque os.getenv("QDRANT_API_KEY")
-        enable_hybrid=False, 
-        batch_size=64,
-    )
-    # StorageContext garante que estamos conectando ao Qdrant existente
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
-    
-    # show_progress=False pois nós controlamos o progresso no Streamlit
-    VectorStoreIndex.from_documents(
-        documentos_batch, 
-        storage_context=storage_context, 
-        show_progress=False 
+    jobs.marcar_pontos_do_registro(contar_pontos_da_colecao())
+
+# 2.1 IDENTIDADE DOS CHUNKS (ATUALIZAÇÃO INCREMENTAL)
+# Cada chunk vira um Document com id determinístico (url, artigo, parte) e um hash
+# do conteúdo. Numa atualização, só o que mudou é embedado de novo.
+CAMPO_HASH = "hash_conteudo"
+
+def gerar_id_chunk(url_lei, numero_artigo, parte, ocorrencia=0) -> str:
+    chave = f"{url_lei}#art{numero_artigo}#p{parte}"
+    if ocorrencia:
+        # Mesmo número repetido na lei (ex.: "Art. 5-A" também casa como 5)
+        chave += f"#{ocorrencia}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, chave))
+
+def gerar_hash_chunk(conteudo: str, metadata: dict) -> str:
+    base = json.dumps({"conteudo": conteudo, "metadata": metadata}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+def montar_documentos(chunks_dict, url_lei):
+    documentos = []
+    vistos = {}
+    for item in chunks_dict:
+        meta = item['metadata']
+        chave = (meta.get("numero_artigo"), meta.get("parte", 1))
+        ocorrencia = vistos.get(chave, 0)
+        vistos[chave] = ocorrencia + 1
+        metadata = dict(meta, **{CAMPO_HASH: gerar_hash_chunk(item['conteudo'], meta)})
+        documentos.append(Document(
+            id_=gerar_id_chunk(url_lei, chave[0], chave[1], ocorrencia),
+            text=item['conteudo'], metadata=metadata,
+            excluded_llm_metadata_keys=['url_geral', 'tipo', CAMPO_HASH],
+            excluded_embed_metadata_keys=['url_geral', CAMPO_HASH]
+        ))
+    return documentos
+
+def hashes_no_banco(url_lei) -> dict:
+    """
+    {hash_conteudo: quantidade de pontos} da lei no Qdrant (pontos antigos sem hash contam como None).
+    Trechos deduplicados contam pela entrada da lei na proveniência do ponto de outra lei.
+    """
+    contagem = {}
+    if not client.collection_exists(COLLECTION_NAME):
+        return contagem
+    next_offset = None
+    while True:
+        records, next_offset = client.scroll(
+            collection_name=COLLECTION_NAME, scroll_filter=deduplicacao.filtro_da_lei(url_lei), limit=500,
+            with_payload=["url_geral", CAMPO_HASH, deduplicacao.CAMPO_PROVENIENCIA], with_vectors=False, offset=next_offset
+        )
+        for r in records:
+            for dono in [r.payload] + (r.payload.get(deduplicacao.CAMPO_PROVENIENCIA) or []):
+                if dono.get("url_geral") == url_lei:
+                    h = dono.get(CAMPO_HASH)
+                    contagem[h] = contagem.get(h, 0) + 1
+        if next_offset is None:
+            break
+    return contagem
+
+def remover_chunks_obsoletos(url_lei, hashes_atuais):
+    """
+    Apaga pontos da lei cujo hash não está mais no texto atual (artigos alterados, sumidos ou sem hash).
+    Pontos compartilhados com outras leis não são apagados: a lei só sai da proveniência deles.
+    """
+    hashes_atuais = list(hashes_atuais)
+    client.delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=models.Filter(
+            must=[
+                models.FieldCondition(key="url_geral", match=models.MatchValue(value=url_lei)),
+                models.IsEmptyCondition(is_empty=models.PayloadField(key=deduplicacao.CAMPO_PROVENIENCIA)),
+            ],
+            must_not=[models.FieldCondition(key=CAMPO_HASH, match=models.MatchAny(any=hashes_atuais))] if hashes_atuais else [],
+        ),
     )
+    deduplicacao.desvincular(client, COLLECTION_NAME, url_lei, hashes_atuais)
 
-# 4. PROCESSAMENTO OTIMIZADO
-def processar_urls_stream(lista_urls: list):
-    Settings.embed_model = LLM.embed_model 
-    Settings.llm = LLM.llm_haiku
-    
-    total_urls = len(lista_urls)
-    fatia_por_url = 1.0 / total_urls
-    
-    # Definição de Pesos para Realismo
-    # Verificação (5%) + Download (10%) + Fatiamento (5%) + Indexação (80%)
-    PESO_SETUP = 0.20 
-    PESO_INDEXACAO = 0.80
-    
-    # Tamanho do lote de documentos para atualização da barra
-    BATCH_SIZE_DOCS = 20 
-
-    for i, url in enumerate(lista_urls):
-        base = i / total_urls # Onde começa esta URL na barra total (0.0 a 1.0)
-        
-        # --- ETAPA 1: VERIFICAÇÃO ---
-        yield {
-            "tipo": "info", 
-            "msg": f"🔍 [{i+1}/{total_urls}] Verificando: {url}...", 
-            "progresso": base + (fatia_por_url * 0.05)
+def ids_dos_nodes(nodes):
+    """Nodes filhos do mesmo Document ganham ids derivados do id dele (determinísticos)."""
+    contagem = {}
+    for node in nodes:
+        k = contagem.get(node.ref_doc_id, 0)
+        contagem[node.ref_doc_id] = k + 1
+        node.id_ = node.ref_doc_id if k == 0 else str(uuid.uuid5(uuid.UUID(node.ref_doc_id), str(k)))
+    return nodes
+
+# 3. SALVAMENTO (UM VECTOR STORE POR JOB, UPSERTS GRANDES)
+# O lote de upsert é independente do lote da barra de progresso (BATCH_SIZE_DOCS).
+INGEST_UPSERT_LOTE = int(os.getenv("INGEST_UPSERT_LOTE", "256"))
+# Requisições de upsert simultâneas
+INGEST_UPSERT_PARALELO = int(os.getenv("INGEST_UPSERT_PARALELO", "2"))
+# 0 = wait=False: o upsert volta assim que o Qdrant aceita o lote (mais vazão;
+# os pontos podem levar alguns instantes para aparecer na busca). Lote aceito ainda
+# não é lote gravado, então nesse modo os lotes não entram no checkpoint (a retomada
+# refaz a lei, com os vetores do cache de embeddings) e, antes da limpeza das versões
+# antigas, da marca de ingerida e do registro, a URL espera o Qdrant aplicar tudo
+# (GravadorQdrant.confirmar).
+INGEST_UPSERT_WAIT = os.getenv("INGEST_UPSERT_WAIT", "1") == "1"
+# Casa com nenhum ponto: a operação de confirmar() não mexe em nada
+_FILTRO_NENHUM_PONTO = models.Filter(must=[models.HasIdCondition(has_id=[])])
+
+class GravadorQdrant:
+    """
+    Mantém um único cliente e QdrantVectorStore para o job inteiro e junta os nodes
+    embedados em upserts de INGEST_UPSERT_LOTE pontos, com até INGEST_UPSERT_PARALELO
+    requisições em voo. ao_gravar(contexto, erro) é chamado por lote gravado;
+    ao_falhar(contexto, erro) recebe as exceções do próprio ao_gravar (sem ele, são relançadas).
+    """
+    def __init__(self, cliente=None, lote=INGEST_UPSERT_LOTE, paralelo=INGEST_UPSERT_PARALELO,
+                 esperar=INGEST_UPSERT_WAIT, ao_gravar=None, colecao=COLLECTION_NAME, ao_falhar=None):
+        self.cliente = cliente or client
+        self.colecao = colecao
+        self.lote = lote
+        self.esperar = esperar
+        self.ao_gravar = ao_gravar
+        self.ao_falhar = ao_falhar
+        self.vector_store = QdrantVectorStore(
+            collection_name=colecao,
+            client=self.cliente,
+            enable_hybrid=False,
+            batch_size=lote,
+        )
+        if self.vector_store._collection_initialized:
+            # Coleção anterior ao provisionamento: só faltam os índices de payload
+            qdrant_colecao.garantir_indices(self.cliente, colecao)
+        self._buffer = []
+        self._contextos = []
+        self._executor = ThreadPoolExecutor(max_workers=max(paralelo, 1), thread_name_prefix="ingest-upsert")
+        self._em_voo = threading.BoundedSemaphore(max(paralelo, 1) * 2)
+        # (futuro, contextos do lote)
+        self._futuros = []
+
+    def _pontos(self, nodes):
+        # Mesmo payload que o QdrantVectorStore.add monta (texto + metadados do node),
+        # mais as assinaturas usadas para achar este trecho como duplicata depois e a área
+        # da lei em leis.txt (filtro das buscas de cada agente especialista)
+        return [
+            models.PointStruct(
+                id=node.node_id,
+                vector=node.get_embedding(),
+                payload=dict(
+                    node_to_metadata_dict(node, remove_text=False, flat_metadata=self.vector_store.flat_metadata),
+                    **deduplicacao.campos_payload(node.get_content()),
+                    **{areas_leis.CAMPO_AREA: areas_leis.areas_do_ponto([node.metadata.get("url_geral")])},
+                ),
+            )
+            for node in nodes
+        ]
+
+    def _upsert(self, nodes, contextos):
+        erro = None
+        try:
+            if not self.vector_store._collection_initialized:
+                # Primeiro lote: cria a coleção com o perfil (QDRANT_PERFIL) e os índices de payload;
+                # se falhar, o add() do LlamaIndex cria com a configuração padrão
+                if qdrant_colecao.provisionar_colecao(self.cliente, self.colecao, len(nodes[0].get_embedding())):
+                    self.vector_store._collection_initialized = True
+                    self.cliente.upsert(collection_name=self.colecao, points=self._pontos(nodes), wait=self.esperar)
+                else:
+                    self.vector_store.add(nodes)
+            else:
+                self.cliente.upsert(collection_name=self.colecao, points=self._pontos(nodes), wait=self.esperar)
+        except Exception as e:
+            erro = e
+        finally:
+            self._em_voo.release()
+        if self.ao_gravar:
+            for contexto in contextos:
+                self.ao_gravar(contexto, erro)
+
+    def confirmar(self):
+        """
+        Com esperar=False, só volta quando o Qdrant aplicou os upserts já aceitos: uma
+        operação por filtro com wait=True entra na fila de cada shard depois deles.
+        Com esperar=True cada lote já voltou aplicado.
+        """
+        if not self.esperar:
+            self.cliente.delete(
+                collection_name=self.colecao,
+                points_selector=models.FilterSelector(filter=_FILTRO_NENHUM_PONTO),
+                wait=True,
+            )
+
+    def adicionar(self, nodes, contexto=None):
+        self._buffer.extend(nodes)
+        self._contextos.append(contexto)
+        if len(self._buffer) >= self.lote:
+            self.descarregar()
+
+    def _falhou(self, contextos, erro):
+        # Erro no ao_gravar (conclusão da URL, registro do lote...): sem isso a URL nunca terminava
+        if self.ao_falhar is None:
+            raise erro
+        for contexto in contextos:
+            self.ao_falhar(contexto, erro)
+
+    def _conferir_futuros(self, esperar=False):
+        pendentes = []
+        for futuro, contextos in self._futuros:
+            if not (esperar or futuro.done()):
+                pendentes.append((futuro, contextos))
+            elif futuro.exception() is not None:
+                self._falhou(contextos, futuro.exception())
+        self._futuros = pendentes
+
+    def descarregar(self):
+        """Envia o que estiver no buffer (chamado ao encher o lote ou quando a fila esvazia)."""
+        if self._buffer:
+            nodes, contextos = self._buffer, self._contextos
+            self._buffer, self._contextos = [], []
+            self._em_voo.acquire()
+            if not self.vector_store._collection_initialized:
+                # Criação da coleção não pode correr em paralelo
+                try:
+                    self._upsert(nodes, contextos)
+                except Exception as e:
+                    self._falhou(contextos, e)
+            else:
+                self._futuros.append((self._executor.submit(self._upsert, nodes, contextos), contextos))
+        self._conferir_futuros()
+
+    def fechar(self):
+        try:
+            self.descarregar()
+            self._conferir_futuros(esperar=True)
+        finally:
+            self._executor.shutdown(wait=True)
+
+# 4. PIPELINE CONCORRENTE (DOWNLOAD -> FATIAMENTO -> EMBEDDING -> GRAVAÇÃO)
+# Cada etapa tem seus próprios workers e as etapas conversam por filas limitadas:
+# enquanto uma lei é embedada, a próxima já está sendo baixada e fatiada.
+INGEST_DOWNLOADS = int(os.getenv("INGEST_DOWNLOADS", "4"))
+# Processos para extract_html + fatiar_por_artigos (0 = fatia na própria thread)
+INGEST_CPU_WORKERS = int(os.getenv("INGEST_CPU_WORKERS", "2"))
+INGEST_EMBEDS = int(os.getenv("INGEST_EMBEDS", "2"))
+INGEST_FILA_MAX = int(os.getenv("INGEST_FILA_MAX", "8"))
+
+# Tamanho do lote de documentos (embedding + atualização da barra); o upsert usa INGEST_UPSERT_LOTE
+BATCH_SIZE_DOCS = 20
+
+# Definição de Pesos para Realismo (por URL)
+# Verificação (5%) + Download (10%) + Fatiamento (5%) + Indexação (80%)
+PESO_VERIFICACAO = 0.05
+PESO_DOWNLOAD = 0.15
+PESO_SETUP = 0.20
+PESO_INDEXACAO = 0.80
+
+class MedidorEtapa:
+    """Vazão de uma etapa: itens processados / tempo de parede em que ela esteve ativa."""
+    def __init__(self, nome, unidade="docs"):
+        self.nome = nome
+        self.unidade = unidade
+        self.itens = 0
+        self.inicio = None
+        self.fim = None
+        self._lock = threading.Lock()
+
+    def registrar(self, inicio, itens):
+        with self._lock:
+            self.inicio = inicio if self.inicio is None else min(self.inicio, inicio)
+            self.fim = time.perf_counter()
+            self.itens += itens
+
+    def vazao(self):
+        if not self.itens or self.fim is None:
+            return 0.0
+        return self.itens / max(self.fim - self.inicio, 1e-9)
+
+class _EstadoUrl:
+    def __init__(self, indice, url):
+        self.indice = indice
+        self.url = url
+        self.fracao = 0.0
+        self.titulo = None
+        self.total_docs = 0
+        self.docs_gravados = 0
+        self.finalizado = False
+        # Atualização incremental
+        self.hash_html = None
+        self.hashes_atuais = set()
+        self.reaproveitados = 0
+        self.removidos = 0
+        # Trechos que já estavam no banco por outra lei (só ganharam proveniência)
+        self.deduplicados = 0
+        # Checkpoint: havia lotes de uma execução interrompida desta URL
+        self.retomada = False
+        self.lotes_gravados = {}
+
+class PipelineIngestao:
+    """
+    Executa as etapas em threads e entrega os eventos de progresso
+    (os mesmos dicts de antes) pelo gerador executar().
+    """
+    def __init__(self, lista_urls, atualizar=False, job_id=None):
+        self.atualizar = atualizar
+        self.job_id = job_id
+        self.estados = [_EstadoUrl(i, u) for i, u in enumerate(lista_urls)]
+        self.total_urls = len(lista_urls)
+        self.eventos = queue.Queue()
+        self.medidores = {
+            "download": MedidorEtapa("download", "URLs"),
+            "fatiamento": MedidorEtapa("fatiamento"),
+            "embedding": MedidorEtapa("embedding"),
+            "gravacao": MedidorEtapa("gravação"),
         }
-        
-        if verificar_se_url_existe(url):
-            yield {
-                "tipo": "warn", 
-                "msg": f"⏩ Já existe no banco: {url}", 
-                "progresso": base + fatia_por_url
-            }
-            continue
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._concluidas = 0
+        self._pool_cpu = None
+
+    # --- Progresso ---
+    def _rotulo(self, estado):
+        return f"[{estado.indice + 1}/{self.total_urls}]"
+
+    def _progresso_global(self):
+        return sum(e.fracao for e in self.estados) / self.total_urls
 
+    def _evento(self, estado, tipo, msg, fracao):
+        with self._lock:
+            estado.fracao = max(estado.fracao, min(fracao, 1.0))
+            self.eventos.put({"tipo": tipo, "msg": msg, "progresso": self._progresso_global()})
+
+    def _finalizar(self, estado, tipo, msg):
+        with self._lock:
+            if estado.finalizado:
+                return
+            estado.finalizado = True
         try:
-            # --- ETAPA 2: DOWNLOAD ---
-            yield {
-                "tipo": "info", 
-                "msg": f"📥 [{i+1}/{total_urls}] Baixando HTML...", 
-                "progresso": base + (fatia_por_url * 0.15)
-            }
-            
-            titulo, texto_bruto = utils.extract_html(url)
-            
-            if titulo == "Erro":
-                yield {"tipo": "error", "msg": f"❌ Falha de conexão: {url}", "progresso": base + fatia_por_url}
+            if tipo == "error" and (estado.docs_gravados or estado.retomada):
+                # Parte da lei ficou no Qdrant: aparece na listagem como incompleta (dá para excluir ou retomar)
+                atualizar_registro_lei(estado.url, estado.titulo, completa=False)
+            if self.job_id:
+                status = {"success": ingestion_jobs.CONCLUIDA, "warn": ingestion_jobs.PULADA}.get(tipo, ingestion_jobs.ERRO)
+                if status == ingestion_jobs.CONCLUIDA:
+                    jobs.remover_checkpoint(estado.url)
+                jobs.marcar_url(self.job_id, estado.url, status, msg)
+        except Exception as e:
+            # A URL conta como terminada de qualquer jeito: senão executar() nunca acaba
+            print(f"⚠️ Falha ao registrar o fim da URL {estado.url}: {e}")
+        with self._lock:
+            estado.fracao = 1.0
+            self.eventos.put({"tipo": tipo, "msg": msg, "progresso": self._progresso_global()})
+            self._concluidas += 1
+            if self._concluidas == self.total_urls:
+                self.eventos.put(None)
+
+    def _colocar(self, fila, item):
+        # Fila limitada: espera a etapa seguinte, mas desiste se o consumidor sumiu
+        while not self._parar.is_set():
+            try:
+                fila.put(item, timeout=0.5)
+                return
+            except queue.Full:
                 continue
-            
-            # --- ETAPA 3: FATIAMENTO (PREPARAÇÃO) ---
-            yield {
-                "tipo": "info", 
-                "msg": f"🔪 [{i+1}/{total_urls}] Fatiando artigos...", 
-                "progresso": base + (fatia_por_url * PESO_SETUP)
-            }
-            
-            chunks_dict = utils.fatiar_por_artigos(texto_bruto, titulo, url)
-            
-            documentos_totais = []
-            for item in chunks_dict:
-                doc = Document(
-                    text=item['conteudo'], metadata=item['metadata'],
-                    excluded_llm_metadata_keys=['url_geral', 'tipo'],
-                    excluded_embed_metadata_keys=['url_geral']
-                )
-                documentos_totais.append(doc)
-
-            # --- ETAPA 4: INDEXAÇÃO EM LOTES (AQUI ESTÁ A MÁGICA) ---
-            total_docs = len(documentos_totais)
-            
-            if total_docs > 0:
-                # Calcula quantos loops vamos fazer
-                num_batches = math.ceil(total_docs / BATCH_SIZE_DOCS)
-                
-                for b_idx in range(num_batches):
-                    start = b_idx * BATCH_SIZE_DOCS
-                    end = start + BATCH_SIZE_DOCS
-                    lote_atual = documentos_totais[start:end]
-                    
-                    # Calcula o progresso dentro da fase de indexação
-                    progresso_lote = (b_idx / num_batches)
-                    # Traduz isso para a barra global
-                    progresso_global = base + (fatia_por_url * PESO_SETUP) + (fatia_por_url * PESO_INDEXACAO * progresso_lote)
-                    
-                    yield {
-                        "tipo": "info", 
-                        "msg": f"🧠 [{i+1}/{total_urls}] Incorporando vetores: {start}/{total_docs} docs...", 
-                        "progresso": progresso_global
-                    }
-                    
-                    # Chama a função de ingestão apenas para esse pedaço
-                    run_ingestion_batch(lote_atual)
-
-                # --- ETAPA 5: CONCLUSÃO DESTA URL ---
-                yield {
-                    "tipo": "success", 
-                    "msg": f"✅ Sucesso: {titulo} ({total_docs} partes)", 
-                    "progresso": base + fatia_por_url
-                }
-            else:
-                yield {"tipo": "warn", "msg": f"⚠️ Arquivo vazio ou sem artigos identificados: {url}", "progresso": base + fatia_por_url}
-                
+
+    def _iniciar_etapa(self, nome, workers, entrada, saida, workers_saida, fn, ao_terminar=None):
+        """Sobe `workers` threads lendo de `entrada`; a última a sair repassa o fim para `saida`."""
+        restantes = [workers]
+
+        def _loop():
+            while not self._parar.is_set():
+                try:
+                    # Com timeout: depois de _parar (gerador abandonado) as threads saem mesmo sem o None
+                    item = entrada.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                estado = item[0]
+                try:
+                    fn(*item)
+                except Exception as e:
+                    print(f"Erro detalhado na URL {estado.url} ({nome}): {e}")
+                    self._finalizar(estado, "error", f"🔥 Erro crítico: {str(e)[:100]}...")
+            with self._lock:
+                restantes[0] -= 1
+                ultimo = restantes[0] == 0
+            if ultimo and ao_terminar is not None:
+                try:
+                    ao_terminar()
+                except Exception as e:
+                    print(f"Erro ao encerrar a etapa {nome}: {e}")
+            if ultimo and saida is not None:
+                for _ in range(workers_saida):
+                    self._colocar(saida, None)
+
+        for n in range(workers):
+            threading.Thread(target=_loop, name=f"ingest-{nome}-{n}", daemon=True).start()
+
+    # --- Etapas ---
+    def _baixar(self, estado):
+        rotulo = self._rotulo(estado)
+        self._evento(estado, "info", f"🔍 {rotulo} Verificando: {estado.url}...", PESO_VERIFICACAO)
+        existe = verificar_se_url_existe(estado.url)
+        # Com checkpoint, os pontos no banco são de uma ingestão que não terminou
+        estado.retomada = jobs.checkpoint(estado.url) is not None
+        if existe and not self.atualizar and not estado.retomada:
+            self._finalizar(estado, "warn", f"⏩ Já existe no banco: {estado.url}")
+            return
+        if estado.retomada:
+            self._evento(estado, "info", f"♻️ {rotulo} Retomando ingestão interrompida: {estado.url}", PESO_VERIFICACAO)
+
+        self._evento(estado, "info", f"📥 {rotulo} Baixando HTML...", PESO_DOWNLOAD)
+        inicio = time.perf_counter()
+        pagina = html_cache.baixar(estado.url)
+        self.medidores["download"].registrar(inicio, 1)
+        if pagina.html is None:
+            self._finalizar(estado, "error", f"❌ Falha de conexão: {estado.url}")
+            return
+
+        estado.hash_html = pagina.hash_corpo
+        if existe and pagina.hash_corpo and pagina.hash_corpo == html_cache.hash_ingerido(estado.url, utils.versao_processamento()):
+            # Mesma página, ingerida com o mesmo extrator/fatiamento: nem parse nem fatiamento
+            self._finalizar(estado, "success", f"✅ Sem alterações (página idêntica, {pagina.origem}): {estado.url}")
+            return
+        self._colocar(self._fila_cpu, (estado, pagina.html))
+
+    def _fatiar(self, estado, html):
+        self._evento(estado, "info", f"🔪 {self._rotulo(estado)} Fatiando artigos...", PESO_SETUP)
+        inicio = time.perf_counter()
+        if self._pool_cpu is not None:
+            titulo, chunks_dict = self._pool_cpu.submit(utils.preparar_lei, html, estado.url).result()
+        else:
+            titulo, chunks_dict = utils.preparar_lei(html, estado.url)
+        self.medidores["fatiamento"].registrar(inicio, len(chunks_dict))
+
+        documentos_totais = montar_documentos(chunks_dict, estado.url)
+        if not documentos_totais:
+            self._finalizar(estado, "warn", f"⚠️ Arquivo vazio ou sem artigos identificados: {estado.url}")
+            return
+
+        estado.titulo = titulo
+        estado.hashes_atuais = {d.metadata[CAMPO_HASH] for d in documentos_totais}
+        if self.atualizar:
+            # Diff por artigo: só embeda o que não está no banco com o mesmo hash
+            no_banco = hashes_no_banco(estado.url)
+            estado.removidos = sum(n for h, n in no_banco.items() if h not in estado.hashes_atuais)
+            novos = [d for d in documentos_totais if d.metadata[CAMPO_HASH] not in no_banco]
+            estado.reaproveitados = len(documentos_totais) - len(novos)
+            documentos_totais = novos
+            if not documentos_totais:
+                self._concluir_url(estado)
+                return
+
+        if deduplicacao.DEDUP_ATIVO:
+            documentos_totais = self._deduplicar(estado, documentos_totais)
+            if not documentos_totais:
+                self._concluir_url(estado)
+                return
+
+        estado.total_docs = len(documentos_totais)
+        if self.job_id:
+            # Lotes já gravados por uma execução anterior com a mesma lista de documentos são pulados
+            estado.lotes_gravados = jobs.iniciar_checkpoint(
+                estado.url, self.job_id, ingestion_jobs.assinatura_documentos(documentos_totais), estado.total_docs
+            )
+            jobs.marcar_url(self.job_id, estado.url, ingestion_jobs.INDEXANDO)
+        estado.docs_gravados = sum(estado.lotes_gravados.values())
+        if estado.docs_gravados >= estado.total_docs:
+            self._concluir_url(estado)
+            return
+        if estado.docs_gravados:
+            self._evento(
+                estado, "info",
+                f"⏭️ {self._rotulo(estado)} {estado.docs_gravados}/{estado.total_docs} docs já gravados antes da interrupção",
+                PESO_SETUP + PESO_INDEXACAO * estado.docs_gravados / estado.total_docs,
+            )
+        for start in range(0, estado.total_docs, BATCH_SIZE_DOCS):
+            if start in estado.lotes_gravados:
+                continue
+            self._colocar(self._fila_embed, (estado, start, documentos_totais[start:start + BATCH_SIZE_DOCS]))
+
+    def _deduplicar(self, estado, documentos):
+        """Tira os documentos que já existem no banco por outra lei e vincula a lei aos pontos deles."""
+        try:
+            if self.atualizar or estado.retomada:
+                # Pontos desta lei compartilhados com outras e que vão ser reescritos mudam de
+                # dono antes (o upsert com o mesmo id apagaria o trecho das outras leis)
+                deduplicacao.desvincular(client, COLLECTION_NAME, estado.url, estado.hashes_atuais)
+            achados = deduplicacao.buscar_duplicatas(client, COLLECTION_NAME, estado.url, documentos)
+            if not achados:
+                return documentos
+            deduplicacao.vincular(client, COLLECTION_NAME, [
+                (ponto, deduplicacao.entrada_proveniencia(documentos[i], similaridade, ponto))
+                for i, (ponto, similaridade) in achados.items()
+            ])
         except Exception as e:
-            # Em caso de erro, imprime no console pra ajudar a debugar
-            print(f"Erro detalhado na URL {url}: {e}")
-            yield {"tipo": "error", "msg": f"🔥 Erro crítico: {str(e)[:100]}...", "progresso": base + fatia_por_url}
+            # Sem deduplicação: a lei é gravada inteira, como antes
+            print(f"⚠️ DEDUP: Falha na URL {estado.url}: {e}")
+            return documentos
+        estado.deduplicados = len(achados)
+        self._evento(
+            estado, "info",
+            f"🧬 {self._rotulo(estado)} {estado.deduplicados} trechos já existem em outras leis (só ganharam a referência)",
+            PESO_SETUP,
+        )
+        return [d for i, d in enumerate(documentos) if i not in achados]
+
+    def _embedar(self, estado, start, lote):
+        if estado.finalizado:
+            return
+        progresso_lote = estado.docs_gravados / estado.total_docs
+        self._evento(
+            estado, "info",
+            f"🧠 {self._rotulo(estado)} Incorporando vetores: {start}/{estado.total_docs} docs...",
+            PESO_SETUP + PESO_INDEXACAO * progresso_lote,
+        )
+        inicio = time.perf_counter()
+        # Mesmo caminho do VectorStoreIndex.from_documents: transformações -> embedding
+        nodes = ids_dos_nodes(run_transformations(lote, Settings.transformations))
+        nodes = Settings.embed_model(nodes)
+        self.medidores["embedding"].registrar(inicio, len(lote))
+        self._colocar(self._fila_gravacao, (estado, start, len(lote), nodes))
+
+    def _gravar(self, estado, start, qtd_docs, nodes):
+        if estado.finalizado:
+            return
+        self._gravador.adicionar(nodes, (estado, start, qtd_docs, time.perf_counter()))
+        # Fila vazia: não segura nodes esperando o lote encher
+        if self._fila_gravacao.empty():
+            self._gravador.descarregar()
+
+    def _ao_gravar(self, contexto, erro):
+        estado, start, qtd_docs, inicio = contexto
+        if erro is None and self.job_id and self._gravador.esperar:
+            # Mesmo com a URL já finalizada por erro em outro lote: estes pontos estão no Qdrant.
+            # Com INGEST_UPSERT_WAIT=0 o lote só foi aceito, então não vira checkpoint
+            jobs.registrar_lote(estado.url, start, qtd_docs)
+        if estado.finalizado:
+            return
+        if erro is not None:
+            print(f"Erro detalhado na URL {estado.url} (gravação): {erro}")
+            self._finalizar(estado, "error", f"🔥 Erro crítico: {str(erro)[:100]}...")
+            return
+        self.medidores["gravacao"].registrar(inicio, qtd_docs)
+        with self._lock:
+            estado.docs_gravados += qtd_docs
+            completa = estado.docs_gravados >= estado.total_docs
+        if not completa:
+            self._evento(
+                estado, "info",
+                f"💾 {self._rotulo(estado)} Gravados {estado.docs_gravados}/{estado.total_docs} docs...",
+                PESO_SETUP + PESO_INDEXACAO * estado.docs_gravados / estado.total_docs,
+            )
+            return
+
+        self._concluir_url(estado)
+
+    def _encerrar_gravacao(self):
+        """Última etapa acabou: espera os upserts e fecha toda URL que ainda não terminou."""
+        try:
+            self._gravador.fechar()
+        finally:
+            for estado in self.estados:
+                if not estado.finalizado:
+                    self._finalizar(estado, "error", f"🔥 Ingestão não concluída: {estado.url}")
+
+    def _falha_gravacao(self, contexto, erro):
+        estado = contexto[0]
+        if estado.finalizado:
+            return
+        print(f"Erro detalhado na URL {estado.url} (conclusão): {erro}")
+        self._finalizar(estado, "error", f"🔥 Erro crítico: {str(erro)[:100]}...")
+
+    def _concluir_url(self, estado):
+        try:
+            # INGEST_UPSERT_WAIT=0: a limpeza e a marca de ingerida só depois dos upserts aplicados
+            self._gravador.confirmar()
+        except Exception as e:
+            print(f"Erro detalhado na URL {estado.url} (confirmação): {e}")
+            self._finalizar(estado, "error", f"🔥 Erro ao confirmar a gravação: {str(e)[:100]}...")
+            return
+        try:
+            # Retomada: a tentativa anterior pode ter gravado partes de uma versão antiga da página
+            if (self.atualizar and estado.removidos) or estado.retomada:
+                remover_chunks_obsoletos(estado.url, estado.hashes_atuais)
+        except Exception as e:
+            print(f"Erro detalhado na URL {estado.url} (limpeza): {e}")
+            self._finalizar(estado, "error", f"🔥 Erro ao remover artigos antigos: {str(e)[:100]}...")
+            return
+
+        html_cache.marcar_ingerido(estado.url, estado.hash_html, utils.versao_processamento())
+        atualizar_registro_lei(estado.url, estado.titulo, estado.hashes_atuais)
+        try:
+            # Partes reaproveitadas e trechos compartilhados também recebem a área atual de leis.txt
+            areas_leis.marcar_area(client, COLLECTION_NAME, estado.url)
+        except Exception as e:
+            print(f"⚠️ ÁREAS: Falha ao marcar a área de {estado.url}: {e}")
+        if not (estado.total_docs or estado.removidos or estado.deduplicados):
+            self._finalizar(estado, "success", f"✅ Sem alterações: {estado.titulo} ({estado.reaproveitados} partes)")
+            return
+
+        # Respostas em cache que usaram esta lei (ou que não acharam nada) ficam velhas
+        Rag.invalidar_cache_por_urls([estado.url])
+        dedup = f", {estado.deduplicados} já em outras leis" if estado.deduplicados else ""
+        if self.atualizar:
+            self._finalizar(
+                estado, "success",
+                f"✅ Atualizada: {estado.titulo} ({estado.total_docs} embedadas, "
+                f"{estado.reaproveitados} sem mudança, {estado.removidos} versões antigas removidas{dedup})"
+            )
+        else:
+            self._finalizar(estado, "success", f"✅ Sucesso: {estado.titulo} ({estado.total_docs} partes{dedup})")
+
+    # --- Execução ---
+    def executar(self):
+        if not self.estados:
+            return
+
+        self._fila_download = queue.Queue(maxsize=INGEST_FILA_MAX)
+        self._fila_cpu = queue.Queue(maxsize=INGEST_FILA_MAX)
+        self._fila_embed = queue.Queue(maxsize=INGEST_FILA_MAX)
+        self._fila_gravacao = queue.Queue(maxsize=INGEST_FILA_MAX)
+
+        workers_cpu = max(INGEST_CPU_WORKERS, 1)
+        if INGEST_CPU_WORKERS > 0:
+            # spawn: fork de um processo com threads (Streamlit) pode travar
+            self._pool_cpu = ProcessPoolExecutor(
+                max_workers=INGEST_CPU_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+            # Sobe os processos já, em paralelo com os primeiros downloads
+            for _ in range(INGEST_CPU_WORKERS):
+                self._pool_cpu.submit(int)
+
+        # Uma thread monta os lotes; o GravadorQdrant faz os upserts (em paralelo, se configurado)
+        self._gravador = GravadorQdrant(ao_gravar=self._ao_gravar, ao_falhar=self._falha_gravacao)
+        self._iniciar_etapa("gravacao", 1, self._fila_gravacao, None, 0, self._gravar, ao_terminar=self._encerrar_gravacao)
+        self._iniciar_etapa("embedding", INGEST_EMBEDS, self._fila_embed, self._fila_gravacao, 1, self._embedar)
+        self._iniciar_etapa("fatiamento", workers_cpu, self._fila_cpu, self._fila_embed, INGEST_EMBEDS, self._fatiar)
+        self._iniciar_etapa("download", INGEST_DOWNLOADS, self._fila_download, self._fila_cpu, workers_cpu, self._baixar)
+
+        def _alimentar():
+            for estado in self.estados:
+                self._colocar(self._fila_download, (estado,))
+            for _ in range(INGEST_DOWNLOADS):
+                self._colocar(self._fila_download, None)
+        threading.Thread(target=_alimentar, name="ingest-alimentador", daemon=True).start()
+
+        try:
+            while True:
+                evento = self.eventos.get()
+                if evento is None:
+                    break
+                yield evento
+        finally:
+            self._parar.set()
+            if self._pool_cpu is not None:
+                self._pool_cpu.shutdown(wait=False, cancel_futures=True)
+
+    def resumo_vazao(self) -> str:
+        return " | ".join(
+            f"{m.nome}: {m.vazao():.1f} {m.unidade}/s" for m in self.medidores.values() if m.itens
+        )
+
+def processar_urls_stream(lista_urls: list, atualizar: bool = False, job_id: str = None):
+    """
+    atualizar=False: URLs já no banco são puladas (comportamento original).
+    atualizar=True: baixa de novo e aplica só os artigos novos/alterados/removidos.
+    job_id: executa um job já registrado (da fila do worker ou interrompido), só com as
+    URLs que não terminaram; lista_urls é ignorada.
+    """
+    Settings.embed_model = LLM.embed_model_ingestao
+    Settings.llm = LLM.llm_haiku
+
+    if job_id:
+        job = jobs.carregar_job(job_id)
+        if job is None:
+            yield {"tipo": "error", "msg": f"❌ Job não encontrado: {job_id}", "progresso": 1.0}
+            yield {"tipo": "complete", "msg": "Processo Finalizado!", "progresso": 1.0}
+            return
+        lista_urls, atualizar = job["urls"], job["atualizar"]
+        jobs.marcar_job(job_id, ingestion_jobs.EXECUTANDO)
+        yield {"tipo": "info", "msg": f"🗂️ Job {job_id[:8]}: {len(lista_urls)} URLs pendentes", "progresso": 0.0}
+    else:
+        job_id = jobs.criar_job(lista_urls, atualizar)
+
+    html_antes = html_cache.estatisticas()
+    executor_antes = LLM.embed_executor.estatisticas() if LLM.embed_executor is not None else None
+    pipeline = PipelineIngestao(lista_urls, atualizar=atualizar, job_id=job_id)
+    batimento = jobs.manter_vivo(job_id)
+    terminou = False
+    try:
+        yield from pipeline.executar()
+        terminou = True
+    finally:
+        batimento.set()
+        # Gerador abandonado no meio (sessão do Streamlit caiu): o job fica para retomar
+        if not terminou:
+            jobs.marcar_job(job_id, ingestion_jobs.INTERROMPIDO)
+        else:
+            # URLs com erro continuam pendentes no job (e com checkpoint): dá para retomar depois
+            pendentes = (jobs.carregar_job(job_id) or {}).get("urls")
+            jobs.marcar_job(job_id, ingestion_jobs.COM_ERROS if pendentes else ingestion_jobs.CONCLUIDO)
+
+    if atualizar:
+        reaproveitados = sum(e.reaproveitados for e in pipeline.estados)
+        yield {"tipo": "info", "msg": f"♻️ Embeddings evitados pelo diff de artigos: {reaproveitados}", "progresso": 1.0}
+
+    resumo = pipeline.resumo_vazao()
+    if resumo:
+        print(f"⏱️ Vazão por etapa: {resumo}")
+        yield {"tipo": "info", "msg": f"⏱️ Vazão por etapa: {resumo}", "progresso": 1.0}
+
+    stats_html = {k: v - html_antes[k] for k, v in html_cache.estatisticas().items()}
+    yield {
+        "tipo": "info",
+        "msg": f"🌐 HTML: {stats_html['rede']} baixados ({stats_html['bytes_baixados'] / 1e6:.1f} MB) | {stats_html['304']} não modificados (304) | {stats_html['offline'] + stats_html['cache_erro']} do disco",
+        "progresso": 1.0
+    }
+
+    # Estatísticas do cache de embeddings (quantas chamadas ao Bedrock foram evitadas)
+    stats_embed = LLM.embed_model_ingestao.estatisticas()
+    yield {
+        "tipo": "info",
+        "msg": f"📊 Cache de embeddings: {stats_embed['hits_memoria'] + stats_embed['hits_disco']} hits / {stats_embed['misses']} misses ({stats_embed['hit_rate']:.0%})",
+        "progresso": 1.0
+    }
+
+    # Vazão das chamadas ao Bedrock neste job (só os misses do cache chegam lá)
+    if executor_antes is not None:
+        stats_exec = LLM.embed_executor.estatisticas()
+        chamadas = stats_exec["chamadas"] - executor_antes["chamadas"]
+        if chamadas:
+            tempo = stats_exec["tempo_ativo_s"] - executor_antes["tempo_ativo_s"]
+            msg = (
+                f"🚀 Bedrock: {chamadas} embeddings a {chamadas / max(tempo, 1e-9):.1f}/s | "
+                f"{stats_exec['throttles'] - executor_antes['throttles']} throttlings | "
+                f"concorrência atual {stats_exec['limite_atual']}"
+            )
+            print(msg)
+            yield {"tipo": "info", "msg": msg, "progresso": 1.0}
 
     # Garante 100% no final
     yield {"tipo": "complete", "msg": "Processo Finalizado!", "progresso": 1.0}
@@ -178,17 +860,11 @@ def processar_urls_stream(lista_urls: list):
 
 def excluir_lei_no_banco(url_para_excluir):
     try:
-        client.delete(
-            collection_name=COLLECTION_NAME,
-            points_selector=models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="url_geral", 
-                        match=models.MatchValue(value=url_para_excluir)
-                    )
-                ]
-            ),
-        )
+        # Pontos compartilhados com outras leis ficam (mudam de dono ou perdem a referência)
+        remover_chunks_obsoletos(url_para_excluir, [])
+        jobs.remover_lei(url_para_excluir)
+        conferir_registro()
+        Rag.invalidar_cache_por_urls([url_para_excluir])
         return True
     except Exception as e:
         print(f"❌ Erro ao excluir do Qdrant: {e}")
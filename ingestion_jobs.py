@@ -0,0 +1,413 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+# ==============================================================================
+# 1. JOBS DE INGESTÃO E CHECKPOINTS (SQLITE LOCAL)
+# ==============================================================================
+# Cada execução de processar_urls_stream é um job com o estado de cada URL.
+# Cada URL em indexação tem um checkpoint com os lotes já gravados no Qdrant.
+# Os ids dos pontos são determinísticos, então regravar um lote só sobrescreve.
+# Um job interrompido (sessão do Streamlit caiu, throttling do Bedrock...) é
+# retomado do último lote gravado em vez de recomeçar ou deixar a lei pela metade.
+# A tabela leis é o registro das leis no Qdrant (título, nº de chunks, hash), mantido
+# pela ingestão e pela exclusão: a listagem não precisa varrer a coleção inteira.
+INGEST_JOBS_PATH = os.getenv("INGEST_JOBS_PATH", ".cache/ingestao_jobs.sqlite3")
+# Job "executando" sem gravar nada há esse tempo é considerado morto (processo derrubado)
+INGEST_JOB_INATIVO_S = int(os.getenv("INGEST_JOB_INATIVO_S", "600"))
+# Enquanto o job roda, uma thread renova atualizado_em nesse intervalo: lei grande sem
+# evento por minutos (embedding com throttling) não é tomada por outro worker
+INGEST_JOB_BATIMENTO_S = float(os.getenv("INGEST_JOB_BATIMENTO_S", "30"))
+
+# Estados da URL dentro de um job
+PENDENTE = "pendente"
+INDEXANDO = "indexando"
+CONCLUIDA = "concluida"
+PULADA = "pulada"
+ERRO = "erro"
+
+# Estados do job
+ENFILEIRADO = "na_fila"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+COM_ERROS = "com_erros"
+INTERROMPIDO = "interrompido"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    atualizar INTEGER NOT NULL,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_urls (
+    job_id TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    msg TEXT,
+    PRIMARY KEY (job_id, url)
+);
+CREATE TABLE IF NOT EXISTS job_eventos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    msg TEXT NOT NULL,
+    progresso REAL NOT NULL,
+    criado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_eventos ON job_eventos (job_id, id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    url TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    assinatura TEXT NOT NULL,
+    total_docs INTEGER NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint_lotes (
+    url TEXT NOT NULL,
+    inicio INTEGER NOT NULL,
+    qtd_docs INTEGER NOT NULL,
+    PRIMARY KEY (url, inicio)
+);
+CREATE TABLE IF NOT EXISTS leis (
+    url TEXT PRIMARY KEY,
+    titulo TEXT,
+    total_chunks INTEGER NOT NULL,
+    hash_conteudo TEXT,
+    completa INTEGER NOT NULL,
+    ingerida_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+# Marca de que a tabela leis já foi montada a partir do Qdrant (migração de bases antigas)
+_META_REGISTRO_LEIS = "registro_leis_montado"
+# Nº de pontos da coleção quando o registro foi conferido com o Qdrant. O registro fica no
+# SQLite desta máquina e não é gravado na mesma transação que o Qdrant: outro worker, ou
+# uma ingestão que caiu entre as duas gravações, muda a contagem e o registro é remontado.
+_META_PONTOS_COLECAO = "registro_leis_pontos"
+
+def assinatura_documentos(documentos) -> str:
+    """Identifica a lista a embedar (ids + hashes, em ordem): os lotes só valem para a mesma lista."""
+    h = hashlib.sha256()
+    for doc in documentos:
+        h.update(doc.id_.encode("utf-8"))
+        h.update(json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+class RegistroJobs:
+    """Estado persistente dos jobs. Sem disco, funciona como no-op (a ingestão segue sem retomada)."""
+    def __init__(self, caminho: str = INGEST_JOBS_PATH):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            pasta = os.path.dirname(caminho)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_ESQUEMA)
+            self._conn.commit()
+        except Exception as e:
+            print(f"⚠️ JOBS: Disco indisponível ({e}). Ingestão sem checkpoints.")
+            self._conn = None
+
+    def _executar(self, sql: str, params=(), muitos: bool = False):
+        if self._conn is None:
+            return []
+        with self._lock:
+            try:
+                if muitos:
+                    self._conn.executemany(sql, params)
+                    linhas = []
+                else:
+                    linhas = self._conn.execute(sql, params).fetchall()
+                self._conn.commit()
+                return linhas
+            except Exception as e:
+                print(f"⚠️ JOBS: Falha no registro de jobs: {e}")
+                return []
+
+    # --- Jobs ---
+    def criar_job(self, urls: List[str], atualizar: bool, status: str = EXECUTANDO) -> str:
+        job_id = str(uuid.uuid4())
+        agora = time.time()
+        self._executar(
+            "INSERT INTO jobs (job_id, status, atualizar, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?)",
+            (job_id, status, int(atualizar), agora, agora),
+        )
+        self._executar(
+            "INSERT OR IGNORE INTO job_urls (job_id, posicao, url, status) VALUES (?, ?, ?, ?)",
+            [(job_id, i, u, PENDENTE) for i, u in enumerate(urls)], muitos=True,
+        )
+        return job_id
+
+    def carregar_job(self, job_id: str) -> Optional[dict]:
+        """Job com as URLs que ainda não terminaram (para retomar)."""
+        linhas = self._executar("SELECT status, atualizar FROM jobs WHERE job_id = ?", (job_id,))
+        if not linhas:
+            return None
+        status, atualizar = linhas[0]
+        urls = self._executar(
+            "SELECT url FROM job_urls WHERE job_id = ? AND status NOT IN (?, ?) ORDER BY posicao",
+            (job_id, CONCLUIDA, PULADA),
+        )
+        return {"job_id": job_id, "status": status, "atualizar": bool(atualizar), "urls": [u for (u,) in urls]}
+
+    def marcar_job(self, job_id: str, status: str):
+        self._executar(
+            "UPDATE jobs SET status = ?, atualizado_em = ? WHERE job_id = ?",
+            (status, time.time(), job_id),
+        )
+        if status in (EXECUTANDO, ENFILEIRADO):
+            # Retomada: URLs que estavam em andamento voltam para a fila
+            self._executar(
+                "UPDATE job_urls SET status = ? WHERE job_id = ? AND status = ?",
+                (PENDENTE, job_id, INDEXANDO),
+            )
+
+    def marcar_url(self, job_id: str, url: str, status: str, msg: Optional[str] = None):
+        self._executar(
+            "UPDATE job_urls SET status = ?, msg = ? WHERE job_id = ? AND url = ?",
+            (status, msg, job_id, url),
+        )
+        if status == CONCLUIDA:
+            # A lei pode ter sido terminada por outro job: some das pendências dos anteriores
+            self._executar(
+                "UPDATE job_urls SET status = ?, msg = ? WHERE url = ? AND job_id != ? AND status NOT IN (?, ?)",
+                (CONCLUIDA, f"Concluída pelo job {job_id[:8]}", url, job_id, CONCLUIDA, PULADA),
+            )
+        self._executar("UPDATE jobs SET atualizado_em = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def renovar_job(self, job_id: str):
+        """Sinal de vida do job em execução (só enquanto ainda estiver "executando")."""
+        self._executar(
+            "UPDATE jobs SET atualizado_em = ? WHERE job_id = ? AND status = ?",
+            (time.time(), job_id, EXECUTANDO),
+        )
+
+    def manter_vivo(self, job_id: str) -> threading.Event:
+        """Renova o job a cada INGEST_JOB_BATIMENTO_S até o Event devolvido ser setado (ou o processo morrer)."""
+        parar = threading.Event()
+        def _bater():
+            while not parar.wait(INGEST_JOB_BATIMENTO_S):
+                self.renovar_job(job_id)
+        threading.Thread(target=_bater, name=f"batimento-{job_id[:8]}", daemon=True).start()
+        return parar
+
+    def jobs_pendentes(self) -> List[dict]:
+        """
+        Jobs que não terminaram e podem ser retomados: interrompidos, com erro ou
+        "executando" sem atividade há INGEST_JOB_INATIVO_S (o processo morreu).
+        """
+        linhas = self._executar(
+            """
+            SELECT j.job_id, j.status, j.atualizar, j.criado_em, j.atualizado_em,
+                   COUNT(u.url), SUM(CASE WHEN u.status IN (?, ?) THEN 0 ELSE 1 END)
+            FROM jobs j JOIN job_urls u ON u.job_id = j.job_id
+            WHERE j.status NOT IN (?, ?) AND (j.status != ? OR j.atualizado_em < ?)
+            GROUP BY j.job_id ORDER BY j.criado_em DESC
+            """,
+            (CONCLUIDA, PULADA, CONCLUIDO, ENFILEIRADO, EXECUTANDO, time.time() - INGEST_JOB_INATIVO_S),
+        )
+        return [
+            {"job_id": job_id, "status": status, "atualizar": bool(atualizar), "criado_em": criado_em,
+             "atualizado_em": atualizado_em, "total_urls": total, "pendentes": pendentes}
+            for job_id, status, atualizar, criado_em, atualizado_em, total, pendentes in linhas
+            if pendentes
+        ]
+
+    # --- Fila (worker_ingestao.py) ---
+    def enfileirar_job(self, urls: List[str], atualizar: bool) -> str:
+        """A UI só enfileira; um worker_ingestao.py pega o job e grava o progresso em job_eventos."""
+        return self.criar_job(urls, atualizar, status=ENFILEIRADO)
+
+    def reenfileirar(self, job_id: str):
+        self.marcar_job(job_id, ENFILEIRADO)
+
+    def reservar_proximo_job(self) -> Optional[str]:
+        """
+        Pega o job mais antigo da fila (ou um "executando" cujo worker morreu) e marca como
+        executando. O UPDATE só vale se o status não mudou desde a leitura: dois workers
+        (mesmo em processos diferentes) nunca pegam o mesmo job.
+        """
+        if self._conn is None:
+            return None
+        with self._lock:
+            try:
+                linha = self._conn.execute(
+                    """
+                    SELECT job_id, status, atualizado_em FROM jobs
+                    WHERE status = ? OR (status = ? AND atualizado_em < ?)
+                    ORDER BY criado_em LIMIT 1
+                    """,
+                    (ENFILEIRADO, EXECUTANDO, time.time() - INGEST_JOB_INATIVO_S),
+                ).fetchone()
+                if linha is None:
+                    return None
+                job_id, status, atualizado_em = linha
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, atualizado_em = ? WHERE job_id = ? AND status = ? AND atualizado_em = ?",
+                    (EXECUTANDO, time.time(), job_id, status, atualizado_em),
+                )
+                self._conn.commit()
+                return job_id if cursor.rowcount == 1 else None
+            except Exception as e:
+                print(f"⚠️ JOBS: Falha ao reservar job: {e}")
+                return None
+
+    def registrar_evento(self, job_id: str, evento: dict):
+        """Evento de progresso do job (os mesmos dicts do processar_urls_stream). Serve de sinal de vida."""
+        agora = time.time()
+        self._executar(
+            "INSERT INTO job_eventos (job_id, tipo, msg, progresso, criado_em) VALUES (?, ?, ?, ?, ?)",
+            (job_id, evento["tipo"], evento["msg"], float(evento["progresso"]), agora),
+        )
+        self._executar("UPDATE jobs SET atualizado_em = ? WHERE job_id = ?", (agora, job_id))
+
+    def eventos(self, job_id: str, depois_de: int = 0) -> List[dict]:
+        linhas = self._executar(
+            "SELECT id, tipo, msg, progresso FROM job_eventos WHERE job_id = ? AND id > ? ORDER BY id",
+            (job_id, depois_de),
+        )
+        return [{"id": i, "tipo": tipo, "msg": msg, "progresso": progresso} for i, tipo, msg, progresso in linhas]
+
+    def jobs_recentes(self, limite: int = 5) -> List[dict]:
+        """Últimos jobs com o progresso e a mensagem do evento mais recente (para o painel da UI)."""
+        linhas = self._executar(
+            """
+            SELECT j.job_id, j.status, j.criado_em, e.tipo, e.msg, e.progresso
+            FROM jobs j
+            LEFT JOIN job_eventos e ON e.id = (SELECT MAX(id) FROM job_eventos WHERE job_id = j.job_id)
+            ORDER BY j.criado_em DESC LIMIT ?
+            """,
+            (limite,),
+        )
+        return [
+            {"job_id": job_id, "status": status, "criado_em": criado_em,
+             "tipo": tipo, "msg": msg, "progresso": progresso or 0.0}
+            for job_id, status, criado_em, tipo, msg, progresso in linhas
+        ]
+
+    # --- Checkpoints por URL (valem entre jobs) ---
+    def checkpoint(self, url: str) -> Optional[dict]:
+        linhas = self._executar(
+            "SELECT job_id, assinatura, total_docs FROM checkpoints WHERE url = ?", (url,)
+        )
+        if not linhas:
+            return None
+        job_id, assinatura, total_docs = linhas[0]
+        return {"job_id": job_id, "assinatura": assinatura, "total_docs": total_docs, "lotes": self._lotes(url)}
+
+    def _lotes(self, url: str) -> Dict[int, int]:
+        linhas = self._executar("SELECT inicio, qtd_docs FROM checkpoint_lotes WHERE url = ?", (url,))
+        return {inicio: qtd for inicio, qtd in linhas}
+
+    def iniciar_checkpoint(self, url: str, job_id: str, assinatura: str, total_docs: int) -> Dict[int, int]:
+        """
+        Abre (ou reabre) o checkpoint da URL e devolve {início do lote: docs} já gravados.
+        Se a lista de documentos mudou desde a última tentativa, os lotes antigos não valem.
+        """
+        anterior = self.checkpoint(url)
+        if anterior and anterior["assinatura"] == assinatura:
+            self._executar(
+                "UPDATE checkpoints SET job_id = ?, atualizado_em = ? WHERE url = ?",
+                (job_id, time.time(), url),
+            )
+            return anterior["lotes"]
+        self._executar("DELETE FROM checkpoint_lotes WHERE url = ?", (url,))
+        self._executar(
+            "INSERT OR REPLACE INTO checkpoints (url, job_id, assinatura, total_docs, atualizado_em) VALUES (?, ?, ?, ?, ?)",
+            (url, job_id, assinatura, total_docs, time.time()),
+        )
+        return {}
+
+    def registrar_lote(self, url: str, inicio: int, qtd_docs: int):
+        self._executar(
+            "INSERT OR REPLACE INTO checkpoint_lotes (url, inicio, qtd_docs) VALUES (?, ?, ?)",
+            (url, inicio, qtd_docs),
+        )
+        # Sinal de vida do job (ver INGEST_JOB_INATIVO_S)
+        self._executar(
+            "UPDATE jobs SET atualizado_em = ? WHERE job_id = (SELECT job_id FROM checkpoints WHERE url = ?)",
+            (time.time(), url),
+        )
+
+    def remover_checkpoint(self, url: str):
+        """Lei concluída: não há mais o que retomar."""
+        self._executar("DELETE FROM checkpoint_lotes WHERE url = ?", (url,))
+        self._executar("DELETE FROM checkpoints WHERE url = ?", (url,))
+
+    # --- Registro de leis (listagem da "Gestão de Leis" sem varrer o Qdrant) ---
+    def registrar_lei(self, url: str, titulo: Optional[str], total_chunks: int,
+                      hash_conteudo: Optional[str], completa: bool = True):
+        self._executar(
+            """
+            INSERT INTO leis (url, titulo, total_chunks, hash_conteudo, completa, ingerida_em) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET titulo = COALESCE(excluded.titulo, leis.titulo),
+                total_chunks = excluded.total_chunks, hash_conteudo = excluded.hash_conteudo,
+                completa = excluded.completa, ingerida_em = excluded.ingerida_em
+            """,
+            (url, titulo, total_chunks, hash_conteudo, int(completa), time.time()),
+        )
+
+    def remover_lei(self, url: str):
+        self._executar("DELETE FROM leis WHERE url = ?", (url,))
+
+    def leis(self) -> List[dict]:
+        linhas = self._executar(
+            "SELECT url, titulo, total_chunks, hash_conteudo, completa, ingerida_em FROM leis ORDER BY titulo, url"
+        )
+        return [
+            {"url": url, "titulo": titulo, "total_chunks": total, "hash_conteudo": h,
+             "completa": bool(completa), "ingerida_em": ingerida_em}
+            for url, titulo, total, h, completa, ingerida_em in linhas
+        ]
+
+    def registro_leis_montado(self) -> bool:
+        """False sem disco ou numa base anterior ao registro: quem lista precisa varrer o Qdrant."""
+        return bool(self._executar("SELECT 1 FROM meta WHERE chave = ?", (_META_REGISTRO_LEIS,)))
+
+    def pontos_do_registro(self) -> Optional[int]:
+        """Nº de pontos da coleção com que o registro confere (None: nunca conferido)."""
+        linhas = self._executar("SELECT valor FROM meta WHERE chave = ?", (_META_PONTOS_COLECAO,))
+        return int(linhas[0][0]) if linhas else None
+
+    def marcar_pontos_do_registro(self, pontos: int):
+        self._executar(
+            "INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)", (_META_PONTOS_COLECAO, str(pontos))
+        )
+
+    def substituir_leis(self, leis: List[dict], pontos: Optional[int] = None):
+        """Troca o registro inteiro numa transação (reconstrução a partir do Qdrant com `pontos` na coleção)."""
+        if self._conn is None:
+            return
+        agora = time.time()
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute("DELETE FROM leis")
+                    self._conn.executemany(
+                        "INSERT INTO leis (url, titulo, total_chunks, hash_conteudo, completa, ingerida_em) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(l["url"], l["titulo"], l["total_chunks"], l["hash_conteudo"], int(l["completa"]), agora) for l in leis],
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)", (_META_REGISTRO_LEIS, str(agora))
+                    )
+                    if pontos is not None:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)", (_META_PONTOS_COLECAO, str(pontos))
+                        )
+            except Exception as e:
+                print(f"⚠️ JOBS: Falha ao montar o registro de leis: {e}")
@@ -58,7 +58,8 @@ def _preparar_dependencias(state: WorkflowState) -> Agents.LegalDeps:
     return Agents.LegalDeps(
         query_engine=_engine_instance,
         historico_conversa=historico_limpo,
-        documento_texto=state.document_content or "Nenhum documento anexado."
+        documento_texto=state.document_content or "Nenhum documento anexado.",
+        perfil=state.classification_profile or "",
     )
 
 async def node_leitor(state: WorkflowState):
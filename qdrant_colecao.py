@@ -0,0 +1,245 @@
+# qdrant_colecao.py
+"""
+Provisionamento da coleção de leis no Qdrant: perfil de HNSW/armazenamento/quantização
+e índices de payload dos campos usados em filtros.
+
+Uso:
+    python qdrant_colecao.py                       # mostra o perfil e a configuração atual da coleção
+    python qdrant_colecao.py --aplicar             # cria a coleção / aplica o perfil numa coleção existente
+    python qdrant_colecao.py --perfil economico --aplicar
+"""
+import os
+import asyncio
+import argparse
+from typing import Optional
+
+from qdrant_client import QdrantClient, models
+from llama_index.core.vector_stores.types import VectorStoreQueryMode
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import areas_leis
+
+# ==============================================================================
+# 1. PERFIS DA COLEÇÃO
+# ==============================================================================
+# "padrao" é o que o QdrantVectorStore criava sozinho (HNSW padrão, float32 em RAM).
+# "economico": vetores originais em disco e cópia int8 em RAM (~4x menos memória);
+#   a busca roda no int8 e reordena os candidatos com os vetores originais (rescoring).
+# "preciso": grafo mais denso (mais recall, indexação mais lenta e mais memória).
+PERFIS = {
+    "padrao": {"m": 16, "ef_construct": 100, "vetores_em_disco": False, "quantizacao": "nenhuma"},
+    "economico": {"m": 16, "ef_construct": 100, "vetores_em_disco": True, "quantizacao": "int8"},
+    "preciso": {"m": 32, "ef_construct": 256, "vetores_em_disco": False, "quantizacao": "nenhuma"},
+}
+QDRANT_PERFIL = os.getenv("QDRANT_PERFIL", "padrao")
+# Ajustes finos por cima do perfil (vazio = valor do perfil)
+QDRANT_HNSW_M = os.getenv("QDRANT_HNSW_M", "")
+QDRANT_HNSW_EF_CONSTRUCT = os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "")
+QDRANT_VETORES_EM_DISCO = os.getenv("QDRANT_VETORES_EM_DISCO", "")
+# nenhuma | int8
+QDRANT_QUANTIZACAO = os.getenv("QDRANT_QUANTIZACAO", "")
+# Busca: ef do HNSW (0 = padrão do Qdrant) e candidatos extras reordenados no rescoring
+QDRANT_HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", "0"))
+QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+
+# Campos filtrados pela ingestão, exclusão, listagem e busca
+INDICES_PAYLOAD = {
+    "url_geral": models.PayloadSchemaType.KEYWORD,
+    "numero_artigo": models.PayloadSchemaType.KEYWORD,
+    "tipo": models.PayloadSchemaType.KEYWORD,
+    "source": models.PayloadSchemaType.KEYWORD,
+    "hash_conteudo": models.PayloadSchemaType.KEYWORD,
+    # Deduplicação entre leis (deduplicacao.py)
+    "urls_proveniencia": models.PayloadSchemaType.KEYWORD,
+    "hash_texto": models.PayloadSchemaType.KEYWORD,
+    "lsh_bandas": models.PayloadSchemaType.KEYWORD,
+    # Área da lei (areas_leis.py): filtro de todas as buscas dos agentes especialistas.
+    # Sem is_tenant: trecho compartilhado entre leis tem várias áreas, não um tenant só
+    areas_leis.CAMPO_AREA: models.PayloadSchemaType.KEYWORD,
+}
+
+_indices_garantidos = set()
+
+def configuracao(perfil: Optional[str] = None) -> dict:
+    """Perfil pedido (ou QDRANT_PERFIL com os ajustes do .env, se perfil=None)."""
+    nome = perfil or QDRANT_PERFIL
+    if nome not in PERFIS:
+        print(f"⚠️ QDRANT: Perfil desconhecido '{nome}'. Usando 'padrao'.")
+        nome = "padrao"
+    cfg = dict(PERFIS[nome], nome=nome)
+    if perfil is None:
+        if QDRANT_HNSW_M: cfg["m"] = int(QDRANT_HNSW_M)
+        if QDRANT_HNSW_EF_CONSTRUCT: cfg["ef_construct"] = int(QDRANT_HNSW_EF_CONSTRUCT)
+        if QDRANT_VETORES_EM_DISCO: cfg["vetores_em_disco"] = QDRANT_VETORES_EM_DISCO == "1"
+        if QDRANT_QUANTIZACAO: cfg["quantizacao"] = QDRANT_QUANTIZACAO
+    return cfg
+
+def _quantizacao(cfg: dict):
+    if cfg["quantizacao"] != "int8":
+        return None
+    return models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+    )
+
+def parametros_busca(cfg: Optional[dict] = None) -> Optional[models.SearchParams]:
+    cfg = cfg or configuracao()
+    quantizada = cfg["quantizacao"] == "int8"
+    if not QDRANT_HNSW_EF and not quantizada:
+        return None
+    return models.SearchParams(
+        hnsw_ef=QDRANT_HNSW_EF or None,
+        quantization=models.QuantizationSearchParams(rescore=True, oversampling=QDRANT_OVERSAMPLING) if quantizada else None,
+    )
+
+# ==============================================================================
+# 2. CRIAÇÃO, ÍNDICES E MIGRAÇÃO
+# ==============================================================================
+def garantir_indices(cliente: QdrantClient, colecao: str):
+    """Cria os índices de payload que faltarem (uma vez por processo e coleção)."""
+    if colecao in _indices_garantidos:
+        return
+    try:
+        existentes = cliente.get_collection(colecao).payload_schema or {}
+        for campo, tipo in INDICES_PAYLOAD.items():
+            if campo in existentes and getattr(existentes[campo].params, "is_tenant", None):
+                # Índice antigo da área criado como tenant: recria como keyword simples
+                print(f"⚙️ QDRANT: Recriando o índice de {campo} em {colecao} (sem is_tenant)")
+                cliente.delete_payload_index(colecao, field_name=campo, wait=True)
+                del existentes[campo]
+            if campo not in existentes:
+                cliente.create_payload_index(colecao, field_name=campo, field_schema=tipo, wait=True)
+        _indices_garantidos.add(colecao)
+    except Exception as e:
+        print(f"⚠️ QDRANT: Falha ao criar índices de payload em {colecao}: {e}")
+
+def provisionar_colecao(cliente: QdrantClient, colecao: str, dimensao: int,
+                        cfg: Optional[dict] = None, indices: bool = True) -> bool:
+    """Cria a coleção com o perfil (se não existir) e garante os índices. False se não conseguiu."""
+    cfg = cfg or configuracao()
+    try:
+        if not cliente.collection_exists(colecao):
+            try:
+                cliente.create_collection(
+                    collection_name=colecao,
+                    vectors_config=models.VectorParams(
+                        size=dimensao, distance=models.Distance.COSINE, on_disk=cfg["vetores_em_disco"]
+                    ),
+                    hnsw_config=models.HnswConfigDiff(m=cfg["m"], ef_construct=cfg["ef_construct"]),
+                    quantization_config=_quantizacao(cfg),
+                )
+                print(f"🧱 QDRANT: Coleção {colecao} criada (perfil {cfg['nome']})")
+                _indices_garantidos.discard(colecao)
+            except Exception as e:
+                # Outro processo (app/worker) criou ao mesmo tempo
+                if "already exists" not in str(e):
+                    raise
+        if indices:
+            garantir_indices(cliente, colecao)
+        return True
+    except Exception as e:
+        print(f"❌ QDRANT: Falha ao provisionar {colecao}: {e}")
+        return False
+
+def aplicar_perfil(cliente: QdrantClient, colecao: str, cfg: Optional[dict] = None):
+    """Aplica o perfil numa coleção existente (o Qdrant reconstrói o índice em background)."""
+    cfg = cfg or configuracao()
+    quantizacao = _quantizacao(cfg) or models.Disabled.DISABLED
+    cliente.update_collection(
+        collection_name=colecao,
+        vectors_config={"": models.VectorParamsDiff(on_disk=cfg["vetores_em_disco"])},
+        hnsw_config=models.HnswConfigDiff(m=cfg["m"], ef_construct=cfg["ef_construct"]),
+        quantization_config=quantizacao,
+    )
+    garantir_indices(cliente, colecao)
+
+# ==============================================================================
+# 3. BUSCA COM OS PARÂMETROS DO PERFIL
+# ==============================================================================
+class VectorStoreLeis(QdrantVectorStore):
+    """
+    QdrantVectorStore que envia hnsw_ef e o rescoring da quantização na busca densa
+    e junta o filtro de área do perfil que está buscando (areas_leis.escopo).
+    """
+    def _juntar_filtro_area(self, query, kwargs: dict):
+        filtro_area = areas_leis.filtro_da_busca()
+        if filtro_area is None:
+            return
+        base = kwargs.get("qdrant_filters")
+        if base is None:
+            base = self._build_query_filter(query)
+        kwargs["qdrant_filters"] = filtro_area if base is None else models.Filter(must=[base, filtro_area])
+
+    def _busca_com_parametros(self, query, kwargs: dict):
+        """
+        Junta o filtro de área e devolve (filtro, search_params) quando a busca densa leva os
+        parâmetros do perfil. None: a busca da base (sem parâmetros) já faz o mesmo.
+        """
+        self._juntar_filtro_area(query, kwargs)
+        params = parametros_busca()
+        if params is None or self.enable_hybrid or query.mode != VectorStoreQueryMode.DEFAULT:
+            return None
+        query_filter = kwargs.get("qdrant_filters")
+        if query_filter is None:
+            query_filter = self._build_query_filter(query)
+        return query_filter, params
+
+    def _buscar(self, query, query_filter, params):
+        # A busca densa da base, com search_params (o QdrantVectorStore não repassa esse argumento)
+        response = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=query.query_embedding,
+            limit=query.similarity_top_k,
+            query_filter=query_filter,
+            search_params=params,
+        )
+        return self.parse_to_query_result(response)
+
+    def query(self, query, **kwargs):
+        busca = self._busca_com_parametros(query, kwargs)
+        if busca is None:
+            return super().query(query, **kwargs)
+        return self._buscar(query, *busca)
+
+    async def aquery(self, query, **kwargs):
+        busca = self._busca_com_parametros(query, kwargs)
+        if busca is None:
+            return await super().aquery(query, **kwargs)
+        # Mesmos parâmetros do caminho síncrono; o app só passa o cliente síncrono
+        return await asyncio.to_thread(self._buscar, query, *busca)
+
+# ==============================================================================
+# 4. CLI
+# ==============================================================================
+def main():
+    import LLM
+    import ingestion
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perfil", choices=sorted(PERFIS), default=None, help="Padrão: QDRANT_PERFIL + ajustes do .env")
+    parser.add_argument("--aplicar", action="store_true", help="Cria a coleção ou atualiza a existente")
+    args = parser.parse_args()
+
+    cfg = configuracao(args.perfil)
+    cliente, colecao = ingestion.client, ingestion.COLLECTION_NAME
+    print(f"📐 Perfil {cfg['nome']}: {cfg}")
+    if args.aplicar:
+        if cliente.collection_exists(colecao):
+            aplicar_perfil(cliente, colecao, cfg)
+            print(f"✅ Perfil aplicado em {colecao} (reindexação em background)")
+        else:
+            provisionar_colecao(cliente, colecao, LLM.EMBED_DIM, cfg)
+    if not cliente.collection_exists(colecao):
+        print(f"ℹ️ Coleção {colecao} ainda não existe")
+        return
+    info = cliente.get_collection(colecao)
+    print(f"📊 {colecao}: {info.points_count} pontos, status {info.status}")
+    print(f"   HNSW: {info.config.hnsw_config}")
+    print(f"   Vetores: {info.config.params.vectors}")
+    print(f"   Quantização: {info.config.quantization_config}")
+    print(f"   Índices de payload: {sorted((info.payload_schema or {}).keys())}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark dos backends do cache semântico (Redis Stack x NumPy em processo).
+
+Usa vetores sintéticos (sem Bedrock): metade das consultas é uma versão
+levemente perturbada de uma pergunta já gravada (deve dar HIT) e a outra
+metade é aleatória (deve dar MISS), com o mesmo limiar 0.35 do Rag.py.
+
+O Redis usa um índice e prefixo próprios (idx:bench_cache / bench_cache:)
+e apaga tudo no final, sem tocar no cache real.
+
+Uso:
+    python scripts/benchmark_cache_backends.py --entradas 5000 --consultas 1000
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from cache_backends import SET_SEM_FONTE, BackendNumpy, BackendRedis
+
+LIMIAR_ACEITAVEL = 0.35
+
+def gerar_dados(entradas, consultas, dim, ruido, seed=42):
+    rng = np.random.default_rng(seed)
+    base = rng.standard_normal((entradas, dim)).astype(np.float32)
+    alvos = rng.integers(0, entradas, consultas // 2)
+    perto = base[alvos] + ruido * rng.standard_normal((len(alvos), dim)).astype(np.float32)
+    longe = rng.standard_normal((consultas - len(alvos), dim)).astype(np.float32)
+    consultas_vet = np.vstack([perto, longe])
+    esperado_hit = np.array([True] * len(alvos) + [False] * len(longe))
+    return base, consultas_vet, esperado_hit
+
+def medir(backend, base, consultas, esperado_hit):
+    inicio = time.perf_counter()
+    for i, v in enumerate(base):
+        backend.gravar(f"bench_cache:{i}", f"pergunta {i}", v.tolist(), f"resposta {i}", [], 0)
+    tempo_gravacao = time.perf_counter() - inicio
+
+    latencias, acertos = [], 0
+    for v, hit in zip(consultas, esperado_hit):
+        t0 = time.perf_counter()
+        entrada = backend.buscar(v.tolist())
+        latencias.append((time.perf_counter() - t0) * 1000)
+        deu_hit = entrada is not None and entrada["distancia"] < LIMIAR_ACEITAVEL
+        acertos += int(deu_hit == hit)
+
+    latencias.sort()
+    return {
+        "gravacoes_por_s": len(base) / tempo_gravacao,
+        "busca_p50_ms": statistics.median(latencias),
+        "busca_p95_ms": latencias[int(0.95 * (len(latencias) - 1))],
+        "acuracia_hit_miss": acertos / len(consultas),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entradas", type=int, default=5000)
+    parser.add_argument("--consultas", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--ruido", type=float, default=0.3, help="Perturbação das consultas 'quase iguais'")
+    parser.add_argument("--politica", default="lru", choices=["lru", "lfu"])
+    parser.add_argument("--sem-redis", action="store_true")
+    args = parser.parse_args()
+
+    base, consultas, esperado_hit = gerar_dados(args.entradas, args.consultas, args.dim, args.ruido)
+
+    resultados = {}
+    resultados["numpy"] = medir(
+        BackendNumpy(capacidade=args.entradas, politica=args.politica), base, consultas, esperado_hit
+    )
+
+    if not args.sem_redis:
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        try:
+            backend = BackendRedis(
+                redis_url=redis_url, index_name="idx:bench_cache", prefixo="bench_cache:",
+                dimensao=args.dim, ttl_segundos=3600, lock_ttl_ms=1000,
+            )
+            try:
+                resultados["redis"] = medir(backend, base, consultas, esperado_hit)
+            finally:
+                backend.cliente.ft("idx:bench_cache").dropindex(delete_documents=True)
+                backend.cliente.srem(SET_SEM_FONTE, *[f"bench_cache:{i}" for i in range(args.entradas)])
+        except Exception as e:
+            print(f"⚠️ Redis indisponível, pulando: {e}")
+
+    print(f"\n=== {args.entradas} entradas | {args.consultas} consultas | dim {args.dim} ===")
+    for nome, metricas in resultados.items():
+        linha = " | ".join(f"{k}={v:.3f}" for k, v in metricas.items())
+        print(f"{nome:>6}: {linha}")
+
+if __name__ == "__main__":
+    main()
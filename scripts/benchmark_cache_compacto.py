@@ -0,0 +1,218 @@
+"""
+Benchmark do layout compacto do cache semântico no Redis.
+
+Para cada configuração (tipo do vetor, dimensão, compressão da resposta) mede:
+- memória por entrada (MEMORY USAGE do HASH + índice vetorial do FT.INFO);
+- recall dos hits: fração dos hits da referência (FLOAT32, dimensão cheia,
+  busca exata) que continuam dando hit no mesmo vizinho, e hits novos (falsos);
+- latência da busca (p50/p95).
+
+Fontes de vetores:
+- sintética (padrão): vetores aleatórios; consultas "quase iguais" a entradas
+  gravadas e consultas aleatórias. Só compara FLOAT32 x FLOAT16 e compressão.
+- --bedrock: perguntas + paráfrases embedadas pelo Titan v2 em 1024/512/256,
+  para medir também o efeito da dimensão reduzida.
+
+As respostas gravadas vêm do cache real (cache:*) quando existir; senão, texto sintético.
+Cada configuração usa um índice próprio (idx:bench_compacto_<n>) apagado no final.
+
+Uso:
+    python scripts/benchmark_cache_compacto.py --entradas 5000
+    python scripts/benchmark_cache_compacto.py --bedrock --perguntas pares.txt
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import numpy as np
+import redis
+
+from cache_backends import SET_SEM_FONTE, BackendRedis
+
+LIMIAR_ACEITAVEL = 0.35
+
+PARES_PADRAO = [
+    ("Qual o prazo para pagamento das verbas rescisórias?", "Em quantos dias a empresa tem que pagar a rescisão?"),
+    ("Qual o limite de faturamento do Simples Nacional para EPP?", "Até quanto uma EPP pode faturar no Simples?"),
+    ("Quais os requisitos para contratar um estagiário?", "O que preciso para admitir estagiário?"),
+    ("Como funciona a distribuição de dividendos na S.A.?", "Regras de pagamento de dividendos em sociedade anônima"),
+    ("O que a lei diz sobre teletrabalho e controle de jornada?", "Home office tem controle de ponto?"),
+    ("Quantos dias de férias o empregado tem direito?", "Qual a duração das férias do trabalhador CLT?"),
+    ("Qual o valor da multa do FGTS na demissão sem justa causa?", "Quanto é a multa rescisória do FGTS?"),
+    ("Quem pode ser MEI?", "Quais atividades podem se formalizar como microempreendedor individual?"),
+    ("Como é feita a convocação da assembleia geral?", "Qual o procedimento para convocar assembleia de acionistas?"),
+    ("Qual o intervalo mínimo para almoço na jornada de 8 horas?", "Quanto tempo de intervalo intrajornada é obrigatório?"),
+]
+PERGUNTAS_DISTANTES = [
+    "Qual a capital da Austrália?",
+    "Como fazer pão de fermentação natural?",
+    "Quem ganhou a Copa do Mundo de 1970?",
+    "Qual a distância da Terra até a Lua?",
+    "Como trocar o pneu de uma bicicleta?",
+]
+
+FRASES_SINTETICAS = [
+    "Nos termos do art. 477 da CLT, o pagamento das verbas rescisórias deve ser efetuado em até dez dias.",
+    "A inobservância do prazo sujeita o empregador à multa prevista no § 8º do mesmo artigo.",
+    "O enquadramento como empresa de pequeno porte depende da receita bruta auferida no ano-calendário.",
+    "A Lei Complementar nº 123/2006 estabelece o tratamento diferenciado às microempresas.",
+    "O estágio não cria vínculo empregatício de qualquer natureza, observados os requisitos legais.",
+    "Compete à assembleia geral deliberar sobre a destinação do lucro líquido do exercício.",
+    "O teletrabalho deverá constar expressamente do contrato individual de trabalho.",
+    "Fonte: trecho recuperado da base de leis, sem interpretação adicional.",
+]
+
+def respostas_para_gravar(cliente, quantidade, seed=7):
+    """Usa respostas reais do cache v1 quando houver; senão, gera texto parecido."""
+    reais = []
+    for chave in cliente.scan_iter(match="cache:*", count=500):
+        resposta = cliente.hget(chave, "resposta")
+        if resposta:
+            reais.append(resposta.decode("utf-8"))
+        if len(reais) >= 500:
+            break
+    rng = random.Random(seed)
+    if reais:
+        print(f"📄 Usando {len(reais)} respostas reais do cache como payload.")
+        return [rng.choice(reais) for _ in range(quantidade)]
+    print("📄 Cache real vazio: usando respostas sintéticas (~1.5 KB).")
+    return [" ".join(rng.choice(FRASES_SINTETICAS) for _ in range(16)) for _ in range(quantidade)]
+
+# --- Fontes de vetores: {dimensao: (base, consultas)} ---
+def vetores_sinteticos(entradas, consultas, dim, ruido, seed=42):
+    rng = np.random.default_rng(seed)
+    base = rng.standard_normal((entradas, dim)).astype(np.float32)
+    alvos = rng.integers(0, entradas, consultas // 2)
+    perto = base[alvos] + ruido * rng.standard_normal((len(alvos), dim)).astype(np.float32)
+    longe = rng.standard_normal((consultas - len(alvos), dim)).astype(np.float32)
+    return {dim: (base, np.vstack([perto, longe]))}
+
+def vetores_bedrock(pares, dimensoes):
+    from llama_index.embeddings.bedrock import BedrockEmbedding
+
+    originais = [p for p, _ in pares]
+    consultas = [q for _, q in pares] + PERGUNTAS_DISTANTES
+    resultado = {}
+    for dim in dimensoes:
+        modelo = BedrockEmbedding(model="amazon.titan-embed-text-v2:0", additional_kwargs={"dimensions": dim})
+        base = np.array(modelo.get_text_embedding_batch(originais), dtype=np.float32)
+        cons = np.array([modelo.get_query_embedding(q) for q in consultas], dtype=np.float32)
+        resultado[dim] = (base, cons)
+    return resultado
+
+def vizinhos_exatos(base, consultas):
+    """Referência: busca exata em float32 (id do vizinho e se deu hit)."""
+    b = base / np.linalg.norm(base, axis=1, keepdims=True)
+    c = consultas / np.linalg.norm(consultas, axis=1, keepdims=True)
+    sims = c @ b.T
+    ids = sims.argmax(axis=1)
+    return ids, (1.0 - sims[np.arange(len(ids)), ids]) < LIMIAR_ACEITAVEL
+
+def memoria_por_entrada(backend, chaves):
+    amostra = chaves[:200]
+    hash_bytes = statistics.mean(backend.cliente.memory_usage(c) or 0 for c in amostra)
+    info = backend.cliente.ft(backend.index_name).info()
+    mb = info.get("vector_index_sz_mb", info.get(b"vector_index_sz_mb", 0))
+    indice_bytes = float(mb) * 1024 * 1024 / max(len(chaves), 1)
+    return hash_bytes, indice_bytes
+
+def medir(redis_url, n, tipo, compressao, base, consultas, respostas, referencia):
+    indice, prefixo = f"idx:bench_compacto_{n}", f"bench_compacto_{n}:"
+    backend = BackendRedis(
+        redis_url=redis_url, index_name=indice, prefixo=prefixo, dimensao=base.shape[1],
+        ttl_segundos=3600, lock_ttl_ms=1000, tipo_vetor=tipo, compressao=compressao,
+    )
+    chaves = [f"{prefixo}{i}" for i in range(len(base))]
+    try:
+        for chave, v, resposta in zip(chaves, base, respostas):
+            backend.gravar(chave, "pergunta", v.tolist(), resposta, [], 0)
+        time.sleep(0.5)  # indexação é assíncrona no Redis
+
+        latencias, hits = [], []
+        for v in consultas:
+            t0 = time.perf_counter()
+            entrada = backend.buscar(v.tolist())
+            latencias.append((time.perf_counter() - t0) * 1000)
+            hits.append(entrada is not None and entrada["distancia"] < LIMIAR_ACEITAVEL)
+
+        # A entrada não traz a chave: refaz o KNN cru (fora da medição) para saber o vizinho
+        ids = []
+        for v in consultas:
+            params = {"query_vector": backend._vetor_para_bytes(v.tolist())}
+            docs = backend.cliente.ft(indice).search(backend._query_knn(), query_params=params).docs
+            ids.append(int(docs[0].id[len(prefixo):]) if docs else None)
+
+        ref_ids, ref_hits = referencia
+        mantidos = sum(1 for i, h in enumerate(hits) if h and ref_hits[i] and ids[i] == ref_ids[i])
+        falsos = sum(1 for i, h in enumerate(hits) if h and not ref_hits[i])
+        hash_bytes, indice_bytes = memoria_por_entrada(backend, chaves)
+        latencias.sort()
+        return {
+            "bytes_hash": hash_bytes,
+            "bytes_indice": indice_bytes,
+            "bytes_total": hash_bytes + indice_bytes,
+            "recall_hits": mantidos / max(int(ref_hits.sum()), 1),
+            "hits_falsos": falsos,
+            "busca_p50_ms": statistics.median(latencias),
+            "busca_p95_ms": latencias[int(0.95 * (len(latencias) - 1))],
+        }
+    finally:
+        backend.cliente.ft(indice).dropindex(delete_documents=True)
+        backend.cliente.srem(SET_SEM_FONTE, *chaves)
+        backend.cliente.delete(f"rag:dimensao:{indice}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entradas", type=int, default=5000)
+    parser.add_argument("--consultas", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--ruido", type=float, default=0.3)
+    parser.add_argument("--bedrock", action="store_true", help="Usa Titan v2 real em 1024/512/256")
+    parser.add_argument("--perguntas", help="Arquivo com 'pergunta | paráfrase' por linha (com --bedrock)")
+    args = parser.parse_args()
+
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    cliente = redis.Redis.from_url(redis_url)
+
+    if args.bedrock:
+        pares = PARES_PADRAO
+        if args.perguntas:
+            with open(args.perguntas, encoding="utf-8") as f:
+                pares = [tuple(p.strip() for p in linha.split("|", 1)) for linha in f if "|" in linha]
+        fontes = vetores_bedrock(pares, (args.dim, 512, 256))
+    else:
+        fontes = vetores_sinteticos(args.entradas, args.consultas, args.dim, args.ruido)
+        print("ℹ️ Fonte sintética: dimensão reduzida só é medida com --bedrock.")
+
+    # A referência é sempre a dimensão cheia em float32 (busca exata)
+    referencia = vizinhos_exatos(*fontes[args.dim])
+    respostas = respostas_para_gravar(cliente, len(fontes[args.dim][0]))
+
+    configuracoes = [("FLOAT32", args.dim, "nenhuma"), ("FLOAT16", args.dim, "nenhuma"),
+                     ("FLOAT32", args.dim, "zlib"), ("FLOAT16", args.dim, "zlib"), ("FLOAT16", args.dim, "zstd")]
+    for dim in fontes:
+        if dim != args.dim:
+            configuracoes += [("FLOAT32", dim, "zlib"), ("FLOAT16", dim, "zlib")]
+
+    resultados = {}
+    for n, (tipo, dim, compressao) in enumerate(configuracoes):
+        base, consultas = fontes[dim]
+        resultados[f"{tipo}/{dim}/{compressao}"] = medir(
+            redis_url, n, tipo, compressao, base, consultas, respostas, referencia
+        )
+
+    print(f"\n=== {len(fontes[args.dim][0])} entradas | {len(fontes[args.dim][1])} consultas ===")
+    for nome, metricas in resultados.items():
+        linha = " | ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in metricas.items())
+        print(f"{nome:>22}: {linha}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark dos perfis da coleção de leis (qdrant_colecao.PERFIS).
+
+Para cada perfil cria uma coleção própria (bench_colecao) com pontos sintéticos
+parecidos com os artigos de lei e mede:
+- memória: estimativa (vetores em RAM + cópia int8 + grafo HNSW) e, com servidor,
+  o memory_resident_bytes do /metrics antes e depois de carregar;
+- count filtrado por url_geral (o que verificar_se_url_existe faz) e busca
+  filtrada por lei, com e sem índices de payload ("sem_indices" = coleção como o
+  QdrantVectorStore criava);
+- busca densa (top-k) e recall@k contra a busca exata.
+
+O Qdrant em memória do qdrant-client não tem HNSW, quantização nem índices de
+payload: sem --qdrant-url os números só servem para conferir o script.
+
+Uso:
+    python scripts/benchmark_colecao_qdrant.py --qdrant-url http://localhost:6333 --pontos 50000
+    python scripts/benchmark_colecao_qdrant.py --perfis padrao,economico --consultas 500
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import requests
+from qdrant_client import QdrantClient, models
+
+import qdrant_colecao
+
+COLECAO = "bench_colecao"
+
+def gerar_pontos(quantidade, dim, leis, seed=42):
+    rng = np.random.default_rng(seed)
+    # Vetores agrupados por lei (artigos da mesma lei são parecidos), como no corpus real
+    centros = rng.standard_normal((leis, dim)).astype(np.float32)
+    lei_de = rng.integers(0, leis, quantidade)
+    vetores = centros[lei_de] + 0.8 * rng.standard_normal((quantidade, dim)).astype(np.float32)
+    vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+    pontos = [
+        models.PointStruct(
+            id=i,
+            vector=vetores[i].tolist(),
+            payload={
+                "url_geral": f"http://bench/lei/{lei_de[i]}", "source": f"Lei de Teste {lei_de[i]}",
+                "tipo": "Artigo", "numero_artigo": str(i % 400), "parte": 1,
+                "text": "Texto do artigo da lei com conteúdo jurídico. " * 6,
+            },
+        )
+        for i in range(quantidade)
+    ]
+    return pontos, vetores
+
+def memoria_residente(url):
+    """memory_resident_bytes do /metrics do servidor (None em memória ou sem o endpoint)."""
+    if not url:
+        return None
+    try:
+        for linha in requests.get(f"{url.rstrip('/')}/metrics", timeout=5).text.splitlines():
+            if linha.startswith("memory_resident_bytes"):
+                return float(linha.split()[-1])
+    except Exception:
+        return None
+    return None
+
+def estimar_memoria_mb(pontos, dim, cfg):
+    """RAM dos vetores: float32 (se não estão em disco) + int8 da quantização + links do HNSW (nível 0: 2*m)."""
+    total = 0
+    if not cfg["vetores_em_disco"]:
+        total += pontos * dim * 4
+    if cfg["quantizacao"] == "int8":
+        total += pontos * dim
+    total += pontos * cfg["m"] * 2 * 4
+    return total / 1e6
+
+def esperar_indexacao(cliente, timeout=600):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < timeout:
+        if cliente.get_collection(COLECAO).status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print("⚠️ Coleção não ficou green dentro do tempo limite")
+
+def percentis(latencias):
+    ms = np.array(latencias) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 95)
+
+def medir(fn, entradas):
+    latencias = []
+    resultados = []
+    for entrada in entradas:
+        inicio = time.perf_counter()
+        resultados.append(fn(entrada))
+        latencias.append(time.perf_counter() - inicio)
+    return percentis(latencias), resultados
+
+def rodar_perfil(cliente, url, nome, pontos, vetores, args):
+    indices = nome != "sem_indices"
+    cfg = qdrant_colecao.configuracao("padrao" if not indices else nome)
+    if cliente.collection_exists(COLECAO):
+        cliente.delete_collection(COLECAO)
+    qdrant_colecao._indices_garantidos.discard(COLECAO)
+    mem_antes = memoria_residente(url)
+
+    inicio = time.perf_counter()
+    qdrant_colecao.provisionar_colecao(cliente, COLECAO, args.dim, cfg, indices=indices)
+    for i in range(0, len(pontos), 256):
+        cliente.upsert(COLECAO, points=pontos[i:i + 256], wait=True)
+    esperar_indexacao(cliente)
+    carga = time.perf_counter() - inicio
+    mem_depois = memoria_residente(url)
+
+    rng = np.random.default_rng(7)
+    consultas = vetores[rng.integers(0, len(vetores), args.consultas)] + 0.05 * rng.standard_normal((args.consultas, args.dim))
+    urls = [f"http://bench/lei/{i}" for i in rng.integers(0, args.leis, args.consultas)]
+    params = qdrant_colecao.parametros_busca(cfg)
+
+    def filtro(u):
+        return models.Filter(must=[models.FieldCondition(key="url_geral", match=models.MatchValue(value=u))])
+
+    (count_p50, count_p95), _ = medir(lambda u: cliente.count(COLECAO, count_filter=filtro(u), exact=True).count, urls)
+    (filt_p50, filt_p95), _ = medir(
+        lambda par: cliente.search(COLECAO, query_vector=par[0].tolist(), query_filter=filtro(par[1]),
+                                   limit=args.top_k, search_params=params),
+        list(zip(consultas, urls)),
+    )
+    (busca_p50, busca_p95), aproximados = medir(
+        lambda q: cliente.search(COLECAO, query_vector=q.tolist(), limit=args.top_k, search_params=params),
+        consultas,
+    )
+    _, exatos = medir(
+        lambda q: cliente.search(COLECAO, query_vector=q.tolist(), limit=args.top_k,
+                                 search_params=models.SearchParams(exact=True)),
+        consultas,
+    )
+    recall = np.mean([
+        len({p.id for p in a} & {p.id for p in e}) / max(len(e), 1) for a, e in zip(aproximados, exatos)
+    ])
+    medida = f"{(mem_depois - mem_antes) / 1e6:8.1f}" if mem_antes is not None and mem_depois is not None else "       -"
+    print(
+        f"{nome:>12} | {estimar_memoria_mb(len(pontos), args.dim, cfg):8.1f} | {medida} | {carga:7.1f} | "
+        f"{count_p50:6.2f} / {count_p95:6.2f} | {filt_p50:6.2f} / {filt_p95:6.2f} | "
+        f"{busca_p50:6.2f} / {busca_p95:6.2f} | {recall:6.3f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-url", default=None, help="Sem URL, usa o Qdrant em memória do qdrant-client")
+    parser.add_argument("--pontos", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--leis", type=int, default=40)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--perfis", default="sem_indices," + ",".join(qdrant_colecao.PERFIS))
+    args = parser.parse_args()
+
+    cliente = QdrantClient(url=args.qdrant_url, timeout=300) if args.qdrant_url else QdrantClient(":memory:")
+    if not args.qdrant_url:
+        print("ℹ️ Em memória: sem HNSW, quantização nem índices de payload (rode com --qdrant-url para medir).")
+    pontos, vetores = gerar_pontos(args.pontos, args.dim, args.leis)
+
+    print(f"\n=== {args.pontos} pontos | dim {args.dim} | {args.leis} leis | {args.qdrant_url or 'memória'} ===")
+    print(f"{'perfil':>12} | {'RAM est.':>8} | {'RSS Δ MB':>8} | {'carga s':>7} | {'count p50/p95 ms':>15} | "
+          f"{'filtrada p50/p95':>15} | {'busca p50/p95 ms':>15} | recall")
+    try:
+        for nome in args.perfis.split(","):
+            rodar_perfil(cliente, args.qdrant_url, nome.strip(), pontos, vetores, args)
+    finally:
+        if cliente.collection_exists(COLECAO):
+            cliente.delete_collection(COLECAO)
+
+if __name__ == "__main__":
+    main()
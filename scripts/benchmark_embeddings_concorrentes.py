@@ -0,0 +1,140 @@
+"""
+Benchmark do embedding concorrente (embedding_concorrente.py) contra um Bedrock falso.
+
+O ServicoEmbeddingFalso faz o papel do cliente bedrock-runtime passado ao
+BedrockEmbedding (o mesmo caminho de request/response do Titan v2): cada
+invoke_model demora --latencia-ms e responde ThrottlingException acima de
+--taxa req/s (balde de fichas com --rajada) ou de --max-simultaneas chamadas.
+
+Compara:
+- "serie": BedrockEmbedding direto (um texto por chamada, como antes);
+- "fixa N": chamadas paralelas com concorrência fixa (sem adaptação);
+- "adaptativa": LimitadorAdaptativo com os valores do .env.
+
+Os lotes de 20 textos chegam de 2 threads, como a etapa de embedding da
+ingestão (BATCH_SIZE_DOCS, INGEST_EMBEDS). Cada modo confere os vetores
+devolvidos contra os esperados (ordem preservada).
+
+Uso:
+    python scripts/benchmark_embeddings_concorrentes.py
+    python scripts/benchmark_embeddings_concorrentes.py --textos 1000 --taxa 40 --latencia-ms 120
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from llama_index.embeddings.bedrock import BedrockEmbedding
+
+from embedding_concorrente import EmbeddingConcorrente, LimitadorAdaptativo
+
+DIM = 16
+
+def vetor_esperado(texto):
+    digest = hashlib.sha256(texto.encode("utf-8")).digest()
+    return [b / 255 for b in digest[:DIM]]
+
+class ServicoEmbeddingFalso:
+    """Cliente bedrock-runtime falso: latência + limite de taxa e de chamadas simultâneas."""
+    def __init__(self, latencia_ms, taxa, rajada, max_simultaneas):
+        self.latencia_s = latencia_ms / 1000
+        self.taxa = taxa
+        self.rajada = rajada
+        self.max_simultaneas = max_simultaneas
+        self._lock = threading.Lock()
+        self._fichas = float(rajada)
+        self._ultimo = time.monotonic()
+        self._em_voo = 0
+        self.atendidas = 0
+        self.recusadas = 0
+
+    def _recusar(self):
+        self.recusadas += 1
+        raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}}, "InvokeModel")
+
+    def invoke_model(self, body, modelId, accept, contentType):
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.rajada, self._fichas + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            if self._fichas < 1 or self._em_voo >= self.max_simultaneas:
+                self._recusar()
+            self._fichas -= 1
+            self._em_voo += 1
+        try:
+            time.sleep(max(0.0, random.gauss(self.latencia_s, self.latencia_s * 0.2)))
+            texto = json.loads(body)["inputText"]
+            return {"body": io.BytesIO(json.dumps({"embedding": vetor_esperado(texto)}).encode("utf-8"))}
+        finally:
+            with self._lock:
+                self._em_voo -= 1
+                self.atendidas += 1
+
+def rodar(nome, modelo, servico, textos, executor=None):
+    lotes = [textos[i:i + 20] for i in range(0, len(textos), 20)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        resultados = list(pool.map(modelo.get_text_embedding_batch, lotes))
+    duracao = time.perf_counter() - inicio
+    vetores = [v for lote in resultados for v in lote]
+    corretos = all(v == vetor_esperado(t) for v, t in zip(vetores, textos)) and len(vetores) == len(textos)
+    extra = ""
+    if executor is not None:
+        stats = executor.estatisticas()
+        extra = f" | concorrência final {stats['limite_atual']} (máx {stats['limite_maximo_usado']}), {stats['cortes']} cortes"
+    print(
+        f"{nome:>16}: {duracao:7.2f} s | {len(textos) / duracao:7.1f} emb/s | "
+        f"{servico.recusadas:4d} throttlings | vetores {'ok' if corretos else 'ERRADOS'}{extra}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--textos", type=int, default=400)
+    parser.add_argument("--latencia-ms", type=float, default=80)
+    parser.add_argument("--taxa", type=float, default=60, help="Requisições/s aceitas pelo serviço falso")
+    parser.add_argument("--rajada", type=int, default=20)
+    parser.add_argument("--max-simultaneas", type=int, default=12)
+    parser.add_argument("--fixas", default="4,16", help="Concorrências fixas a comparar")
+    args = parser.parse_args()
+
+    textos = [f"Art. {i}. Texto do artigo {i} da lei de teste." for i in range(args.textos)]
+    print(
+        f"\n=== {args.textos} textos | latência {args.latencia_ms:.0f} ms | "
+        f"{args.taxa:.0f} req/s (rajada {args.rajada}) | máx {args.max_simultaneas} simultâneas ==="
+    )
+
+    def servico():
+        return ServicoEmbeddingFalso(args.latencia_ms, args.taxa, args.rajada, args.max_simultaneas)
+
+    def bedrock(cliente):
+        return BedrockEmbedding(model_name="amazon.titan-embed-text-v2:0", client=cliente, region_name="us-east-1")
+
+    s = servico()
+    try:
+        rodar("serie", bedrock(s), s, textos)
+    except ClientError:
+        print(f"{'serie':>16}: falhou com throttling (sem repetição no cliente falso)")
+
+    for n in [int(x) for x in args.fixas.split(",") if x]:
+        s = servico()
+        executor = EmbeddingConcorrente(bedrock(s), LimitadorAdaptativo(inicial=n, minimo=n, maximo=n))
+        try:
+            rodar(f"fixa {n}", executor, s, textos, executor)
+        except ClientError:
+            print(f"{f'fixa {n}':>16}: desistiu após throttling persistente ({s.recusadas} recusas)")
+
+    s = servico()
+    executor = EmbeddingConcorrente(bedrock(s))
+    rodar("adaptativa", executor, s, textos, executor)
+
+if __name__ == "__main__":
+    main()
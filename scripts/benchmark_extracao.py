@@ -0,0 +1,60 @@
+"""
+Micro-benchmark da extração HTML -> (título, texto), por lei do leis.txt.
+
+Usa as cópias salvas pelo cache de HTML (sem rede). Para cada lei e extrator
+roda --repeticoes vezes e mostra a mediana; no fim, o total e o ganho sobre o bs4.
+Confira antes que as saídas são idênticas com scripts/golden_extracao.py.
+
+Uso:
+    python scripts/benchmark_extracao.py
+    python scripts/benchmark_extracao.py --repeticoes 10 --extratores bs4 lxml
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import utils
+from golden_extracao import carregar_htmls, urls_do_leis_txt
+
+def medir(html, extrator, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        utils.extrair_texto_html(html, extrator=extrator)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--extratores", nargs="+", default=["bs4", "lxml"])
+    args = parser.parse_args()
+
+    htmls = carregar_htmls(urls_do_leis_txt())
+    if not htmls:
+        sys.exit("❌ Nenhuma lei salva em disco. Rode scripts/golden_extracao.py --baixar --gravar antes.")
+
+    totais = dict.fromkeys(args.extratores, 0.0)
+    print(f"\n=== {len(htmls)} leis | mediana de {args.repeticoes} execuções (ms) ===")
+    print(f"{'lei':>40} {'KB':>7} " + " ".join(f"{e:>9}" for e in args.extratores))
+    for url, html in htmls.items():
+        linha = []
+        for extrator in args.extratores:
+            duracao = medir(html, extrator, args.repeticoes)
+            totais[extrator] += duracao
+            linha.append(f"{duracao * 1000:9.1f}")
+        print(f"{url.rsplit('/', 1)[-1][-40:]:>40} {len(html) / 1024:7.0f} " + " ".join(linha))
+
+    print(f"{'TOTAL':>40} {'':>7} " + " ".join(f"{t * 1000:9.1f}" for t in totais.values()))
+    if "bs4" in totais:
+        for extrator, total in totais.items():
+            if extrator != "bs4" and total:
+                print(f"⚡ {extrator}: {totais['bs4'] / total:.1f}x mais rápido que bs4")
+
+if __name__ == "__main__":
+    main()
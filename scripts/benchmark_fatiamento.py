@@ -0,0 +1,54 @@
+"""
+Benchmark do fatiamento em artigos sobre o texto da CLT (ou outra lei).
+
+Compara a implementação antiga (SentenceSplitter novo por chamada, tokenizando
+todo artigo) com utils.fatiar_por_artigos nos modos exato e estrutural. Mostra a
+mediana de --repeticoes execuções, os chunks gerados e o tamanho médio em tokens.
+
+Uso:
+    python scripts/benchmark_fatiamento.py
+    python scripts/benchmark_fatiamento.py --arquivo clt.txt --repeticoes 10
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import utils
+from fatiamento_referencia import fatiar_referencia
+from verificar_fatiamento import adicionar_argumentos, carregar_texto
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos(parser)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    titulo, texto, url = carregar_texto(args)
+    variantes = {
+        "antigo": fatiar_referencia,
+        "exato": lambda t, ti, u: utils.fatiar_por_artigos(t, ti, u, estrutural=False),
+        "estrutural": lambda t, ti, u: utils.fatiar_por_artigos(t, ti, u, estrutural=True),
+    }
+
+    print(f"\n=== {titulo} | {len(texto) / 1024:.0f} KB de texto | mediana de {args.repeticoes} ===")
+    tempos = {}
+    for nome, fatiar in variantes.items():
+        duracoes = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            chunks = fatiar(texto, titulo, url)
+            duracoes.append(time.perf_counter() - inicio)
+        tempos[nome] = statistics.median(duracoes)
+        media_tokens = statistics.mean(utils._tokens(c["conteudo"]) for c in chunks)
+        print(f"{nome:>12}: {tempos[nome] * 1000:8.1f} ms | {len(chunks):5d} chunks | {media_tokens:6.0f} tokens/chunk")
+
+    for nome in ("exato", "estrutural"):
+        print(f"⚡ {nome}: {tempos['antigo'] / tempos[nome]:.1f}x mais rápido que o antigo")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark do filtro de área por perfil (areas_leis.filtro_do_perfil).
+
+Cria uma coleção (bench_area) com pontos sintéticos de leis das quatro áreas de
+leis.txt (mais algumas "geral") e, para consultas de cada perfil que puxam
+também para leis de outra área (perguntas ambíguas como "prazo do contrato"),
+compara a busca na coleção inteira com a busca filtrada pela área do perfil:
+- latência p50/p95;
+- fração do top-k que é da área do perfil (ou "geral");
+- recall@k contra a busca exata filtrada (os melhores trechos que o agente
+  deveria receber).
+
+O Qdrant em memória do qdrant-client não tem HNSW nem índices de payload (o
+filtro vira varredura): sem --qdrant-url os números só servem para conferir o script.
+
+Uso:
+    python scripts/benchmark_filtro_area.py --qdrant-url http://localhost:6333 --pontos 50000
+    python scripts/benchmark_filtro_area.py --ambiguidade 1.0 --consultas 500
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+import areas_leis
+import qdrant_colecao
+
+COLECAO = "bench_area"
+PERFIS = sorted(areas_leis.AREAS_POR_PERFIL)
+
+def gerar_pontos(quantidade, dim, leis, seed=42):
+    rng = np.random.default_rng(seed)
+    # Vetores agrupados por lei (artigos parecidos); a área de cada lei vem em rodízio e ~10% ficam "geral"
+    area_da_lei = [
+        areas_leis.AREA_GERAL if rng.random() < 0.1 else areas_leis.AREAS_POR_PERFIL[PERFIS[i % len(PERFIS)]][0]
+        for i in range(leis)
+    ]
+    centros = rng.standard_normal((leis, dim)).astype(np.float32)
+    lei_de = rng.integers(0, leis, quantidade)
+    vetores = centros[lei_de] + 0.8 * rng.standard_normal((quantidade, dim)).astype(np.float32)
+    vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+    pontos = [
+        models.PointStruct(
+            id=i,
+            vector=vetores[i].tolist(),
+            payload={
+                "url_geral": f"http://bench/lei/{lei_de[i]}", "source": f"Lei de Teste {lei_de[i]}",
+                "tipo": "Artigo", "numero_artigo": str(i % 400), "parte": 1,
+                areas_leis.CAMPO_AREA: [area_da_lei[lei_de[i]]],
+                "text": "Texto do artigo da lei com conteúdo jurídico. " * 6,
+            },
+        )
+        for i in range(quantidade)
+    ]
+    return pontos, vetores, centros, np.array(area_da_lei), lei_de
+
+def gerar_consultas(vetores, centros, area_da_lei, lei_de, quantidade, ambiguidade, seed=7):
+    """(perfil, vetor): perto de um artigo da área do perfil, puxado para uma lei de outra área."""
+    rng = np.random.default_rng(seed)
+    consultas = []
+    for _ in range(quantidade):
+        perfil = PERFIS[rng.integers(0, len(PERFIS))]
+        area = areas_leis.AREAS_POR_PERFIL[perfil][0]
+        alvo = rng.choice(np.flatnonzero(area_da_lei[lei_de] == area))
+        outra = rng.choice(np.flatnonzero((area_da_lei != area) & (area_da_lei != areas_leis.AREA_GERAL)))
+        q = vetores[alvo] + ambiguidade * centros[outra] / np.linalg.norm(centros[outra])
+        q += 0.05 * rng.standard_normal(q.shape[0])
+        consultas.append((perfil, (q / np.linalg.norm(q)).astype(np.float32)))
+    return consultas
+
+def esperar_indexacao(cliente, timeout=600):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < timeout:
+        if cliente.get_collection(COLECAO).status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print("⚠️ Coleção não ficou green dentro do tempo limite")
+
+def medir(fn, entradas):
+    latencias = []
+    resultados = []
+    for entrada in entradas:
+        inicio = time.perf_counter()
+        resultados.append(fn(entrada))
+        latencias.append(time.perf_counter() - inicio)
+    ms = np.array(latencias) * 1000
+    return (np.percentile(ms, 50), np.percentile(ms, 95)), resultados
+
+def no_dominio(resultado, perfil):
+    permitidas = set(areas_leis.AREAS_POR_PERFIL[perfil]) | {areas_leis.AREA_GERAL}
+    return np.mean([bool(set(p.payload[areas_leis.CAMPO_AREA]) & permitidas) for p in resultado]) if resultado else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-url", default=None, help="Sem URL, usa o Qdrant em memória do qdrant-client")
+    parser.add_argument("--pontos", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--leis", type=int, default=40)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--ambiguidade", type=float, default=0.8,
+                        help="Peso da lei de outra área em cada consulta (0 = consultas sem ambiguidade)")
+    args = parser.parse_args()
+
+    cliente = QdrantClient(url=args.qdrant_url, timeout=300) if args.qdrant_url else QdrantClient(":memory:")
+    if not args.qdrant_url:
+        print("ℹ️ Em memória: sem HNSW nem índices de payload (rode com --qdrant-url para medir).")
+    pontos, vetores, centros, area_da_lei, lei_de = gerar_pontos(args.pontos, args.dim, args.leis)
+    consultas = gerar_consultas(vetores, centros, area_da_lei, lei_de, args.consultas, args.ambiguidade)
+
+    try:
+        if cliente.collection_exists(COLECAO):
+            cliente.delete_collection(COLECAO)
+        qdrant_colecao._indices_garantidos.discard(COLECAO)
+        qdrant_colecao.provisionar_colecao(cliente, COLECAO, args.dim, qdrant_colecao.configuracao("padrao"))
+        for i in range(0, len(pontos), 256):
+            cliente.upsert(COLECAO, points=pontos[i:i + 256], wait=True)
+        esperar_indexacao(cliente)
+
+        def buscar(par, filtrada=False, exata=False):
+            perfil, q = par
+            return cliente.search(
+                COLECAO, query_vector=q.tolist(), limit=args.top_k, with_payload=[areas_leis.CAMPO_AREA],
+                query_filter=areas_leis.filtro_do_perfil(perfil) if filtrada else None,
+                search_params=models.SearchParams(exact=True) if exata else None,
+            )
+
+        _, exatos = medir(lambda par: buscar(par, filtrada=True, exata=True), consultas)
+        print(f"\n=== {args.pontos} pontos | dim {args.dim} | {args.leis} leis | ambiguidade {args.ambiguidade} | "
+              f"{args.qdrant_url or 'memória'} ===")
+        print(f"{'busca':>18} | {'p50/p95 ms':>15} | {'no domínio':>10} | recall@{args.top_k}")
+        for nome, filtrada in (("coleção inteira", False), ("filtrada por área", True)):
+            (p50, p95), resultados = medir(lambda par: buscar(par, filtrada=filtrada), consultas)
+            dominio = np.mean([no_dominio(r, perfil) for r, (perfil, _) in zip(resultados, consultas)])
+            recall = np.mean([
+                len({p.id for p in r} & {p.id for p in e}) / max(len(e), 1) for r, e in zip(resultados, exatos)
+            ])
+            print(f"{nome:>18} | {p50:6.2f} / {p95:6.2f} | {dominio:10.3f} | {recall:6.3f}")
+    finally:
+        if cliente.collection_exists(COLECAO):
+            cliente.delete_collection(COLECAO)
+
+if __name__ == "__main__":
+    main()
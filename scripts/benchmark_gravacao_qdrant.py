@@ -0,0 +1,94 @@
+"""
+Benchmark da gravação no Qdrant (só a escrita: os vetores já vêm prontos).
+
+Compara:
+- "por_lote_20": um QdrantVectorStore novo a cada 20 documentos (como o
+  antigo run_ingestion_batch, sem a parte de embedding);
+- GravadorQdrant com lotes grandes, com e sem wait e com upserts paralelos.
+
+Usa nodes sintéticos com payload parecido com o dos artigos de lei e uma
+coleção própria (bench_gravacao), apagada no final.
+
+Uso:
+    python scripts/benchmark_gravacao_qdrant.py                    # Qdrant em memória
+    python scripts/benchmark_gravacao_qdrant.py --qdrant-url http://localhost:6333 --docs 5000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from qdrant_client import QdrantClient
+from llama_index.core.schema import TextNode
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+
+import ingestion
+
+COLECAO = "bench_gravacao"
+
+def gerar_nodes(quantidade, dim, seed=42):
+    rng = np.random.default_rng(seed)
+    vetores = rng.standard_normal((quantidade, dim)).astype(np.float32)
+    return [
+        TextNode(
+            text=f"Art. {i}. " + "Texto do artigo da lei com conteúdo jurídico. " * 30,
+            metadata={"source": "Lei de Teste", "url_geral": f"http://bench/{i // 500}",
+                      "tipo": "Artigo", "numero_artigo": str(i), "parte": 1},
+            embedding=vetores[i].tolist(),
+        )
+        for i in range(quantidade)
+    ]
+
+def gravar_por_lote_20(cliente, nodes):
+    for inicio in range(0, len(nodes), 20):
+        vector_store = QdrantVectorStore(collection_name=COLECAO, client=cliente, enable_hybrid=False, batch_size=64)
+        vector_store.add(nodes[inicio:inicio + 20])
+
+def gravar_com_gravador(cliente, nodes, lote, paralelo, esperar):
+    gravador = ingestion.GravadorQdrant(cliente=cliente, lote=lote, paralelo=paralelo, esperar=esperar, colecao=COLECAO)
+    # Entrega em pedaços de 20, como a etapa de embedding faz
+    for inicio in range(0, len(nodes), 20):
+        gravador.adicionar(nodes[inicio:inicio + 20])
+    gravador.fechar()
+
+def medir(cliente, nome, fn, nodes):
+    if cliente.collection_exists(COLECAO):
+        cliente.delete_collection(COLECAO)
+    inicio = time.perf_counter()
+    fn(cliente, nodes)
+    duracao = time.perf_counter() - inicio
+    # Com wait=False o Qdrant ainda pode estar aplicando: conta só depois de estabilizar
+    total = cliente.count(COLECAO, exact=True).count
+    print(f"{nome:>28}: {duracao:7.2f} s | {len(nodes) / duracao:8.1f} docs/s | pontos gravados={total}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-url", default=None, help="Sem URL, usa o Qdrant em memória do qdrant-client")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+
+    cliente = QdrantClient(url=args.qdrant_url, timeout=300) if args.qdrant_url else QdrantClient(":memory:")
+    nodes = gerar_nodes(args.docs, args.dim)
+
+    print(f"\n=== {args.docs} docs | dim {args.dim} | {args.qdrant_url or 'memória'} ===")
+    try:
+        medir(cliente, "por_lote_20 (antigo)", gravar_por_lote_20, nodes)
+        configuracoes = [(256, 1, True), (512, 1, True), (256, 1, False)]
+        if args.qdrant_url:
+            configuracoes += [(256, 4, True), (256, 4, False)]
+        else:
+            # O Qdrant local do qdrant-client não aceita escritas concorrentes
+            print("ℹ️ Em memória: upserts paralelos só são medidos com --qdrant-url.")
+        for lote, paralelo, esperar in configuracoes:
+            nome = f"gravador lote={lote} par={paralelo} wait={int(esperar)}"
+            medir(cliente, nome, lambda c, n: gravar_com_gravador(c, n, lote, paralelo, esperar), nodes)
+    finally:
+        if cliente.collection_exists(COLECAO):
+            cliente.delete_collection(COLECAO)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: modo "sintese" (engine.query com Haiku) x modo "retriever" (top-k cru).
+
+Mede, por pergunta e sem passar pelos caches:
+- latência da busca (tool_buscar_rag);
+- tokens gastos pelo Haiku na síntese (prompt + completion);
+- tokens do texto devolvido ao agente (o que o Sonnet vai ler).
+
+Com --agente, roda também o fluxo ponta a ponta com o Sonnet chamando a tool
+em cada modo e soma o usage reportado pelo PydanticAI.
+
+Uso:
+    python scripts/benchmark_modos_rag.py
+    python scripts/benchmark_modos_rag.py --perguntas perguntas.txt --repeticoes 3 --agente
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import tiktoken
+from qdrant_client import QdrantClient
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.callbacks import CallbackManager, TokenCountingHandler
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+
+import LLM
+import Rag
+
+PERGUNTAS_PADRAO = [
+    "Qual o prazo para pagamento das verbas rescisórias?",
+    "Qual o limite de faturamento para enquadramento como EPP no Simples Nacional?",
+    "Quais são os requisitos para contratação de estagiário?",
+    "Como funciona a distribuição de dividendos na sociedade anônima?",
+    "O que a lei diz sobre teletrabalho e controle de jornada?",
+]
+
+_tokenizer = tiktoken.get_encoding("cl100k_base")
+
+def contar_tokens(texto: str) -> int:
+    return len(_tokenizer.encode(texto or ""))
+
+def montar_engine(contador: TokenCountingHandler):
+    Settings.embed_model = LLM.embed_model
+    Settings.llm = LLM.llm_haiku
+    Settings.callback_manager = CallbackManager([contador])
+    client = QdrantClient(url=os.getenv("QDRANT_URL", "http://localhost:6333"), prefer_grpc=False)
+    vector_store = QdrantVectorStore(collection_name="leis_v3", client=client, enable_hybrid=False)
+    index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
+    return index.as_query_engine(similarity_top_k=5)
+
+def medir_busca(engine, contador, perguntas, repeticoes):
+    resultados = {}
+    for modo in (Rag.MODO_SINTESE, Rag.MODO_RETRIEVER):
+        latencias, tokens_llm, tokens_saida = [], [], []
+        for _ in range(repeticoes):
+            for pergunta in perguntas:
+                contador.reset_counts()
+                inicio = time.perf_counter()
+                texto, _ = Rag.executar_busca(engine, pergunta, modo=modo)
+                latencias.append(time.perf_counter() - inicio)
+                tokens_llm.append(contador.prompt_llm_token_count + contador.completion_llm_token_count)
+                tokens_saida.append(contar_tokens(texto))
+        resultados[modo] = {
+            "latencia_media_s": statistics.mean(latencias),
+            "latencia_p95_s": sorted(latencias)[int(0.95 * (len(latencias) - 1))],
+            "tokens_haiku_medio": statistics.mean(tokens_llm),
+            "tokens_para_agente_medio": statistics.mean(tokens_saida),
+        }
+    return resultados
+
+async def medir_agente(engine, perguntas):
+    from pydantic_ai import Agent, RunContext
+
+    import Prompts
+    from Agents import LegalDeps
+
+    resultados = {}
+    for modo in (Rag.MODO_SINTESE, Rag.MODO_RETRIEVER):
+        async def tool_buscar_rag(ctx: RunContext[LegalDeps], termo_busca: str) -> str:
+            return (await Rag.aexecutar_busca(ctx.deps.query_engine, termo_busca, modo=modo))[0]
+
+        agente = Agent(model=LLM.sonnet_bedrock_model, deps_type=LegalDeps, tools=[tool_buscar_rag])
+
+        @agente.system_prompt
+        def prompt(ctx: RunContext[LegalDeps]) -> str:
+            return Prompts.trabalhista_tmpl.format(
+                historico_conversa=[], data_atual=datetime.now().strftime("%d/%m/%Y"), texto_documento=""
+            )
+
+        latencias, entrada, saida = [], [], []
+        for pergunta in perguntas:
+            deps = LegalDeps(query_engine=engine, historico_conversa=[])
+            inicio = time.perf_counter()
+            result = await agente.run(pergunta, deps=deps)
+            latencias.append(time.perf_counter() - inicio)
+            usage = result.usage()
+            entrada.append(usage.input_tokens or 0)
+            saida.append(usage.output_tokens or 0)
+        resultados[modo] = {
+            "latencia_media_s": statistics.mean(latencias),
+            "tokens_sonnet_entrada_medio": statistics.mean(entrada),
+            "tokens_sonnet_saida_medio": statistics.mean(saida),
+        }
+    return resultados
+
+def imprimir(titulo, resultados):
+    print(f"\n=== {titulo} ===")
+    for modo, metricas in resultados.items():
+        linha = " | ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in metricas.items())
+        print(f"{modo:>10}: {linha}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perguntas", help="Arquivo com uma pergunta por linha")
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--agente", action="store_true", help="Mede também o fluxo ponta a ponta com o Sonnet")
+    args = parser.parse_args()
+
+    perguntas = PERGUNTAS_PADRAO
+    if args.perguntas:
+        with open(args.perguntas, encoding="utf-8") as f:
+            perguntas = [linha.strip() for linha in f if linha.strip()]
+
+    contador = TokenCountingHandler(tokenizer=_tokenizer.encode)
+    engine = montar_engine(contador)
+
+    imprimir("Busca (tool_buscar_rag, sem cache)", medir_busca(engine, contador, perguntas, args.repeticoes))
+    if args.agente:
+        imprimir("Ponta a ponta (Sonnet + tool)", asyncio.run(medir_agente(engine, perguntas)))
+
+if __name__ == "__main__":
+    main()
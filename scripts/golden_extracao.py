@@ -0,0 +1,104 @@
+"""
+Regressão da extração HTML -> (título, texto) sobre as leis do leis.txt.
+
+Usa as cópias salvas pelo cache de HTML (HTML_CACHE_DIR); --baixar busca na rede
+as que faltarem. Com --gravar, salva a saída do extrator de referência (bs4) como
+"golden". Sem --gravar, roda os extratores pedidos e compara com o golden: qualquer
+diferença é listada (com o primeiro ponto divergente) e o script sai com código 1.
+
+Uso:
+    python scripts/golden_extracao.py --baixar --gravar        # uma vez, com rede
+    python scripts/golden_extracao.py                          # compara bs4 e lxml
+    python scripts/golden_extracao.py --extratores lxml
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_cache
+import utils
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_GOLDEN = os.path.join(".cache", "golden_extracao")
+
+def urls_do_leis_txt(caminho=os.path.join(RAIZ, "leis.txt")):
+    """URLs do leis.txt (linhas 'url - descrição'; comentários e banners ignorados)."""
+    urls = []
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if linha.startswith("http"):
+                urls.append(linha.split(" - ", 1)[0].strip())
+    return urls
+
+def carregar_htmls(urls, baixar=False):
+    """{url: html} só das leis com cópia em disco (ou baixadas agora, com --baixar)."""
+    htmls = {}
+    for url in urls:
+        pagina = html_cache.baixar(url, offline=not baixar)
+        if pagina.html is None:
+            print(f"⚠️ Sem cópia salva de {url}")
+            continue
+        htmls[url] = pagina.html
+    return htmls
+
+def _caminho_golden(diretorio, url):
+    return os.path.join(diretorio, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+def _primeira_diferenca(a, b):
+    for i, (ca, cb) in enumerate(zip(a, b)):
+        if ca != cb:
+            return i
+    return min(len(a), len(b))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gravar", action="store_true", help="Grava o golden com o extrator bs4")
+    parser.add_argument("--baixar", action="store_true", help="Busca na rede as leis sem cópia em disco")
+    parser.add_argument("--extratores", nargs="+", default=["bs4", "lxml"])
+    parser.add_argument("--dir", default=DIR_GOLDEN)
+    args = parser.parse_args()
+
+    htmls = carregar_htmls(urls_do_leis_txt(), baixar=args.baixar)
+    if not htmls:
+        sys.exit("❌ Nenhuma lei disponível. Rode com --baixar (precisa de rede).")
+
+    if args.gravar:
+        os.makedirs(args.dir, exist_ok=True)
+        for url, html in htmls.items():
+            titulo, texto = utils.extrair_texto_html(html, extrator="bs4")
+            with open(_caminho_golden(args.dir, url), "w", encoding="utf-8") as f:
+                json.dump({"url": url, "titulo": titulo, "texto": texto}, f, ensure_ascii=False)
+        print(f"✅ Golden gravado para {len(htmls)} leis em {args.dir}")
+        return
+
+    divergencias = 0
+    for url, html in htmls.items():
+        try:
+            with open(_caminho_golden(args.dir, url), encoding="utf-8") as f:
+                golden = json.load(f)
+        except FileNotFoundError:
+            print(f"⚠️ Sem golden para {url} (rode com --gravar)")
+            continue
+        for extrator in args.extratores:
+            titulo, texto = utils.extrair_texto_html(html, extrator=extrator)
+            if titulo != golden["titulo"]:
+                divergencias += 1
+                print(f"❌ [{extrator}] título difere em {url}: {titulo!r} != {golden['titulo']!r}")
+            if texto != golden["texto"]:
+                divergencias += 1
+                i = _primeira_diferenca(texto, golden["texto"])
+                print(f"❌ [{extrator}] texto difere em {url} (posição {i}):")
+                print(f"    obtido: {texto[max(i - 40, 0):i + 40]!r}")
+                print(f"    golden: {golden['texto'][max(i - 40, 0):i + 40]!r}")
+
+    if divergencias:
+        sys.exit(f"❌ {divergencias} divergência(s) em {len(htmls)} leis")
+    print(f"✅ {len(htmls)} leis idênticas ao golden ({', '.join(args.extratores)})")
+
+if __name__ == "__main__":
+    main()
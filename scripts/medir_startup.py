@@ -0,0 +1,68 @@
+"""
+Mede o custo de startup do Rag.py: tempo de `import Rag` e latência da
+primeira chamada a buscar_com_cache_semantico, cada rodada num interpretador novo.
+
+A primeira chamada usa uma engine falsa (resposta fixa), para isolar o custo
+de conexão/índice/embedding do custo do Qdrant e do Haiku.
+
+Para comparar antes x depois, rode contra um checkout antigo:
+    git worktree add /tmp/rag_antes <commit-antigo>
+    python scripts/medir_startup.py --repo /tmp/rag_antes
+    python scripts/medir_startup.py
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CODIGO_FILHO = r"""
+import sys, time, json
+sys.path.insert(0, {repo!r})
+t0 = time.perf_counter()
+import Rag
+t_import = time.perf_counter() - t0
+
+class EngineFalsa:
+    def query(self, pergunta):
+        return "resposta fixa"
+    def retrieve(self, query_bundle):
+        return []
+
+t1 = time.perf_counter()
+Rag.buscar_com_cache_semantico(EngineFalsa(), {pergunta!r})
+t_primeira = time.perf_counter() - t1
+
+t2 = time.perf_counter()
+Rag.buscar_com_cache_semantico(EngineFalsa(), {pergunta!r})
+t_segunda = time.perf_counter() - t2
+print("__RESULTADO__" + json.dumps({{"import_s": t_import, "primeira_s": t_primeira, "segunda_s": t_segunda}}))
+"""
+
+def rodar(repo: str, pergunta: str) -> dict:
+    codigo = _CODIGO_FILHO.format(repo=repo, pergunta=pergunta)
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=repo, capture_output=True, text=True, check=True
+    ).stdout
+    linha = next(l for l in saida.splitlines() if l.startswith("__RESULTADO__"))
+    return json.loads(linha[len("__RESULTADO__"):])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repo", default=RAIZ, help="Diretório com o código a medir")
+    parser.add_argument("--rodadas", type=int, default=3)
+    parser.add_argument("--pergunta", default="Qual o prazo para pagamento das verbas rescisórias?")
+    args = parser.parse_args()
+
+    medidas = [rodar(os.path.abspath(args.repo), f"{args.pergunta} #{i}") for i in range(args.rodadas)]
+
+    print(f"\n=== Startup do Rag ({args.repo}, {args.rodadas} rodadas) ===")
+    for campo, rotulo in (("import_s", "import Rag"), ("primeira_s", "1ª busca"), ("segunda_s", "2ª busca")):
+        valores = [m[campo] for m in medidas]
+        print(f"{rotulo:>12}: média {statistics.mean(valores) * 1000:8.1f} ms | máx {max(valores) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Migra o cache semântico do Redis para o layout configurado no .env
+(RAG_CACHE_TIPO_VETOR, RAG_CACHE_DIM, RAG_CACHE_COMPRESSAO).
+
+Copia cada HASH do índice de origem (por padrão o idx:rag_cache_v1 do modo
+atual) para o índice novo, mantendo a chave (md5 da pergunta), o TTL restante,
+a versão do corpus e os SETs de invalidação por URL.
+- Mesma dimensão: o vetor é só convertido (ex.: FLOAT32 -> FLOAT16).
+- Dimensão diferente: a pergunta original é re-embedada com o Titan v2 na
+  dimensão nova (uma chamada ao Bedrock por entrada, memoizada em disco).
+
+Uso:
+    RAG_CACHE_TIPO_VETOR=FLOAT16 RAG_CACHE_COMPRESSAO=zlib python scripts/migrar_cache_redis.py
+    ... --remover-origem   # apaga as chaves antigas e o índice v1 no final
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import numpy as np
+
+import LLM
+import Rag
+from cache_backends import TIPOS_VETOR, BackendRedis
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modo", default=Rag.RAG_MODO, choices=[Rag.MODO_SINTESE, Rag.MODO_RETRIEVER])
+    parser.add_argument("--origem-tipo", default="FLOAT32", choices=list(TIPOS_VETOR))
+    parser.add_argument("--origem-dim", type=int, default=LLM.EMBED_DIM)
+    parser.add_argument("--remover-origem", action="store_true", help="Apaga as chaves e o índice de origem no final")
+    args = parser.parse_args()
+
+    origem_indice, origem_prefixo = Rag.nome_indice_cache(args.modo, args.origem_tipo, args.origem_dim)
+    destino_indice, destino_prefixo = Rag.nome_indice_cache(args.modo, Rag.CACHE_TIPO_VETOR, LLM.CACHE_EMBED_DIM)
+    if (origem_indice, origem_prefixo) == (destino_indice, destino_prefixo):
+        print(f"ℹ️ Origem e destino são o mesmo índice ({origem_indice}). Nada a migrar.")
+        return
+
+    destino = BackendRedis(
+        redis_url=Rag.redis_url, index_name=destino_indice, prefixo=destino_prefixo,
+        dimensao=LLM.CACHE_EMBED_DIM, ttl_segundos=Rag.CACHE_TTL_SEGUNDOS, lock_ttl_ms=Rag.SF_LOCK_TTL_MS,
+        tipo_vetor=Rag.CACHE_TIPO_VETOR, compressao=Rag.CACHE_COMPRESSAO,
+    )
+    cliente = destino.cliente
+    reembedar = args.origem_dim != LLM.CACHE_EMBED_DIM
+    print(f"🚚 Migrando {origem_indice} -> {destino_indice} ({'re-embed' if reembedar else 'conversão do vetor'})")
+
+    migradas, ignoradas, chaves_origem = 0, 0, []
+    for chave in cliente.scan_iter(match=f"{origem_prefixo}*", count=500):
+        chave = chave.decode("utf-8")
+        campos = {k.decode("utf-8"): v for k, v in cliente.hgetall(chave).items()}
+        ttl_ms = cliente.pttl(chave)
+        if "vector" not in campos or ttl_ms == -2:
+            ignoradas += 1
+            continue
+        chaves_origem.append(chave)
+
+        entrada = BackendRedis._entrada_dos_campos(campos)
+        if reembedar:
+            vetor = LLM.cache_embed_model.get_query_embedding(entrada["texto_pergunta"])
+        else:
+            vetor = np.frombuffer(campos["vector"], dtype=TIPOS_VETOR[args.origem_tipo]).astype(np.float32).tolist()
+
+        urls = [u for u in (entrada["urls"] or "").split("|") if u]
+        if entrada["resposta"] is None:
+            nodes = json.loads(entrada["nodes"] or "[]")
+        else:
+            nodes = [{"url_geral": u} for u in urls]
+
+        destino.gravar(
+            destino_prefixo + chave[len(origem_prefixo):],
+            entrada["texto_pergunta"] or "",
+            vetor,
+            entrada["resposta"],
+            nodes,
+            int(entrada["versao_corpus"] or 0),
+            ttl_segundos=max(ttl_ms // 1000, 1) if ttl_ms > 0 else None,
+            perfil=entrada["perfil"],
+        )
+        migradas += 1
+        if migradas % 200 == 0:
+            print(f"   ... {migradas} entradas")
+
+    print(f"✅ {migradas} entradas migradas ({ignoradas} ignoradas).")
+
+    if args.remover_origem:
+        for i in range(0, len(chaves_origem), 500):
+            cliente.delete(*chaves_origem[i:i + 500])
+        try:
+            cliente.ft(origem_indice).dropindex(delete_documents=False)
+        except Exception as e:
+            print(f"⚠️ Índice {origem_indice} não removido: {e}")
+        print(f"🗑️ Origem removida ({len(chaves_origem)} chaves).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Confere o fatiador de artigos (utils.fatiar_por_artigos) contra a implementação
+antiga (SentenceSplitter em todo artigo), sobre o texto da CLT ou outra lei.
+As regras de cada modo estão em fatiamento_referencia.py.
+
+Sai com código 1 se algo divergir.
+
+Uso:
+    python scripts/verificar_fatiamento.py                       # CLT do cache de HTML
+    python scripts/verificar_fatiamento.py --url <url da lei>
+    python scripts/verificar_fatiamento.py --arquivo clt.txt --titulo "CLT"
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import html_cache
+import utils
+from fatiamento_referencia import verificar
+from golden_extracao import urls_do_leis_txt
+
+def carregar_texto(args):
+    """(título, texto, url) da lei pedida: arquivo de texto ou cópia do HTML em disco."""
+    if args.arquivo:
+        with open(args.arquivo, encoding="utf-8") as f:
+            return args.titulo, f.read(), args.arquivo
+    url = args.url or urls_do_leis_txt()[0]  # a primeira do leis.txt é a CLT
+    pagina = html_cache.baixar(url, offline=not args.baixar)
+    if pagina.html is None:
+        sys.exit(f"❌ Sem cópia de {url}. Rode com --baixar (precisa de rede) ou use --arquivo.")
+    titulo, texto = utils.extrair_texto_html(pagina.html)
+    return titulo, texto, url
+
+def adicionar_argumentos(parser):
+    parser.add_argument("--url", help="Lei a usar (padrão: a CLT, primeira do leis.txt)")
+    parser.add_argument("--arquivo", help="Texto já extraído (em vez do HTML)")
+    parser.add_argument("--titulo", default="Lei de Teste", help="Título quando usar --arquivo")
+    parser.add_argument("--baixar", action="store_true", help="Busca a página na rede se não houver cópia")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    erros = verificar(*carregar_texto(args))
+    for erro in erros:
+        print(f"❌ {erro}")
+    if erros:
+        sys.exit(1)
+    print("✅ Fatiamento confere com a implementação antiga")
+
+if __name__ == "__main__":
+    main()
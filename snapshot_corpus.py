@@ -0,0 +1,243 @@
+# snapshot_corpus.py
+"""
+Snapshot offline do corpus: exporta a coleção de leis (vetores, payloads e ids
+determinísticos) e o registro de leis para uma pasta, e carrega essa pasta num
+Qdrant vazio sem baixar HTML nem chamar o Bedrock.
+
+Formato da pasta:
+    manifesto.json      versão, coleção, dimensão, modelo de embedding, sha256 dos arquivos
+    vetores.npy         float32 (pontos x dimensão), na mesma ordem de pontos.jsonl.gz
+    pontos.jsonl.gz     {"id": ..., "payload": {...}} por linha
+    leis.jsonl          registro de leis (título, nº de trechos, hash do conteúdo)
+
+Uso:
+    python snapshot_corpus.py exportar                          # snapshots/leis_v3-AAAAMMDD-HHMM
+    python snapshot_corpus.py exportar --saida /backups/corpus
+    python snapshot_corpus.py importar snapshots/leis_v3-20260101-1200
+    QDRANT_URL=http://staging:6333 python snapshot_corpus.py importar /backups/corpus --substituir
+
+Roda sempre contra o ambiente do .env (QDRANT_URL e INGEST_JOBS_PATH): a coleção,
+o registro de leis e o cache do RAG precisam ser do mesmo ambiente.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import argparse
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import LLM
+import Rag
+import ingestion
+import qdrant_colecao
+
+FORMATO = 1
+ARQ_MANIFESTO = "manifesto.json"
+ARQ_VETORES = "vetores.npy"
+ARQ_PONTOS = "pontos.jsonl.gz"
+ARQ_LEIS = "leis.jsonl"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+
+def _sha256(caminho: str) -> str:
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+# ==============================================================================
+# 1. EXPORTAÇÃO
+# ==============================================================================
+def exportar(cliente: QdrantClient, colecao: str, destino: str, lote: int = 1000) -> dict:
+    if os.path.exists(destino):
+        raise FileExistsError(f"{destino} já existe")
+    info = cliente.get_collection(colecao)
+    params_vetor = info.config.params.vectors
+    if not isinstance(params_vetor, models.VectorParams):
+        raise ValueError("Só coleções com um vetor denso sem nome (leis_v3) são suportadas")
+    total = cliente.count(colecao, exact=True).count
+
+    parcial = f"{destino}.parcial"
+    shutil.rmtree(parcial, ignore_errors=True)
+    os.makedirs(parcial)
+    inicio = time.perf_counter()
+    vetores = np.lib.format.open_memmap(
+        os.path.join(parcial, ARQ_VETORES), mode="w+", dtype=np.float32, shape=(total, params_vetor.size)
+    )
+    n = 0
+    with gzip.open(os.path.join(parcial, ARQ_PONTOS), "wt", encoding="utf-8") as f:
+        offset = None
+        while True:
+            registros, offset = cliente.scroll(
+                colecao, limit=lote, with_payload=True, with_vectors=True, offset=offset
+            )
+            for r in registros:
+                if n >= total:
+                    raise RuntimeError("A coleção mudou durante a exportação (pare a ingestão e tente de novo)")
+                vetores[n] = r.vector
+                f.write(json.dumps({"id": r.id, "payload": r.payload}, ensure_ascii=False) + "\n")
+                n += 1
+            print(f"📤 {n}/{total} pontos...", end="\r")
+            if offset is None:
+                break
+    if n != total:
+        raise RuntimeError(f"A coleção mudou durante a exportação ({n} lidos, {total} contados)")
+    vetores.flush()
+    del vetores
+
+    leis = ingestion.listar_leis_no_banco()
+    with open(os.path.join(parcial, ARQ_LEIS), "w", encoding="utf-8") as f:
+        for lei in leis:
+            f.write(json.dumps({k: lei.get(k) for k in ("url", "titulo", "total_chunks", "hash_conteudo", "completa")},
+                               ensure_ascii=False) + "\n")
+
+    manifesto = {
+        "formato": FORMATO,
+        "colecao": colecao,
+        "pontos": total,
+        "leis": len(leis),
+        "dimensao": params_vetor.size,
+        "distancia": str(params_vetor.distance.value),
+        "modelo_embedding": LLM.bedrock_embed_model.model_name,
+        "hnsw": {"m": info.config.hnsw_config.m, "ef_construct": info.config.hnsw_config.ef_construct},
+        "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "arquivos": {nome: _sha256(os.path.join(parcial, nome)) for nome in (ARQ_VETORES, ARQ_PONTOS, ARQ_LEIS)},
+    }
+    with open(os.path.join(parcial, ARQ_MANIFESTO), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    os.replace(parcial, destino)
+
+    tamanho = sum(os.path.getsize(os.path.join(destino, a)) for a in os.listdir(destino))
+    print(f"✅ Snapshot em {destino}: {total} pontos, {len(leis)} leis, {tamanho / 1e6:.1f} MB "
+          f"em {time.perf_counter() - inicio:.1f} s")
+    return manifesto
+
+# ==============================================================================
+# 2. IMPORTAÇÃO (CARGA EM MASSA)
+# ==============================================================================
+def ler_manifesto(origem: str, verificar: bool = True) -> dict:
+    with open(os.path.join(origem, ARQ_MANIFESTO), encoding="utf-8") as f:
+        manifesto = json.load(f)
+    if manifesto.get("formato") != FORMATO:
+        raise ValueError(f"Formato de snapshot não suportado: {manifesto.get('formato')}")
+    if verificar:
+        for nome, esperado in manifesto["arquivos"].items():
+            if _sha256(os.path.join(origem, nome)) != esperado:
+                raise ValueError(f"Arquivo corrompido no snapshot: {nome}")
+    return manifesto
+
+def _payloads(origem: str):
+    with gzip.open(os.path.join(origem, ARQ_PONTOS), "rt", encoding="utf-8") as f:
+        for linha in f:
+            yield json.loads(linha)
+
+def importar(cliente: QdrantClient, origem: str, colecao: str, substituir: bool = False,
+             lote: int = 256, paralelo: int = 1, verificar: bool = True, forcar: bool = False) -> int:
+    manifesto = ler_manifesto(origem, verificar)
+    modelo = LLM.bedrock_embed_model.model_name
+    if (manifesto["dimensao"], manifesto["modelo_embedding"]) != (LLM.EMBED_DIM, modelo) and not forcar:
+        raise ValueError(
+            f"Snapshot de {manifesto['modelo_embedding']} ({manifesto['dimensao']}d), mas o app usa "
+            f"{modelo} ({LLM.EMBED_DIM}d): as buscas não funcionariam (use --forcar para importar mesmo assim)"
+        )
+
+    if cliente.collection_exists(colecao) and cliente.count(colecao, exact=True).count:
+        if not substituir:
+            raise ValueError(f"A coleção {colecao} não está vazia (use --substituir para apagá-la antes)")
+        print(f"🗑️ Apagando a coleção {colecao}...")
+        cliente.delete_collection(colecao)
+    if not qdrant_colecao.provisionar_colecao(cliente, colecao, manifesto["dimensao"]):
+        raise RuntimeError(f"Não foi possível criar a coleção {colecao}")
+
+    # Sem indexação HNSW durante a carga: o grafo é montado uma vez, no final
+    limiar = None
+    try:
+        limiar = cliente.get_collection(colecao).config.optimizer_config.indexing_threshold
+        if limiar is not None:
+            cliente.update_collection(colecao, optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0))
+    except Exception as e:
+        limiar = None
+        print(f"⚠️ Não foi possível adiar a indexação: {e}")
+
+    inicio = time.perf_counter()
+    vetores = np.load(os.path.join(origem, ARQ_VETORES), mmap_mode="r")
+    pontos = _payloads(origem)
+    try:
+        # ids e payloads vêm do mesmo arquivo: lidos aos blocos para não carregar tudo na memória
+        for bloco in range(0, manifesto["pontos"], lote * 64):
+            fim = min(bloco + lote * 64, manifesto["pontos"])
+            ids, payloads = [], []
+            for _ in range(bloco, fim):
+                p = next(pontos)
+                ids.append(p["id"])
+                payloads.append(p["payload"])
+            cliente.upload_collection(
+                colecao, vectors=np.asarray(vetores[bloco:fim]), payload=payloads, ids=ids,
+                batch_size=lote, parallel=paralelo, wait=True,
+            )
+            print(f"📥 {fim}/{manifesto['pontos']} pontos...", end="\r")
+    finally:
+        if limiar is not None:
+            try:
+                cliente.update_collection(colecao, optimizers_config=models.OptimizersConfigDiff(indexing_threshold=limiar))
+            except Exception as e:
+                print(f"⚠️ Não foi possível reativar a indexação: {e}")
+
+    total = cliente.count(colecao, exact=True).count
+    if total != manifesto["pontos"]:
+        raise RuntimeError(f"Carga incompleta: {total} de {manifesto['pontos']} pontos")
+
+    with open(os.path.join(origem, ARQ_LEIS), encoding="utf-8") as f:
+        leis = [json.loads(linha) for linha in f if linha.strip()]
+    # O registro confere com a coleção que acabou de ser carregada (listar_leis_no_banco)
+    ingestion.jobs.substituir_leis(leis, total if colecao == ingestion.COLLECTION_NAME else None)
+    # Respostas em cache do corpus anterior ficam velhas, inclusive as de leis que não vieram no snapshot
+    Rag.limpar_cache_semantico()
+    print(f"✅ {total} pontos e {len(leis)} leis importados em {time.perf_counter() - inicio:.1f} s "
+          f"(índice HNSW sendo montado em background)")
+    return total
+
+# ==============================================================================
+# 3. CLI
+# ==============================================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--colecao", default=ingestion.COLLECTION_NAME)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_exp = sub.add_parser("exportar", help="Grava o snapshot da coleção e do registro de leis")
+    p_exp.add_argument("--saida", default=None)
+
+    p_imp = sub.add_parser("importar", help="Carrega um snapshot num Qdrant vazio")
+    p_imp.add_argument("origem")
+    p_imp.add_argument("--substituir", action="store_true", help="Apaga a coleção se ela já tiver pontos")
+    p_imp.add_argument("--lote", type=int, default=256, help="Pontos por upsert")
+    p_imp.add_argument("--paralelo", type=int, default=2, help="Upserts simultâneos")
+    p_imp.add_argument("--sem-verificar", action="store_true", help="Pula a conferência dos sha256")
+    p_imp.add_argument("--forcar", action="store_true", help="Importa mesmo com modelo/dimensão diferentes")
+    args = parser.parse_args()
+
+    cliente = ingestion.client
+    try:
+        if args.comando == "exportar":
+            saida = args.saida or os.path.join(SNAPSHOT_DIR, f"{args.colecao}-{time.strftime('%Y%m%d-%H%M')}")
+            exportar(cliente, args.colecao, saida)
+        else:
+            importar(
+                cliente, args.origem, args.colecao, substituir=args.substituir, lote=args.lote,
+                paralelo=args.paralelo, verificar=not args.sem_verificar, forcar=args.forcar,
+            )
+    except Exception as e:
+        print(f"❌ SNAPSHOT: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Importar Rag/LLM cria os clientes do Bedrock (sem chamada de rede) e abre o cache de
+# embeddings: região padrão e caches num diretório temporário, fora do .cache do projeto
+_tmp = tempfile.mkdtemp(prefix="testes_leis_")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("EMBED_CACHE_PATH", os.path.join(_tmp, "embeddings.sqlite3"))
+os.environ.setdefault("INGEST_JOBS_PATH", os.path.join(_tmp, "ingestao_jobs.sqlite3"))
+os.environ.setdefault("HTML_CACHE_DIR", os.path.join(_tmp, "html"))
@@ -0,0 +1,95 @@
+"""areas_leis.py: áreas das seções de leis.txt e filtro da busca por perfil."""
+import os
+
+import pytest
+from qdrant_client import QdrantClient, models
+
+import areas_leis
+
+LEIS_TXT = """\
+# =======================================================
+# 1. TRABALHISTA
+# =======================================================
+https://www.planalto.gov.br/ccivil_03/decreto-lei/del5452.htm - Lei do trabalho (CLT)
+http://www.planalto.gov.br/ccivil_03/leis/l8036consol.htm/ - FGTS
+
+# =======================================================
+# 2. SOCIETÁRIO
+# =======================================================
+https://www.planalto.gov.br/ccivil_03/leis/l6404consol.htm - Lei das S/A
+https://www.planalto.gov.br/ccivil_03/decreto-lei/del5452.htm - CLT repetida (vale a primeira seção)
+
+# Links extras
+https://www.planalto.gov.br/ccivil_03/leis/l9999.htm
+"""
+
+@pytest.fixture
+def leis_txt(tmp_path, monkeypatch):
+    caminho = tmp_path / "leis.txt"
+    caminho.write_text(LEIS_TXT, encoding="utf-8")
+    monkeypatch.setattr(areas_leis, "LEIS_TXT_PATH", str(caminho))
+    monkeypatch.setattr(areas_leis, "_cache", {"mtime": None, "areas": {}})
+    return caminho
+
+def test_carregar_areas(leis_txt):
+    assert areas_leis.carregar_areas(str(leis_txt)) == {
+        "www.planalto.gov.br/ccivil_03/decreto-lei/del5452.htm": "trabalhista",
+        "www.planalto.gov.br/ccivil_03/leis/l8036consol.htm": "trabalhista",
+        "www.planalto.gov.br/ccivil_03/leis/l6404consol.htm": "societario",
+    }
+
+def test_area_da_url_normaliza_e_cai_em_geral(leis_txt):
+    assert areas_leis.area_da_url("http://WWW.planalto.gov.br/ccivil_03/decreto-lei/del5452.htm/") == "trabalhista"
+    assert areas_leis.area_da_url("https://www.planalto.gov.br/ccivil_03/leis/l9999.htm") == areas_leis.AREA_GERAL
+    assert areas_leis.areas_do_ponto([
+        "https://www.planalto.gov.br/ccivil_03/leis/l6404consol.htm",
+        "https://www.planalto.gov.br/ccivil_03/decreto-lei/del5452.htm",
+        None,
+    ]) == ["societario", "trabalhista"]
+
+def test_relido_quando_o_arquivo_muda(leis_txt):
+    url = "https://www.planalto.gov.br/ccivil_03/leis/l9999.htm"
+    assert areas_leis.area_da_url(url) == areas_leis.AREA_GERAL
+    leis_txt.write_text(LEIS_TXT + "\n# 3. SIMPLES\n" + url + "\n", encoding="utf-8")
+    mtime = os.path.getmtime(leis_txt) + 10
+    os.utime(leis_txt, (mtime, mtime))
+    assert areas_leis.area_da_url(url) == "simples"
+
+def test_sem_arquivo_tudo_geral(tmp_path, monkeypatch):
+    monkeypatch.setattr(areas_leis, "LEIS_TXT_PATH", str(tmp_path / "nao_existe.txt"))
+    assert areas_leis.area_da_url("https://www.planalto.gov.br/ccivil_03/decreto-lei/del5452.htm") == areas_leis.AREA_GERAL
+
+def test_filtro_do_perfil(monkeypatch):
+    filtro = areas_leis.filtro_do_perfil("trabalhista")
+    por_area, sem_area = filtro.should
+    assert por_area.key == areas_leis.CAMPO_AREA
+    assert por_area.match.any == ["trabalhista", areas_leis.AREA_GERAL]
+    assert sem_area.is_empty.key == areas_leis.CAMPO_AREA
+    assert areas_leis.escopo_do_cache("trabalhista") == "trabalhista"
+
+    # Perfil desconhecido ou filtro desligado: coleção inteira
+    assert areas_leis.filtro_do_perfil("generico") is None
+    assert areas_leis.escopo_do_cache("generico") == ""
+    monkeypatch.setattr(areas_leis, "RAG_FILTRO_AREA", False)
+    assert areas_leis.filtro_do_perfil("trabalhista") is None
+
+def test_escopo_da_busca():
+    assert areas_leis.filtro_da_busca() is None
+    with areas_leis.escopo("simples"):
+        assert areas_leis.filtro_da_busca().should[0].match.any == ["simples", areas_leis.AREA_GERAL]
+        with areas_leis.escopo(None):
+            assert areas_leis.filtro_da_busca() is None
+    assert areas_leis.filtro_da_busca() is None
+
+def test_filtro_na_colecao():
+    cliente = QdrantClient(":memory:")
+    cliente.create_collection("t", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    cliente.upsert("t", points=[
+        models.PointStruct(id=1, vector=[1.0, 0.0], payload={areas_leis.CAMPO_AREA: ["trabalhista"]}),
+        models.PointStruct(id=2, vector=[1.0, 0.1], payload={areas_leis.CAMPO_AREA: ["societario"]}),
+        models.PointStruct(id=3, vector=[1.0, 0.2], payload={areas_leis.CAMPO_AREA: [areas_leis.AREA_GERAL]}),
+        models.PointStruct(id=4, vector=[1.0, 0.3], payload={}),
+        models.PointStruct(id=5, vector=[1.0, 0.4], payload={areas_leis.CAMPO_AREA: ["societario", "trabalhista"]}),
+    ])
+    achados = cliente.search("t", query_vector=[1.0, 0.0], limit=10, query_filter=areas_leis.filtro_do_perfil("trabalhista"))
+    assert sorted(p.id for p in achados) == [1, 3, 4, 5]
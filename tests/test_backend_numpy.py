@@ -0,0 +1,137 @@
+"""BackendNumpy (cache_backends.py): KNN por cosseno, perfis, despejo LRU/LFU, TTL, invalidação (e versão mínima) e snapshot."""
+import time
+
+import numpy as np
+import pytest
+
+from cache_backends import BackendNumpy
+
+def _vetor(i, dim=8):
+    v = np.zeros(dim, dtype=np.float32)
+    v[i % dim] = 1.0
+    return v.tolist()
+
+def _nodes(*urls):
+    return [{"url_geral": u, "texto": "trecho"} for u in urls]
+
+def test_vizinho_mais_proximo():
+    backend = BackendNumpy(capacidade=8)
+    backend.gravar("k0", "p0", _vetor(0), "r0", None, 0)
+    backend.gravar("k1", "p1", _vetor(1), "r1", None, 0)
+    consulta = np.array(_vetor(1)) + 0.1 * np.array(_vetor(0))
+    entrada = backend.buscar(consulta.tolist())
+    assert entrada["resposta"] == "r1"
+    assert entrada["distancia"] == pytest.approx(1 - 1 / np.sqrt(1.01), abs=1e-5)
+    assert backend.buscar(_vetor(1, dim=4)) is None  # dimensão diferente
+
+def test_perfis_separados():
+    backend = BackendNumpy(capacidade=8)
+    backend.gravar("k_todos", "p", _vetor(0), "coleção inteira", None, 0)
+    backend.gravar("k_trab", "p", _vetor(0), "trabalhista", None, 0, perfil="trabalhista")
+    assert backend.buscar(_vetor(0))["resposta"] == "coleção inteira"
+    assert backend.buscar(_vetor(0), "trabalhista")["resposta"] == "trabalhista"
+    assert backend.buscar(_vetor(0), "simples") is None
+
+def test_despejo_lru():
+    backend = BackendNumpy(capacidade=2, politica="lru")
+    backend.gravar("a", "a", _vetor(0), "a", None, 0)
+    backend.gravar("b", "b", _vetor(1), "b", None, 0)
+    backend.buscar(_vetor(0))  # "a" usado por último
+    backend.gravar("c", "c", _vetor(2), "c", None, 0)
+    assert backend.ler("b") is None
+    assert backend.ler("a") is not None and backend.ler("c") is not None
+    assert backend.tamanho() == 2
+
+def test_despejo_lfu():
+    backend = BackendNumpy(capacidade=2, politica="lfu")
+    backend.gravar("a", "a", _vetor(0), "a", None, 0)
+    backend.gravar("b", "b", _vetor(1), "b", None, 0)
+    for _ in range(3):
+        backend.buscar(_vetor(0))
+    backend.buscar(_vetor(1))  # "b" é o mais recente, mas o menos usado
+    backend.gravar("c", "c", _vetor(2), "c", None, 0)
+    assert backend.ler("b") is None
+    assert backend.ler("a") is not None
+
+def test_vizinho_acima_do_limiar_nao_conta_como_uso():
+    backend = BackendNumpy(capacidade=2, politica="lru", limiar_distancia=0.35)
+    backend.gravar("a", "a", _vetor(0), "a", None, 0)
+    backend.gravar("b", "b", _vetor(1), "b", None, 0)
+    # Vizinho mais próximo é "a", a 60° da consulta: distância 0.5, acima do limiar
+    consulta = (np.array(_vetor(0)) + np.sqrt(3) * np.array(_vetor(2))).tolist()
+    assert backend.buscar(consulta)["distancia"] == pytest.approx(0.5, abs=1e-5)
+    backend.gravar("c", "c", _vetor(2), "c", None, 0)
+    # Miss não renovou "a": ele continua o mais antigo e sai primeiro
+    assert backend.ler("a") is None
+    assert backend.ler("b") is not None
+
+def test_ttl(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: agora[0])
+    backend = BackendNumpy(capacidade=4, ttl_segundos=10)
+    backend.gravar("a", "a", _vetor(0), "a", None, 0)
+    agora[0] += 11
+    assert backend.buscar(_vetor(0)) is None
+    assert backend.ler("a") is None
+    assert backend.tamanho() == 0
+
+def test_regravar_mesma_chave_reaproveita_o_slot():
+    backend = BackendNumpy(capacidade=2)
+    backend.gravar("a", "a", _vetor(0), "velha", None, 0)
+    backend.gravar("a", "a", _vetor(0), "nova", None, 1)
+    assert backend.tamanho() == 1
+    assert backend.ler("a")["resposta"] == "nova"
+
+def test_invalidar_urls_e_tudo():
+    backend = BackendNumpy(capacidade=8)
+    backend.gravar("clt", "p", _vetor(0), None, _nodes("http://lei/clt"), 0)
+    backend.gravar("lc123", "p", _vetor(1), None, _nodes("http://lei/lc123"), 0)
+    backend.gravar("sem_fonte", "p", _vetor(2), "não encontrei", [], 0)
+    assert backend.invalidar_urls(["http://lei/clt"]) == 2  # a da CLT e a sem fonte
+    assert backend.ler("lc123") is not None
+    assert backend.versao_corpus() == 1
+    assert backend.versao_minima() == 0
+    assert backend.invalidar_tudo() == 1
+    assert backend.tamanho() == 0
+    assert (backend.versao_corpus(), backend.versao_minima()) == (2, 2)
+
+def test_rag_descarta_entrada_anterior_a_versao_minima(monkeypatch):
+    import Rag
+
+    backend = BackendNumpy(capacidade=8)
+    backend.invalidar_tudo()
+    # Gravação que começou antes da troca do corpus (versão lida antes) e terminou depois
+    backend.gravar("velha", "p", _vetor(0), "resposta velha", None, 0)
+    backend.gravar("nova", "p", _vetor(1), "resposta nova", None, 1)
+    monkeypatch.setattr(Rag, "_versao_minima_local", backend.versao_minima())
+    assert Rag._avaliar_vizinho(backend.buscar(_vetor(0)), backend.nome) is None
+    assert Rag._avaliar_vizinho(backend.buscar(_vetor(1)), backend.nome) == "resposta nova"
+
+def test_snapshot_no_encerramento(tmp_path, monkeypatch):
+    import atexit
+
+    registrados = []
+    monkeypatch.setattr(atexit, "register", registrados.append)
+    caminho = str(tmp_path / "cache.npz")
+    backend = BackendNumpy(capacidade=8, caminho_snapshot=caminho, intervalo_snapshot_s=3600)
+    assert registrados == [backend.fechar]
+    backend.gravar("a", "a", _vetor(0), "a", None, 0)
+    backend.fechar()
+    assert BackendNumpy(capacidade=8, caminho_snapshot=caminho, intervalo_snapshot_s=3600).ler("a") is not None
+
+def test_snapshot_ida_e_volta(tmp_path):
+    caminho = str(tmp_path / "cache.npz")
+    backend = BackendNumpy(capacidade=8, caminho_snapshot=caminho, intervalo_snapshot_s=3600)
+    backend.gravar("sintese", "pergunta 1", _vetor(0), "resposta", _nodes("http://lei/lc123"), 3)
+    backend.gravar("trechos", "pergunta 2", _vetor(1), None, _nodes("http://lei/clt"), 3, perfil="trabalhista")
+    backend.salvar_snapshot()
+
+    novo = BackendNumpy(capacidade=8, caminho_snapshot=caminho, intervalo_snapshot_s=3600)
+    assert novo.tamanho() == 2
+    assert novo.buscar(_vetor(0))["resposta"] == "resposta"
+    trechos = novo.buscar(_vetor(1), "trabalhista")
+    assert trechos["urls"] == "http://lei/clt"
+    assert trechos["nodes"] == backend.ler("trechos")["nodes"]
+    # A reidratação mantém as URLs de cada entrada (invalidação seletiva)
+    assert novo.invalidar_urls(["http://lei/clt"]) == 1
+    assert novo.ler("sintese") is not None
@@ -0,0 +1,50 @@
+"""CacheL1 (Rag.py): chave normalizada, LRU limitado e TTL."""
+import time
+
+import pytest
+
+from Rag import CacheL1, normalizar_pergunta
+
+def test_normalizacao_da_chave():
+    assert normalizar_pergunta("  Qual o PRAZO   de aviso prévio? ") == "qual o prazo de aviso previo?"
+    cache = CacheL1(max_itens=10, ttl_segundos=60)
+    cache.set("Aviso   Prévio", "30 dias")
+    assert cache.get("aviso previo") == "30 dias"
+
+def test_lru_despeja_o_menos_usado():
+    cache = CacheL1(max_itens=2, ttl_segundos=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" passa a ser o mais antigo
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.estatisticas()["itens"] == 2
+
+def test_ttl_expira(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: agora[0])
+    cache = CacheL1(max_itens=10, ttl_segundos=5)
+    cache.set("p", "r")
+    agora[0] += 4
+    assert cache.get("p") == "r"
+    agora[0] += 2
+    assert cache.get("p") is None
+    assert cache.estatisticas()["itens"] == 0
+
+@pytest.mark.parametrize("max_itens, ttl", [(0, 60), (10, 0)])
+def test_desligado(max_itens, ttl):
+    cache = CacheL1(max_itens=max_itens, ttl_segundos=ttl)
+    cache.set("p", "r")
+    assert cache.get("p") is None
+
+def test_estatisticas_e_limpar():
+    cache = CacheL1(max_itens=10, ttl_segundos=60)
+    cache.set("p", "r")
+    cache.get("p")
+    cache.get("outra")
+    stats = cache.estatisticas()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    cache.limpar()
+    assert cache.get("p") is None
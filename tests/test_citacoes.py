@@ -0,0 +1,109 @@
+"""citacoes.py: parser de citações de artigo/lei, o mapa título/URL -> lei do registro e a leitura no Qdrant."""
+import json
+import time
+
+import pytest
+from qdrant_client import QdrantClient, models
+
+import citacoes
+from citacoes import DECRETO, DECRETO_LEI, LEI, LEI_COMPLEMENTAR, extrair_citacoes
+
+CLT = (DECRETO_LEI, "5452")
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("O que diz o Art. 477 da CLT?", [(CLT, ["477"])]),
+    ("CLT, art. 477", [(CLT, ["477"])]),
+    ("arts. 477, 478 e 480 da CLT", [(CLT, ["477", "478", "480"])]),
+    ("arts. 58 a 60 da Lei nº 13.467", [((LEI, "13467"), ["58", "59", "60"])]),
+    ("art. 1.000 do Código Civil", [((LEI, "10406"), ["1000"])]),
+    ("art. 3º da LC 123 e art. 2 do Decreto 9.580",
+     [((LEI_COMPLEMENTAR, "123"), ["3"]), ((DECRETO, "9580"), ["2"])]),
+    ("art. 5 da lei 8036 e art. 7 da lei 6019", [((LEI, "8036"), ["5"]), ((LEI, "6019"), ["7"])]),
+])
+def test_extrai_citacoes(texto, esperado):
+    assert extrair_citacoes(texto) == esperado
+
+@pytest.mark.parametrize("texto", [
+    "art. 10 e art. 20 sem lei",  # artigo sem lei citada
+    "aviso prévio na CLT",        # lei sem artigo
+    "art. 7-A da lei 6019",       # artigo com letra fica para a busca normal
+])
+def test_sem_citacao_resolvivel(texto):
+    assert extrair_citacoes(texto) == []
+
+def test_intervalo_longo_nao_expande():
+    assert extrair_citacoes("arts. 1 a 9 da CLT") == [(CLT, ["1"])]
+
+def test_chave_da_lei_pelo_titulo_e_pela_url():
+    assert citacoes.chave_da_lei("DECRETO-LEI Nº 5.452, DE 1º DE MAIO DE 1943", "") == CLT
+    assert citacoes.chave_da_lei("", "https://www.planalto.gov.br/ccivil_03/leis/lcp/lcp123.htm") == (LEI_COMPLEMENTAR, "123")
+    assert citacoes.chave_da_lei("Sem título", "https://x/l13467compilado.htm") == (LEI, "13467")
+    assert citacoes.chave_da_lei("Sem título", "https://x/pagina.html") is None
+
+def test_resolver_lei():
+    por_chave = citacoes.mapear_leis([
+        {"titulo": "DECRETO-LEI Nº 5.452, DE 1º DE MAIO DE 1943", "url": "http://clt"},
+        {"titulo": "LEI Nº 13.467, DE 13 DE JULHO DE 2017", "url": "http://reforma"},
+        {"titulo": "LEI Nº 123, DE 2000", "url": "http://lei123"},
+        {"titulo": "LEI COMPLEMENTAR Nº 123, DE 14 DE DEZEMBRO DE 2006", "url": "http://simples"},
+        {"titulo": "Sem título", "url": "http://outra"},
+    ])
+    assert len(por_chave) == 4
+    assert citacoes.resolver_lei(CLT, por_chave) == "http://clt"
+    # Tipo diferente, número único no registro: aceita
+    assert citacoes.resolver_lei((LEI, "5452"), por_chave) == "http://clt"
+    # Número ambíguo (lei e lei complementar 123) só com o tipo exato
+    assert citacoes.resolver_lei((LEI_COMPLEMENTAR, "123"), por_chave) == "http://simples"
+    assert citacoes.resolver_lei((DECRETO, "123"), por_chave) is None
+    assert citacoes.resolver_lei((LEI, "9999"), por_chave) is None
+
+def test_mapa_em_cache_ate_invalidar_ou_expirar(monkeypatch):
+    import ingestion
+
+    listagens = []
+    def listar():
+        listagens.append(1)
+        return [{"titulo": "DECRETO-LEI Nº 5.452, DE 1º DE MAIO DE 1943", "url": "http://clt"}]
+
+    agora = [1000.0]
+    monkeypatch.setattr(ingestion, "listar_leis_no_banco", listar)
+    monkeypatch.setattr(time, "monotonic", lambda: agora[0])
+    citacoes.invalidar_mapa_leis()
+
+    assert citacoes._mapa_atual() == {CLT: "http://clt"}
+    citacoes._mapa_atual()
+    assert len(listagens) == 1
+
+    citacoes.invalidar_mapa_leis()
+    citacoes._mapa_atual()
+    assert len(listagens) == 2
+
+    agora[0] += citacoes.CITACAO_MAPA_TTL_S + 1
+    citacoes._mapa_atual()
+    assert len(listagens) == 3
+    citacoes.invalidar_mapa_leis()
+
+def test_artigo_com_milhar_do_fatiamento_ao_buscar_artigo():
+    import ingestion
+    import utils
+
+    url = "http://planalto/l10406.htm"
+    texto = (
+        "LEI No 10.406, DE 10 DE JANEIRO DE 2002\n"
+        "Art. 1.052. Na sociedade limitada, a responsabilidade de cada sócio é restrita ao valor de suas quotas.\n"
+        "Art. 1.053. A sociedade limitada rege-se, nas omissões deste Capítulo, pelas normas da sociedade simples."
+    )
+    documentos = ingestion.montar_documentos(utils.fatiar_por_artigos(texto, "Código Civil", url), url)
+    assert [d.metadata["numero_artigo"] for d in documentos] == ["0", "1052", "1053"]
+
+    cliente = QdrantClient(":memory:")
+    cliente.create_collection("t", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    cliente.upsert("t", points=[
+        models.PointStruct(id=d.id_, vector=[1.0, 0.0], payload=dict(
+            d.metadata, _node_content=json.dumps({"text": d.text, "metadata": d.metadata})
+        ))
+        for d in documentos
+    ])
+    [(_, artigos)] = extrair_citacoes("o que diz o art. 1.052 do Código Civil?")
+    trechos = citacoes.buscar_artigo(cliente, "t", url, artigos[0])
+    assert [(t["numero_artigo"], t["texto"]) for t in trechos] == [("1052", documentos[1].text)]
@@ -0,0 +1,143 @@
+"""deduplicacao.py: assinaturas (MinHash/Jaccard) e vínculos de proveniência num Qdrant em memória."""
+import json
+import uuid
+
+import pytest
+from llama_index.core.schema import TextNode
+from qdrant_client import QdrantClient, models
+
+import deduplicacao as dd
+
+COLECAO = "leis_teste"
+CLT = "http://planalto/del5452.htm"
+REFORMA = "http://planalto/l13467.htm"
+ESTAGIO = "http://planalto/l11788.htm"
+
+ARTIGO = (
+    "O empregador que despedir o empregado sem justa causa deverá pagar as verbas rescisórias "
+    "no prazo de dez dias contados a partir do término do contrato, sob pena de multa em favor "
+    "do empregado em valor equivalente ao seu salário, devidamente corrigido, salvo quando o "
+    "trabalhador der causa à mora, conforme previsto em regulamento próprio do ministério"
+)
+# Mesmo artigo com uma palavra trocada: Jaccard dos shingles acima do limiar
+ARTIGO_ALTERADO = ARTIGO.replace("dez dias", "quinze dias")
+OUTRO = (
+    "A sociedade anônima terá o capital dividido em ações e a responsabilidade dos sócios ou "
+    "acionistas será limitada ao preço de emissão das ações subscritas ou adquiridas, podendo "
+    "o estatuto prever a emissão de ações preferenciais sem direito a voto em limite definido"
+)
+
+def _documento(url, source, numero, texto):
+    return TextNode(
+        id_=str(uuid.uuid5(uuid.NAMESPACE_URL, f"{url}#{numero}")),
+        text=texto,
+        metadata={"source": source, "url_geral": url, "tipo": "Artigo", "numero_artigo": numero,
+                  "parte": 1, "hash_conteudo": dd.hash_texto(texto)},
+    )
+
+def _gravar(cliente, documento, vetor=(1.0, 0.0)):
+    """Ponto no formato do QdrantVectorStore (metadata no payload + _node_content)."""
+    node = {"id_": documento.id_, "text": documento.text, "metadata": dict(documento.metadata), "relationships": {}}
+    payload = dict(documento.metadata, _node_content=json.dumps(node), **dd.campos_payload(documento.text))
+    cliente.upsert(COLECAO, points=[models.PointStruct(id=documento.id_, vector=list(vetor), payload=payload)])
+    return cliente.retrieve(COLECAO, ids=[documento.id_], with_payload=True)[0]
+
+@pytest.fixture
+def cliente():
+    c = QdrantClient(":memory:")
+    c.create_collection(COLECAO, vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    return c
+
+def test_normalizacao_ignora_rotulo_continuacao_e_acentos():
+    base = dd.normalizar_texto("Art. 477º - O empregador deverá pagar as verbas.")
+    assert base == "o empregador devera pagar as verbas"
+    assert dd.normalizar_texto("[Continuação do Art. 477 da CLT] ... O EMPREGADOR deverá pagar, as verbas") == base
+    # O "O" que abre o caput não é o ordinal do rótulo
+    assert dd.normalizar_texto("Art. 477. O empregador deverá pagar as verbas.") == base
+    assert dd.normalizar_texto("Art. 1o O empregador deverá pagar as verbas.") == base
+
+def test_minhash_aproxima_jaccard():
+    a = dd.shingles(dd.normalizar_texto(ARTIGO))
+    b = dd.shingles(dd.normalizar_texto(ARTIGO_ALTERADO))
+    c = dd.shingles(dd.normalizar_texto(OUTRO))
+    assert dd.jaccard(a, a) == 1.0
+    assert dd.jaccard(a, b) >= dd.DEDUP_LIMIAR
+    assert dd.jaccard(a, c) == 0.0
+    assert dd.jaccard(a, set()) == 0.0
+    # Quase-duplicatas caem em alguma banda igual; textos sem relação, em nenhuma
+    assert set(dd.bandas_lsh(a)) & set(dd.bandas_lsh(b))
+    assert not set(dd.bandas_lsh(a)) & set(dd.bandas_lsh(c))
+    assert dd.bandas_lsh(a) == dd.bandas_lsh(set(a))
+
+def test_buscar_duplicatas(cliente):
+    existente = _gravar(cliente, _documento(CLT, "CLT", "477", ARTIGO))
+    _gravar(cliente, _documento(CLT, "CLT", "1", OUTRO))
+    documentos = [
+        _documento(REFORMA, "Reforma", "477", "Art. 477. " + ARTIGO.upper()),  # igual depois de normalizar
+        _documento(REFORMA, "Reforma", "478", ARTIGO_ALTERADO),               # quase igual
+        _documento(REFORMA, "Reforma", "479", "O empregador deverá pagar."),   # curto demais
+        _documento(REFORMA, "Reforma", "480", OUTRO.replace("ações", "quotas")),  # Jaccard abaixo do limiar
+    ]
+    achados = dd.buscar_duplicatas(cliente, COLECAO, REFORMA, documentos)
+    assert sorted(achados) == [0, 1]
+    assert (achados[0][0].id, achados[0][1]) == (existente.id, 1.0)
+    assert achados[1][0].id == existente.id and dd.DEDUP_LIMIAR <= achados[1][1] < 1.0
+
+    # Pontos da própria lei não contam como duplicata
+    assert dd.buscar_duplicatas(cliente, COLECAO, CLT, [_documento(CLT, "CLT", "477", ARTIGO)]) == {}
+    assert dd.buscar_duplicatas(cliente, "nao_existe", REFORMA, documentos) == {}
+
+def _payload(cliente, pid):
+    return cliente.retrieve(COLECAO, ids=[pid], with_payload=True)[0].payload
+
+def test_vincular_e_idempotente(cliente):
+    ponto = _gravar(cliente, _documento(CLT, "CLT", "477", ARTIGO))
+    reforma = _documento(REFORMA, "Reforma", "477", ARTIGO)
+    estagio = _documento(ESTAGIO, "Estágio", "9", ARTIGO_ALTERADO)
+    ligacoes = [(ponto, dd.entrada_proveniencia(reforma, 1.0, ponto)), (ponto, dd.entrada_proveniencia(estagio, 0.9, ponto))]
+    dd.vincular(cliente, COLECAO, ligacoes)
+    dd.vincular(cliente, COLECAO, ligacoes[:1])
+
+    payload = _payload(cliente, ponto.id)
+    proveniencia = payload[dd.CAMPO_PROVENIENCIA]
+    assert [e["url_geral"] for e in proveniencia] == [ESTAGIO, REFORMA]
+    assert payload[dd.CAMPO_URLS_PROVENIENCIA] == sorted([REFORMA, ESTAGIO])
+    # Só a quase-duplicata guarda o próprio texto
+    por_url = {e["url_geral"]: e for e in proveniencia}
+    assert dd.CAMPO_TEXTO_PROPRIO not in por_url[REFORMA]
+    assert dd.texto_da_entrada(payload, por_url[REFORMA]) == ARTIGO
+    assert dd.texto_da_entrada(payload, por_url[ESTAGIO]) == ARTIGO_ALTERADO
+    meta = json.loads(payload["_node_content"])["metadata"]
+    assert meta[dd.CAMPO_TAMBEM_EM] == "Estágio, Art. 9; Reforma, Art. 477"
+
+    # Pontos vinculados entram no filtro das outras leis
+    da_reforma = cliente.scroll(COLECAO, scroll_filter=dd.filtro_da_lei(REFORMA))[0]
+    assert [p.id for p in da_reforma] == [ponto.id]
+
+def test_desvincular_lei_da_proveniencia(cliente):
+    ponto = _gravar(cliente, _documento(CLT, "CLT", "477", ARTIGO))
+    reforma = _documento(REFORMA, "Reforma", "477", ARTIGO)
+    dd.vincular(cliente, COLECAO, [(ponto, dd.entrada_proveniencia(reforma, 1.0, ponto))])
+
+    # Trecho continua na reforma: nada muda
+    assert dd.desvincular(cliente, COLECAO, REFORMA, [reforma.metadata["hash_conteudo"]]) == 0
+    assert dd.desvincular(cliente, COLECAO, REFORMA, []) == 1
+    payload = _payload(cliente, ponto.id)
+    assert payload[dd.CAMPO_PROVENIENCIA] == []
+    assert payload[dd.CAMPO_URLS_PROVENIENCIA] == []
+    assert dd.CAMPO_TAMBEM_EM not in json.loads(payload["_node_content"])["metadata"]
+
+def test_desvincular_dono_passa_ponto_para_a_proxima_lei(cliente):
+    ponto = _gravar(cliente, _documento(CLT, "CLT", "477", ARTIGO), vetor=(0.6, 0.8))
+    estagio = _documento(ESTAGIO, "Estágio", "9", ARTIGO_ALTERADO)
+    dd.vincular(cliente, COLECAO, [(ponto, dd.entrada_proveniencia(estagio, 0.9, ponto))])
+
+    assert dd.desvincular(cliente, COLECAO, CLT, []) == 1
+    assert cliente.retrieve(COLECAO, ids=[ponto.id]) == []
+    novo = cliente.retrieve(COLECAO, ids=[estagio.id_], with_payload=True, with_vectors=True)[0]
+    assert novo.vector == pytest.approx([0.6, 0.8])
+    assert novo.payload["url_geral"] == ESTAGIO and novo.payload["numero_artigo"] == "9"
+    assert novo.payload[dd.CAMPO_PROVENIENCIA] == []
+    node = json.loads(novo.payload["_node_content"])
+    assert node["id_"] == estagio.id_ and node["text"] == ARTIGO_ALTERADO
+    assert novo.payload[dd.CAMPO_HASH_TEXTO] == dd.campos_payload(ARTIGO_ALTERADO)[dd.CAMPO_HASH_TEXTO]
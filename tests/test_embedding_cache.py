@@ -0,0 +1,97 @@
+"""EmbeddingStore / CachedEmbedding (embedding_cache.py): ida e volta em memória e no SQLite."""
+from typing import List
+
+import pytest
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from embedding_cache import CachedEmbedding, EmbeddingStore, gerar_chave_embedding
+
+class EmbeddingContado(BaseEmbedding):
+    """Vetor determinístico por texto; conta os textos que chegaram ao "modelo"."""
+    chamadas: List[str] = []
+
+    def _vetor(self, texto: str) -> List[float]:
+        self.chamadas.append(texto)
+        return [float(len(texto)), float(sum(map(ord, texto)) % 97), 0.25]
+
+    def _get_query_embedding(self, query):
+        return self._vetor(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._vetor(query)
+
+    def _get_text_embedding(self, text):
+        return self._vetor(text)
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / "embeddings.sqlite3")
+
+def test_chave_separa_modelo_e_dimensao():
+    chaves = {
+        gerar_chave_embedding("titan", 1024, "texto"),
+        gerar_chave_embedding("titan", 512, "texto"),
+        gerar_chave_embedding("outro", 1024, "texto"),
+        gerar_chave_embedding("titan", 1024, "texto "),
+    }
+    assert len(chaves) == 4
+
+def test_ida_e_volta_no_disco(caminho):
+    store = EmbeddingStore(caminho, max_memoria=10)
+    store.put_many({"a": [0.1, 0.2], "b": [1.5, -2.0]})
+    assert store.get("a") == pytest.approx([0.1, 0.2])
+
+    # Outro processo (store novo) lê do SQLite, em float32
+    outro = EmbeddingStore(caminho, max_memoria=10)
+    assert outro.get_many(["a", "b", "c"]) == {"a": pytest.approx([0.1, 0.2]), "b": [1.5, -2.0]}
+    stats = outro.estatisticas()
+    assert (stats["hits_disco"], stats["misses"], stats["itens_disco"]) == (2, 1, 2)
+    # Agora está na memória
+    outro.get("a")
+    assert outro.estatisticas()["hits_memoria"] == 1
+
+def test_contagem_do_disco_sem_count_a_cada_chamada(caminho, monkeypatch):
+    import embedding_cache
+
+    agora = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: agora[0])
+    store = EmbeddingStore(caminho, max_memoria=10)
+    assert store.estatisticas()["itens_disco"] == 0
+    # Gravações do próprio store somam na hora; chave repetida não conta duas vezes
+    store.put_many({"a": [1.0], "b": [2.0]})
+    store.put_many({"a": [1.0], "c": [3.0]})
+    assert store.estatisticas()["itens_disco"] == 3
+
+    # Outro processo só aparece depois do TTL
+    EmbeddingStore(caminho, max_memoria=10).put("d", [4.0])
+    assert store.estatisticas()["itens_disco"] == 3
+    agora[0] += embedding_cache.EMBED_CACHE_CONTAGEM_TTL_S
+    assert store.estatisticas()["itens_disco"] == 4
+
+def test_lru_da_memoria(caminho):
+    store = EmbeddingStore(caminho, max_memoria=2)
+    store.put_many({"a": [1.0], "b": [2.0], "c": [3.0]})
+    assert store.estatisticas()["itens_memoria"] == 2
+    # "a" saiu da memória mas continua no disco
+    assert store.get("a") == [1.0]
+    assert store.estatisticas()["hits_disco"] == 1
+
+def test_cached_embedding_so_chama_o_modelo_nos_misses(caminho):
+    base = EmbeddingContado(model_name="teste", chamadas=[])
+    modelo = CachedEmbedding(base, dimensao=3, store=EmbeddingStore(caminho))
+    primeiros = modelo.get_text_embedding_batch(["art. 1", "art. 2", "art. 1"])
+    assert base.chamadas == ["art. 1", "art. 2"]
+    assert primeiros[0] == primeiros[2]
+
+    assert modelo.get_text_embedding_batch(["art. 2", "art. 3"])[0] == primeiros[1]
+    assert base.chamadas == ["art. 1", "art. 2", "art. 3"]
+
+    modelo.get_query_embedding("pergunta")
+    modelo.get_query_embedding("pergunta")
+    assert base.chamadas.count("pergunta") == 1
+
+    # Reinício: o cache em disco serve sem chamar o modelo
+    base_nova = EmbeddingContado(model_name="teste", chamadas=[])
+    reiniciado = CachedEmbedding(base_nova, dimensao=3, store=EmbeddingStore(caminho))
+    assert reiniciado.get_text_embedding("art. 3") == pytest.approx(base._vetor("art. 3"))
+    assert base_nova.chamadas == []
@@ -0,0 +1,102 @@
+"""LimitadorAdaptativo / EmbeddingConcorrente (embedding_concorrente.py): AIMD e retentativa no throttling."""
+import threading
+from typing import List
+
+import pytest
+from botocore.exceptions import ClientError
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from embedding_concorrente import EmbeddingConcorrente, LimitadorAdaptativo, eh_sobrecarga
+
+def _throttling():
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "InvokeModel")
+
+def _rodada(limitador, n):
+    """n chamadas que terminam com sucesso, uma por vez."""
+    for _ in range(n):
+        limitador.adquirir()
+        limitador.sucesso()
+
+def test_eh_sobrecarga():
+    assert eh_sobrecarga(_throttling())
+    assert not eh_sobrecarga(ClientError({"Error": {"Code": "ValidationException"}}, "InvokeModel"))
+    assert not eh_sobrecarga(ValueError("outra coisa"))
+
+def test_aumento_aditivo_por_rodada():
+    limitador = LimitadorAdaptativo(inicial=2, minimo=1, maximo=4, pausa_base=0)
+    _rodada(limitador, 2)
+    assert limitador.limite == 3
+    _rodada(limitador, 2)
+    assert limitador.limite == 3  # a rodada agora é de 3 sucessos
+    _rodada(limitador, 1)
+    assert limitador.limite == 4
+    _rodada(limitador, 20)
+    assert limitador.limite == 4  # teto
+    assert limitador.estatisticas()["limite_maximo_usado"] == 4
+
+def test_corte_multiplicativo_uma_vez_por_geracao():
+    limitador = LimitadorAdaptativo(inicial=8, minimo=1, maximo=8, pausa_base=0)
+    geracoes = [limitador.adquirir() for _ in range(3)]
+    # As três chamadas em voo voltam com throttling: só a primeira corta
+    for geracao in geracoes:
+        limitador.sobrecarga(geracao)
+    stats = limitador.estatisticas()
+    assert (limitador.limite, stats["cortes"], stats["throttles"]) == (4, 1, 3)
+    # Nova geração: corta de novo, até o mínimo
+    for esperado in (2, 1, 1):
+        limitador.sobrecarga(limitador.adquirir())
+        assert limitador.limite == esperado
+
+def test_limite_segura_chamadas_em_voo():
+    limitador = LimitadorAdaptativo(inicial=2, minimo=1, maximo=2, pausa_base=0)
+    limitador.adquirir()
+    limitador.adquirir()
+    terceira = threading.Event()
+    def adquirir_terceira():
+        limitador.adquirir()
+        terceira.set()
+    threading.Thread(target=adquirir_terceira, daemon=True).start()
+    assert not terceira.wait(0.2)
+    limitador.falha()  # libera uma vaga sem contar sucesso
+    assert terceira.wait(2)
+
+_lock_chamadas = threading.Lock()
+
+class EmbeddingInstavel(BaseEmbedding):
+    """Responde throttling nas primeiras `falhas` chamadas."""
+    falhas: int = 0
+    chamadas: List[str] = []
+
+    def _vetor(self, texto):
+        with _lock_chamadas:
+            self.chamadas.append(texto)
+            falhou = len(self.chamadas) <= self.falhas
+        if falhou:
+            raise _throttling()
+        return [float(len(texto))]
+
+    def _get_query_embedding(self, query):
+        return self._vetor(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._vetor(query)
+
+    def _get_text_embedding(self, text):
+        return self._vetor(text)
+
+def test_retenta_throttling_e_preserva_a_ordem():
+    base = EmbeddingInstavel(model_name="teste", falhas=2, chamadas=[])
+    limitador = LimitadorAdaptativo(inicial=2, minimo=1, maximo=4, pausa_base=0)
+    modelo = EmbeddingConcorrente(base, limitador=limitador, tentativas=5)
+    textos = ["a", "bb", "ccc", "dddd", "eeeee"]
+    assert modelo.get_text_embedding_batch(textos) == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    stats = modelo.estatisticas()
+    assert stats["throttles"] == 2
+    assert stats["chamadas"] == len(textos)
+
+def test_desiste_depois_das_tentativas():
+    base = EmbeddingInstavel(model_name="teste", falhas=10, chamadas=[])
+    modelo = EmbeddingConcorrente(base, limitador=LimitadorAdaptativo(pausa_base=0), tentativas=3)
+    with pytest.raises(ClientError):
+        modelo.get_text_embedding("texto")
+    assert len(base.chamadas) == 3
@@ -0,0 +1,46 @@
+"""
+Extração HTML -> (título, texto) dos dois extratores contra o golden salvo em
+tests/fixtures/extracao (saída do bs4, o extrator de referência).
+Mudança intencional na extração: regrave o .golden.json com o bs4 e revise o diff.
+Nas leis reais do leis.txt, o equivalente é scripts/golden_extracao.py.
+"""
+import os
+import glob
+import json
+
+import pytest
+
+import utils
+
+DIR_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "extracao")
+PAGINAS = sorted(glob.glob(os.path.join(DIR_FIXTURES, "*.html")))
+
+def _ler(caminho):
+    # newline="" mantém o \r\n da página CRLF (o html.parser preserva, o libxml2 não)
+    with open(caminho, encoding="utf-8", newline="") as f:
+        return f.read()
+
+def _golden(caminho):
+    with open(caminho[:-len(".html")] + ".golden.json", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_ha_fixtures():
+    assert PAGINAS
+
+@pytest.mark.parametrize("extrator", ["bs4", "lxml"])
+@pytest.mark.parametrize("caminho", PAGINAS, ids=os.path.basename)
+def test_extrator_igual_ao_golden(caminho, extrator):
+    if extrator == "lxml":
+        pytest.importorskip("lxml.html")
+    golden = _golden(caminho)
+    titulo, texto = utils.extrair_texto_html(_ler(caminho), extrator=extrator)
+    assert titulo == golden["titulo"]
+    assert texto == golden["texto"]
+
+def test_golden_remove_revogado_e_notas():
+    golden = _golden(os.path.join(DIR_FIXTURES, "lei_simples.html"))
+    assert "Redação antiga" not in golden["texto"]
+    assert "Redação dada" not in golden["texto"]
+    assert "Vide" not in golden["texto"]
+    assert "Art. 99" not in golden["texto"]
+    assert "\nArt. 2o Texto que vinha na mesma linha." in golden["texto"]
@@ -0,0 +1,87 @@
+"""
+utils.fatiar_por_artigos sobre uma lei de teste (tests/fixtures/fatiamento/lei_teste.txt,
+texto já como sai da extração): numeração dos artigos, estrutura interna, artigo
+longo quebrado em partes e metadados iguais aos do fatiador antigo
+(fatiamento_referencia.py) nos dois modos.
+"""
+import os
+import re
+
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+
+import utils
+from fatiamento_referencia import fatiar_referencia, verificar
+
+TITULO = "Lei 9.999"
+URL = "http://teste/lei_9999.htm"
+
+@pytest.fixture(scope="module")
+def texto():
+    caminho = os.path.join(os.path.dirname(__file__), "fixtures", "fatiamento", "lei_teste.txt")
+    with open(caminho, encoding="utf-8") as f:
+        return f.read()
+
+def _frases(texto):
+    # Sentenças na pontuação, no lugar do punkt do nltk (que precisa de download)
+    return [f for f in re.split(r"(?<=[.;:])(?=\s)", texto) if f]
+
+@pytest.fixture
+def splitter(monkeypatch):
+    """O mesmo SentenceSplitter (sentenças por regex) no fatiador atual e no antigo."""
+    splitter = SentenceSplitter(
+        chunk_size=utils.CHUNK_TOKENS, chunk_overlap=utils.CHUNK_OVERLAP, chunking_tokenizer_fn=_frases
+    )
+    monkeypatch.setattr(utils, "_obter_splitter", lambda: splitter)
+    return splitter
+
+def _por_artigo(chunks):
+    artigos = {}
+    for chunk in chunks:
+        artigos.setdefault(chunk["metadata"]["numero_artigo"], []).append(chunk)
+    return artigos
+
+def test_preambulo_e_numeracao(texto):
+    chunks = utils.fatiar_por_artigos(texto, TITULO, URL, estrutural=True)
+    assert chunks[0]["metadata"] == {"source": TITULO, "url_geral": URL, "tipo": "Preambulo", "numero_artigo": "0"}
+    assert chunks[0]["conteudo"].startswith("LEI No 9.999")
+    # "Art. 5-A" fica com o número do artigo (como no fatiador antigo)
+    assert list(_por_artigo(chunks)) == ["0", "1", "2", "5", "10", "11"]
+    assert _por_artigo(chunks)["5"][0]["conteudo"].startswith("Art. 5-A. O empregador")
+
+def test_ordinal_sem_normalizar():
+    chunks = utils.fatiar_por_artigos("Preâmbulo.\nArt. 1º Primeiro.\nArt. 2º Segundo.", TITULO, URL)
+    assert [c["metadata"]["numero_artigo"] for c in chunks] == ["0", "1", "2"]
+    assert chunks[1]["conteudo"] == "Art. 1º Primeiro."
+
+@pytest.mark.parametrize("estrutural", [False, True])
+def test_paragrafos_e_incisos_ficam_no_artigo(texto, estrutural, request):
+    if not estrutural:
+        request.getfixturevalue("splitter")  # o Art. 10 passa pelo SentenceSplitter
+    art2 = _por_artigo(utils.fatiar_por_artigos(texto, TITULO, URL, estrutural=estrutural))["2"]
+    assert len(art2) == 1
+    assert art2[0]["metadata"]["parte"] == 1
+    for trecho in ("I - salário mínimo;", "b) nos feriados", "§ 1o O disposto", "Parágrafo único. Revogado."):
+        assert trecho in art2[0]["conteudo"]
+    assert "Art. 5-A" not in art2[0]["conteudo"]
+
+def test_artigo_longo_em_partes(texto):
+    art10 = _por_artigo(utils.fatiar_por_artigos(texto, TITULO, URL, estrutural=True))["10"]
+    assert len(art10) > 1
+    assert [c["metadata"]["parte"] for c in art10] == list(range(1, len(art10) + 1))
+    assert art10[0]["conteudo"].startswith("Art. 10. Compete")
+    for chunk in art10[1:]:
+        assert chunk["conteudo"].startswith(f"[Continuação do Art. 10 da {TITULO}] ... ")
+    for chunk in art10:
+        conteudo = chunk["conteudo"].split("] ... ", 1)[-1]
+        assert utils._tokens(conteudo) <= utils.CHUNK_TOKENS
+        # Quebra na estrutura: toda parte começa num inciso ou parágrafo (ou no caput)
+        assert conteudo.startswith(("Art. 10.", "§")) or utils._RE_NIVEIS_ESTRUTURA[1].match(conteudo)
+    assert "§ 4o As atribuições do grupo 4" in art10[-1]["conteudo"]
+
+def test_modo_exato_igual_ao_antigo(texto, splitter):
+    assert utils.fatiar_por_artigos(texto, TITULO, URL, estrutural=False) == fatiar_referencia(texto, TITULO, URL, splitter)
+
+def test_modo_estrutural_mantem_metadados_do_antigo(texto, splitter):
+    # Mesma sequência de artigos, campos e partes 1..n; artigos curtos idênticos
+    assert verificar(TITULO, texto, URL, splitter) == []
@@ -0,0 +1,23 @@
+"""ingestion.GravadorQdrant.confirmar: barreira dos upserts sem wait, num Qdrant em memória."""
+from qdrant_client import QdrantClient, models
+
+from ingestion import GravadorQdrant
+
+def test_confirmar_so_sem_wait_e_sem_apagar_nada(monkeypatch):
+    cliente = QdrantClient(":memory:")
+    cliente.create_collection("t", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    cliente.upsert("t", points=[models.PointStruct(id=1, vector=[1.0, 0.0])], wait=False)
+
+    chamadas = []
+    delete = cliente.delete
+    def espiar(**kwargs):
+        chamadas.append(kwargs)
+        return delete(**kwargs)
+    monkeypatch.setattr(cliente, "delete", espiar)
+
+    GravadorQdrant(cliente=cliente, colecao="t", esperar=True).confirmar()
+    assert chamadas == []
+
+    GravadorQdrant(cliente=cliente, colecao="t", esperar=False).confirmar()
+    assert [c["wait"] for c in chamadas] == [True]
+    assert cliente.count("t").count == 1
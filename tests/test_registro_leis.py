@@ -0,0 +1,49 @@
+"""Registro de leis (ingestion_jobs + ingestion): conferido com a contagem de pontos do Qdrant em memória."""
+import pytest
+from qdrant_client import QdrantClient, models
+
+import ingestion
+import ingestion_jobs
+
+CLT = "http://planalto/del5452.htm"
+REFORMA = "http://planalto/l13467.htm"
+
+def _gravar(cliente, pid, url, titulo):
+    cliente.upsert(ingestion.COLLECTION_NAME, points=[
+        models.PointStruct(id=pid, vector=[1.0, 0.0], payload={"url_geral": url, "source": titulo, "hash_conteudo": str(pid)})
+    ])
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    c = QdrantClient(":memory:")
+    c.create_collection(ingestion.COLLECTION_NAME, vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    monkeypatch.setattr(ingestion, "client", c)
+    monkeypatch.setattr(ingestion, "jobs", ingestion_jobs.RegistroJobs(str(tmp_path / "jobs.sqlite3")))
+    return c
+
+def test_registro_remontado_quando_a_contagem_diverge(cliente, monkeypatch):
+    _gravar(cliente, 1, CLT, "CLT")
+    assert [l["url"] for l in ingestion.listar_leis_no_banco()] == [CLT]
+    assert ingestion.jobs.pontos_do_registro() == 1
+
+    varreduras = []
+    varrer = ingestion.varrer_leis_no_qdrant
+    monkeypatch.setattr(ingestion, "varrer_leis_no_qdrant", lambda: varreduras.append(1) or varrer())
+
+    # Contagem igual: lê o registro, sem varrer
+    assert [l["url"] for l in ingestion.listar_leis_no_banco()] == [CLT]
+    assert varreduras == []
+
+    # Outro worker (ou uma ingestão que caiu antes do registro) gravou a Reforma
+    _gravar(cliente, 2, REFORMA, "Reforma")
+    assert [l["url"] for l in ingestion.listar_leis_no_banco()] == [CLT, REFORMA]
+    assert varreduras == [1]
+
+def test_gravacao_local_atualiza_a_contagem(cliente, monkeypatch):
+    _gravar(cliente, 1, CLT, "CLT")
+    ingestion.listar_leis_no_banco()
+    monkeypatch.setattr(ingestion, "varrer_leis_no_qdrant", lambda: pytest.fail("não devia varrer"))
+
+    _gravar(cliente, 2, REFORMA, "Reforma")
+    ingestion.atualizar_registro_lei(REFORMA, "Reforma", ["2"])
+    assert [l["url"] for l in ingestion.listar_leis_no_banco()] == [CLT, REFORMA]
@@ -0,0 +1,76 @@
+"""SingleFlight (Rag.py): misses concorrentes da mesma chave fazem uma execução só."""
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from Rag import SingleFlight
+
+def _lenta(contador, resultado="resposta", espera=0.2):
+    def fn():
+        with contador["lock"]:
+            contador["n"] += 1
+        contador["comecou"].set()
+        time.sleep(espera)
+        return resultado
+    return fn
+
+@pytest.fixture
+def contador():
+    return {"n": 0, "lock": threading.Lock(), "comecou": threading.Event()}
+
+def test_threads_coalescem(contador):
+    sf = SingleFlight(espera_max_s=5)
+    fn = _lenta(contador)
+    with ThreadPoolExecutor(8) as pool:
+        resultados = list(pool.map(lambda _: sf.executar("chave", fn), range(8)))
+    assert resultados == ["resposta"] * 8
+    assert contador["n"] == 1
+    stats = sf.estatisticas()
+    assert stats["coalescidas_local"] == 7
+    assert stats["em_voo"] == 0
+
+def test_chaves_diferentes_nao_coalescem(contador):
+    sf = SingleFlight(espera_max_s=5)
+    fn = _lenta(contador, espera=0.05)
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(lambda chave: sf.executar(chave, fn), ["a", "b"]))
+    assert contador["n"] == 2
+
+def test_erro_do_lider_chega_aos_seguidores():
+    sf = SingleFlight(espera_max_s=5)
+    comecou = threading.Event()
+    def falha():
+        comecou.set()
+        time.sleep(0.3)
+        raise RuntimeError("qdrant fora")
+    with ThreadPoolExecutor(2) as pool:
+        lider = pool.submit(sf.executar, "chave", falha)
+        comecou.wait()
+        seguidor = pool.submit(sf.executar, "chave", lambda: "não deveria rodar")
+        for futuro in (lider, seguidor):
+            with pytest.raises(RuntimeError, match="qdrant fora"):
+                futuro.result()
+    # A chave foi liberada: a próxima chamada executa de novo
+    assert sf.executar("chave", lambda: "ok") == "ok"
+
+def test_seguidor_executa_sozinho_depois_do_tempo_maximo(contador):
+    sf = SingleFlight(espera_max_s=0.05)
+    with ThreadPoolExecutor(2) as pool:
+        lider = pool.submit(sf.executar, "chave", _lenta(contador, "lider", espera=0.5))
+        contador["comecou"].wait()
+        assert sf.executar("chave", lambda: "próprio") == "próprio"
+        assert lider.result() == "lider"
+    assert sf.estatisticas()["timeouts"] == 1
+
+def test_async_coalesce(contador):
+    sf = SingleFlight(espera_max_s=5)
+    fn = _lenta(contador)
+
+    async def rodar():
+        return await asyncio.gather(*(sf.aexecutar("chave", fn) for _ in range(5)))
+
+    assert asyncio.run(rodar()) == ["resposta"] * 5
+    assert contador["n"] == 1
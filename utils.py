@@ -1,63 +1,292 @@
+import os
 import re
+import functools
 from typing import List
-import requests
 from bs4 import BeautifulSoup
 import unicodedata
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.utils import get_tokenizer
 import fitz
 import logging
 
 import Prompts
+import html_cache
 
 # ==============================================================================
 # 1. MÓDULO DE EXTRAÇÃO (Mantido igual)
 # ==============================================================================
+def baixar_html(url):
+    """Etapa de rede: devolve o HTML da lei (ou None se falhar). Passa pelo cache condicional em disco."""
+    return html_cache.baixar(url).html
+
+# Backend da extração: "bs4" (BeautifulSoup + html.parser, referência) ou "lxml" (bem mais rápido).
+# Os dois devolvem o mesmo (título, texto): confira com scripts/golden_extracao.py.
+EXTRATOR_HTML = os.getenv("EXTRATOR_HTML", "bs4").strip().lower()
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+TAGS_REMOVIDAS = ('strike', 's', 'del', 'script', 'style', 'head', 'footer')
+MARCAS_LINK_REMOVIDO = ('Vide', 'Redação dada', 'Vigência')
+_RE_CENTER = re.compile(r'center', re.IGNORECASE)
+_RE_ESPACOS = re.compile(r'\s+')
+_RE_QUEBRAS = re.compile(r'\n{3,}')
+_RE_ART_INLINE = re.compile(r'(?<!\n)\s*(Art[\.\s]\s*\d+)', re.IGNORECASE)
+# Espaços que o BeautifulSoup colapsa em "\n" ou " " quando a string é só isso
+_ESPACOS_ASCII = str.maketrans('', '', '\x20\x0a\x09\x0c\x0d')
+_TAGS_PRESERVAM_ESPACO = ('pre', 'textarea')
+_RE_HTML_ABRE = re.compile(r'<html[\s>]')
+_RE_HEAD_ABRE = re.compile(r'<head[\s>]')
+
+def _finalizar_extracao(titulo_lei, texto):
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = _RE_QUEBRAS.sub('\n\n', texto)
+    texto = _RE_ART_INLINE.sub(r'\n\1', texto)
+    return titulo_lei, texto.strip()
+
+def _extrair_bs4(html):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for tag in soup.find_all(list(TAGS_REMOVIDAS)):
+        tag.decompose()
+    for a in soup.find_all('a'):
+        texto_link = a.get_text()
+        if any(marca in texto_link for marca in MARCAS_LINK_REMOVIDO):
+            a.decompose()
+
+    titulo_lei = "Lei Federal"
+    p_titulo = soup.find('p', attrs={'align': _RE_CENTER})
+    if p_titulo:
+        titulo_lei = p_titulo.get_text(separator=' ', strip=True)
+        titulo_lei = _RE_ESPACOS.sub(' ', titulo_lei)
+
+    return _finalizar_extracao(titulo_lei, soup.get_text(separator='\n'))
+
+def _como_bs4(texto, preservar, crlf):
+    """Converte um text/tail do lxml na string que o BeautifulSoup/html.parser daria."""
+    if not preservar and not texto.translate(_ESPACOS_ASCII):
+        return '\n' if '\n' in texto else ' '
+    # O libxml2 troca \r\n por \n; o html.parser mantém
+    return texto.replace('\n', '\r\n') if crlf else texto
+
+def _strings_lxml(elemento, removidos, crlf, preservar=False):
+    preservar = preservar or elemento.tag in _TAGS_PRESERVAM_ESPACO
+    if elemento.text:
+        yield _como_bs4(elemento.text, preservar, crlf)
+    for filho in elemento:
+        # Elementos removidos e comentários não entram no texto, mas o tail deles sim
+        # (drop_tree() grudaria o tail no texto anterior; o decompose() do bs4 não gruda)
+        if isinstance(filho.tag, str) and filho not in removidos:
+            yield from _strings_lxml(filho, removidos, crlf, preservar)
+        if filho.tail:
+            yield _como_bs4(filho.tail, preservar, crlf)
+
+def _dentro_de(elemento, removidos):
+    return any(el in removidos for el in elemento.iterancestors()) or elemento in removidos
+
+def _lxml_reproduz_bs4(html):
+    """
+    Casos em que o libxml2 monta/normaliza diferente do html.parser e o texto
+    mudaria: quebras de linha mistas (ele troca \r\n por \n), conteúdo depois
+    de </html>, mais de um <html> ou <head> depois do <body> (ele descarta).
+    """
+    qtd_crlf = html.count('\r\n')
+    if html.count('\r') != qtd_crlf or (qtd_crlf and html.count('\n') != qtd_crlf):
+        return False
+    baixo = html.lower()
+    fim = baixo.rfind('</html>')
+    if fim != -1 and baixo[fim + len('</html>'):].strip():
+        return False
+    if len(_RE_HTML_ABRE.findall(baixo)) > 1:
+        return False
+    inicio_body = baixo.find('<body')
+    return inicio_body == -1 or not _RE_HEAD_ABRE.search(baixo, inicio_body)
+
+def _extrair_lxml(html):
+    if not _lxml_reproduz_bs4(html):
+        return _extrair_bs4(html)
+    crlf = '\r\n' in html
+    try:
+        raiz = lxml.html.document_fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        return _extrair_bs4(html)
+
+    removidos = set(raiz.iter(*TAGS_REMOVIDAS))
+    for a in raiz.iter('a'):
+        texto_link = ''.join(_strings_lxml(a, removidos, crlf))
+        if any(marca in texto_link for marca in MARCAS_LINK_REMOVIDO):
+            removidos.add(a)
+
+    titulo_lei = "Lei Federal"
+    for p in raiz.iter('p'):
+        if _RE_CENTER.search(p.get('align') or '') and not _dentro_de(p, removidos):
+            partes = (s.strip() for s in _strings_lxml(p, removidos, crlf))
+            titulo_lei = _RE_ESPACOS.sub(' ', ' '.join(s for s in partes if s))
+            break
+
+    return _finalizar_extracao(titulo_lei, '\n'.join(_strings_lxml(raiz, removidos, crlf)))
+
+def extrair_texto_html(html, extrator=None):
+    """Etapa de CPU: limpa o HTML e devolve (título, texto)."""
+    extrator = extrator or EXTRATOR_HTML
+    if extrator == "lxml":
+        if lxml is not None:
+            return _extrair_lxml(html)
+        print("⚠️ EXTRAÇÃO: lxml não instalado. Usando BeautifulSoup.")
+    return _extrair_bs4(html)
+
 def extract_html(url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
     try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.encoding = 'latin-1' 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        for tag in soup.find_all(['strike', 's', 'del', 'script', 'style', 'head', 'footer']):
-            tag.decompose()
-        for a in soup.find_all('a'):
-            if 'Vide' in a.get_text() or 'Redação dada' in a.get_text() or 'Vigência' in a.get_text():
-                a.decompose()
-
-        titulo_lei = "Lei Federal"
-        p_titulo = soup.find('p', attrs={'align': re.compile(r'center', re.IGNORECASE)})
-        if p_titulo:
-            titulo_lei = p_titulo.get_text(separator=' ', strip=True)
-            titulo_lei = re.sub(r'\s+', ' ', titulo_lei)
-
-        texto = soup.get_text(separator='\n')
-        texto = unicodedata.normalize("NFKD", texto)
-        texto = re.sub(r'\n{3,}', '\n\n', texto)
-        texto = re.sub(r'(?<!\n)\s*(Art[\.\s]\s*\d+)', r'\n\1', texto, flags=re.IGNORECASE)
-
-        return titulo_lei, texto.strip()
+        html = baixar_html(url)
+        if html is None:
+            return "Erro", ""
+        return extrair_texto_html(html)
     except Exception as e:
         print(f"Erro ao ler {url}: {e}")
         return "Erro", ""
 
+def preparar_lei(html, url):
+    """
+    HTML -> (título, chunks). Função de módulo (picklable) para rodar
+    no pool de processos da ingestão.
+    """
+    titulo, texto = extrair_texto_html(html)
+    return titulo, fatiar_por_artigos(texto, titulo, url)
+
 # ==============================================================================
 # 2. MÓDULO DE FATIAMENTO HÍBRIDO (Regex + LlamaIndex)
 # ==============================================================================
-def fatiar_por_artigos(texto_completo, titulo, url):
+# chunk_size=1024 tokens é um bom tamanho para leis (pega contexto amplo)
+CHUNK_TOKENS = 1024
+CHUNK_OVERLAP = 200
+CARACTERES_POR_TOKEN_MIN = 2
+# 1 = artigos longos são quebrados em §, incisos e alíneas antes de cair no SentenceSplitter.
+# 0 = fronteiras idênticas às antigas (só SentenceSplitter). Trocar muda os chunks dos
+# artigos longos: a próxima atualização incremental re-embeda só esses.
+FATIAMENTO_ESTRUTURAL = os.getenv("FATIAMENTO_ESTRUTURAL", "1") == "1"
+
+# Criados no primeiro uso e reaproveitados no processo: importar o utils não carrega o
+# tokenizador, e o punkt do nltk só é lido quando um artigo passa pelo SentenceSplitter
+@functools.lru_cache(maxsize=1)
+def _obter_splitter():
+    return SentenceSplitter(chunk_size=CHUNK_TOKENS, chunk_overlap=CHUNK_OVERLAP)
+
+@functools.lru_cache(maxsize=1)
+def _obter_tokenizer():
+    return get_tokenizer()
+
+# Sobe quando o fatiamento muda o que grava para a mesma página (a marca de ingestão
+# muda e as leis são re-fatiadas). v2: "Art. 1.052" vira 1052, não mais 1.
+VERSAO_FATIAMENTO = 2
+
+def versao_processamento():
+    """Extrator + fatiamento em uso. Vai na marca de ingestão junto com o sha256 do HTML:
+    trocar EXTRATOR_HTML ou FATIAMENTO_ESTRUTURAL re-fatia a página mesmo sem ela mudar."""
+    extrator = "lxml" if EXTRATOR_HTML == "lxml" and lxml is not None else "bs4"
+    return f"{extrator}|estrutural={int(FATIAMENTO_ESTRUTURAL)}|{CHUNK_TOKENS}/{CHUNK_OVERLAP}|v{VERSAO_FATIAMENTO}"
+
+_RE_DIVISAO_ARTIGOS = re.compile(r'(?=\nArt[\.\s]\s*\d+)', re.IGNORECASE)
+# Número com separador de milhar ("Art. 1.052"): gravado sem os pontos, como o citacoes.py normaliza
+_RE_NUMERO_ARTIGO = re.compile(r'Art[\.\s]\s*(\d+(?:\.\d{3})*)', re.IGNORECASE)
+
+def numero_do_artigo(texto_artigo):
+    """Número do artigo no início do trecho ("Art. 1.052." -> "1052"), ou "N/A"."""
+    match_num = _RE_NUMERO_ARTIGO.search(texto_artigo)
+    return match_num.group(1).replace('.', '') if match_num else "N/A"
+# Início de linha de cada nível da estrutura do artigo, do maior para o menor. O texto
+# vem em NFKD, então "Parágrafo único" pode ter acentos combinantes: daí o \S{0,3}
+_RE_NIVEIS_ESTRUTURA = (
+    re.compile(r'(?:§|Par\S{0,3}grafo\s+\S{0,3}nico)', re.IGNORECASE),  # parágrafos
+    re.compile(r'[IVXLCDM]+\s*[-\u2013\u2014]'),                         # incisos
+    re.compile(r'[a-z]\s*\)'),                                          # alíneas
+)
+
+def _tokens(texto):
+    return len(_obter_tokenizer()(texto))
+
+def _cabe_sem_tokenizar(texto):
+    # Estimativa barata: texto de lei em português dá ~4 caracteres/token no tokenizador
+    # padrão; contar 2 deixa folga (fatiamento_referencia.py confere contra o antigo)
+    return len(texto) <= CHUNK_TOKENS * CARACTERES_POR_TOKEN_MIN
+
+def _unidades_estruturais(artigo):
     """
-    1. Usa REGEX para isolar Artigos (garante contexto jurídico).
-    2. Usa LLAMAINDEX se o artigo for maior que o chunk_size (garante tokens).
+    Quebra o artigo em unidades (texto, tokens) que cabem no chunk: primeiro nos §,
+    depois incisos, alíneas, linhas e, por último, sentenças (SentenceSplitter).
+    Toda fronteira da estrutura é início de linha, então cada linha é tokenizada uma
+    vez e os trechos somam as linhas: a soma é o mínimo e soma + 1 por "\n" o máximo
+    (o "\n" às vezes gruda na pontuação). Só entre os dois o trecho é tokenizado de novo.
     """
-    
-    # Configura o Splitter do LlamaIndex
-    # chunk_size=1024 tokens é um bom tamanho para leis (pega contexto amplo)
-    splitter = SentenceSplitter(chunk_size=1024, chunk_overlap=200)
+    linhas = [l for l in (l.strip() for l in artigo.split('\n')) if l]
+    tokens = [_tokens(l) for l in linhas]
+
+    def contar(ini, fim, texto):
+        soma = sum(tokens[ini:fim])
+        maximo = soma + (fim - ini - 1)
+        if maximo <= CHUNK_TOKENS or soma > CHUNK_TOKENS:
+            return maximo
+        return _tokens(texto)
+
+    def quebrar(ini, fim, nivel):
+        texto = '\n'.join(linhas[ini:fim])
+        total = contar(ini, fim, texto)
+        if total <= CHUNK_TOKENS:
+            return [(texto, total)]
+        if fim - ini == 1:
+            return [(t, _tokens(t)) for t in _obter_splitter().split_text(texto)]
+        if nivel == len(_RE_NIVEIS_ESTRUTURA):
+            return [u for i in range(ini, fim) for u in quebrar(i, i + 1, nivel)]
+        inicios = [i for i in range(ini + 1, fim) if _RE_NIVEIS_ESTRUTURA[nivel].match(linhas[i])]
+        fronteiras = [ini] + inicios + [fim]
+        return [u for a, b in zip(fronteiras, fronteiras[1:]) for u in quebrar(a, b, nivel + 1)]
+
+    # O artigo inteiro é contado sobre o texto original, como o SentenceSplitter faria
+    total = contar(0, len(linhas), artigo)
+    if total <= CHUNK_TOKENS:
+        return [(artigo, total)]
+    return quebrar(0, len(linhas), 0)
 
-    padrao_divisao = r'(?=\nArt[\.\s]\s*\d+)'
-    pedacos = re.split(padrao_divisao, texto_completo, flags=re.IGNORECASE)
+def _agrupar_unidades(unidades):
+    """Junta unidades vizinhas até CHUNK_TOKENS, repetindo no início do próximo as últimas até CHUNK_OVERLAP."""
+    grupos, atual, tamanho = [], [], 0
+    for texto, tokens in unidades:
+        # +1 pela quebra de linha que junta as unidades
+        if atual and tamanho + tokens + 1 > CHUNK_TOKENS:
+            grupos.append(atual)
+            sobreposicao, tamanho = [], 0
+            for anterior in reversed(atual):
+                if tamanho + anterior[1] + 1 > CHUNK_OVERLAP or tamanho + anterior[1] + tokens + 2 > CHUNK_TOKENS:
+                    break
+                sobreposicao.insert(0, anterior)
+                tamanho += anterior[1] + 1
+            atual = sobreposicao
+        atual.append((texto, tokens))
+        tamanho += tokens + 1
+    if atual:
+        grupos.append(atual)
+    return ['\n'.join(texto for texto, _ in grupo) for grupo in grupos]
+
+def _dividir_artigo(artigo, estrutural):
+    if _cabe_sem_tokenizar(artigo):
+        return [artigo]
+    if not estrutural:
+        return _obter_splitter().split_text(artigo)
+    unidades = _unidades_estruturais(artigo)
+    if len(unidades) == 1:
+        return [unidades[0][0]]
+    return _agrupar_unidades(unidades)
+
+def fatiar_por_artigos(texto_completo, titulo, url, estrutural=None):
+    """
+    1. Usa REGEX para isolar Artigos (garante contexto jurídico).
+    2. Artigo que cabe em CHUNK_TOKENS vira um chunk só (sem passar pelo splitter).
+    3. Artigo maior é quebrado na estrutura da lei (§, incisos, alíneas) e só
+       depois em sentenças pelo LLAMAINDEX (garante tokens).
+    """
+    estrutural = FATIAMENTO_ESTRUTURAL if estrutural is None else estrutural
+    pedacos = _RE_DIVISAO_ARTIGOS.split(texto_completo)
     
     chunks_processados = []
     
@@ -81,11 +310,9 @@ def fatiar_por_artigos(texto_completo, titulo, url):
         if not chunk: continue
         
         # Identifica número do artigo para Metadados e Link
-        match_num = re.search(r'Art[\.\s]\s*(\d+)', chunk, re.IGNORECASE)
-        num_art = match_num.group(1) if match_num else "N/A"
+        num_art = numero_do_artigo(chunk)
         
-        # O split_text só vai quebrar SE o texto for maior que o chunk_size (1024 tokens)
-        sub_textos = splitter.split_text(chunk)
+        sub_textos = _dividir_artigo(chunk, estrutural)
         
         for i, sub_texto in enumerate(sub_textos):
             texto_final = sub_texto
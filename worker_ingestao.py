@@ -0,0 +1,76 @@
+# worker_ingestao.py
+"""
+Worker de ingestão: consome a fila de jobs (ingestion_jobs) fora do Streamlit.
+
+A página "Gestão de Leis" só enfileira o job e acompanha o progresso pelos
+eventos gravados aqui. Cada job roda o mesmo processar_urls_stream da UI
+(com checkpoints: um job cortado no meio retoma do último lote gravado).
+
+Uso:
+    python worker_ingestao.py                 # fica consumindo a fila
+    python worker_ingestao.py --jobs 3        # até 3 jobs ao mesmo tempo
+    python worker_ingestao.py --uma-vez       # esvazia a fila e sai
+"""
+import os
+import signal
+import argparse
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import ingestion
+import ingestion_jobs
+
+# Jobs simultâneos por worker (cada um com seu pipeline de download/fatiamento/embedding)
+INGEST_WORKER_JOBS = int(os.getenv("INGEST_WORKER_JOBS", "2"))
+# Intervalo de consulta à fila, em segundos
+INGEST_WORKER_POLL_S = float(os.getenv("INGEST_WORKER_POLL_S", "2"))
+
+def executar_job(job_id: str):
+    print(f"🚚 WORKER: Iniciando job {job_id[:8]}")
+    try:
+        for evento in ingestion.processar_urls_stream([], job_id=job_id):
+            ingestion.jobs.registrar_evento(job_id, evento)
+    except Exception as e:
+        print(f"❌ WORKER: Erro no job {job_id[:8]}: {e}")
+        ingestion.jobs.registrar_evento(job_id, {"tipo": "error", "msg": f"🔥 Erro no worker: {str(e)[:100]}", "progresso": 1.0})
+        ingestion.jobs.marcar_job(job_id, ingestion_jobs.COM_ERROS)
+    print(f"🏁 WORKER: Job {job_id[:8]} finalizado")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=INGEST_WORKER_JOBS, help="Jobs simultâneos")
+    parser.add_argument("--intervalo", type=float, default=INGEST_WORKER_POLL_S, help="Segundos entre consultas à fila")
+    parser.add_argument("--uma-vez", action="store_true", help="Sai quando a fila esvaziar")
+    args = parser.parse_args()
+
+    parar = threading.Event()
+    def _sinal(signum, frame):
+        print("🛑 WORKER: Encerrando (jobs em andamento voltam para a fila)...")
+        parar.set()
+    signal.signal(signal.SIGINT, _sinal)
+    signal.signal(signal.SIGTERM, _sinal)
+
+    print(f"👷 WORKER: Consumindo a fila de ingestão ({args.jobs} jobs simultâneos, {ingestion_jobs.INGEST_JOBS_PATH})")
+    ativos = {}
+    while not parar.is_set():
+        ativos = {job_id: t for job_id, t in ativos.items() if t.is_alive()}
+        while len(ativos) < args.jobs:
+            job_id = ingestion.jobs.reservar_proximo_job()
+            if job_id is None:
+                break
+            # Daemon: ao encerrar, o processo não espera o job; os checkpoints garantem a retomada
+            t = threading.Thread(target=executar_job, args=(job_id,), name=f"job-{job_id[:8]}", daemon=True)
+            t.start()
+            ativos[job_id] = t
+        if args.uma_vez and not ativos:
+            break
+        parar.wait(args.intervalo)
+
+    for job_id, t in ativos.items():
+        if t.is_alive():
+            ingestion.jobs.reenfileirar(job_id)
+
+if __name__ == "__main__":
+    main()